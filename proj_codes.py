@@ -5,154 +5,282 @@ Created on Thu Apr 21 15:13:28 2022
 @author: WB563112
 """
 
-class Sectors():
+#Folder holding the Project_data downloads; overridden by the PROJ_CODES_DATA_DIR environment variable
+DATA_DIR = "N:\\BASE_DATA"
+
+#Local folder mirroring the most recent Project_data download; overridden by the PROJ_CODES_MIRROR_DIR environment variable
+MIRROR_DIR = "~/.proj_codes/mirror"
+
+#Folder holding the snapshot store of past downloads
+SNAPSHOT_DIR = "~/.proj_codes/snapshots"
+
+#Folder holding the partitions written by load_data(out_of_core=True)
+PARTITION_DIR = "~/.proj_codes/partitions"
+
+#Default memory limit of load_data(out_of_core=True), in bytes
+OUT_OF_CORE_MEMORY = 2**30
+
+#Folder holding the states saved by the command line (python -m proj_codes) and the output of its most recent query
+CLI_DIR = "~/.proj_codes/cli"
+
+#Formats of Project_data downloads, by file extension: an Excel workbook with one sheet per sheet of SnapshotStore.sheets,
+#or one CSV or Parquet file per sheet, named e.g. "Project_data.csv.April 14, 2022.sectors.csv". Of downloads made on the same date,
+#the one in the format listed last is loaded, as it is the fastest to read
+_DATA_FORMATS = {".xls":"excel", ".xlsm":"excel", ".xlsx":"excel", ".csv":"csv", ".parquet":"parquet"}
+
+#Columns converted to the same dtype whatever the format of the download, as CSV readers infer whole numbers as integers
+_SHEET_DTYPES = {"Project Approval FY":float, "Sector Percentage":float, "Theme Percentage":float,
+                 "Theme Lending Commitment Amount":float, "Theme Portfolio Net Commitment Amount":float}
+
+#Metadata columns loaded by load_data(lazy=True): those used by query filters and default outputs
+_CORE_META_COLS = ['Project Id', 'Additional Financing Flag', 'Project Approval FY', 'Project Status Name',
+                   'Product Line Type', 'Lead GP/Global Themes']
+
+#Grouping variables accepted by trend and top_k
+_GROUP_VARS = {"fy":"Project Approval FY",
+               "gp":"Lead GP/Global Themes",
+               "region":"Region Name",
+               "instrument":"Lending Instrument Long Name",
+               "status":"Project Status Name"}
+
+#Column layout of the merged data held by Sectors and Themes objects
+_SECTOR_SPEC = {"kind":"sector",
+                "code":"Sector Code",
+                "code_type":str,
+                "name":"Sector Long Name",
+                "pct":"Sector Percentage",
+                "commitment":None,
+                "sheet":"sectors",
+                "sheet_cols":['Project Id', 'Major Sector Code', 'Major Sector Long Name', 'Sector Code',
+                              'Sector Long Name', 'Sector Percentage'],
+                "level":None,
+                "hierarchy":['Major Sector Code', 'Major Sector Long Name'],
+                "project_cols":['Project Id', 'Sector Code', 'Sector Long Name', 'Sector Percentage', 'Additional Financing Flag',
+                                'Project Approval FY', 'Project Status Name', 'Product Line Type', 'Lead GP/Global Themes']}
+
+_THEME_SPEC = {"kind":"theme",
+               "code":"Theme Code",
+               "code_type":int,
+               "name":"Theme Name",
+               "pct":"Theme Percentage",
+               "commitment":"Theme Lending Commitment Amount",
+               "sheet":"themes",
+               "sheet_cols":['Project Id', 'Theme Code', 'Theme Level', 'Theme Name',
+                             'Theme Percentage', 'Theme Lending Commitment Amount', 'Theme Portfolio Net Commitment Amount'],
+               "level":"Theme Level",
+               "hierarchy":['Theme Level'],
+               "project_cols":['Project Id', 'Theme Code', 'Theme Name', 'Theme Percentage',
+                               'Project Approval FY', 'Project Status Name', 'Product Line Type',
+                               'Additional Financing Flag', 'Lead GP/Global Themes']}
+
+class _CodeData():
+    
+    #Base class of Sectors and Themes, holding the methods they share
+    #_spec: the column layout of the data, _SECTOR_SPEC or _THEME_SPEC, set by each subclass
     
     #Initialize the object
-    def __init__(self):
-        self.__data = None
-        self.__dataloaded = False
-        self.__last_command = None
-        self.__last_output = None
-        self.__last_output_exist = False
-        print("Sectors object created.")
+    #as_of: if str, load_data loads the most recent snapshot on or before that date
+    #keep_last: if False, query methods do not record their output for save_last and plot_last; use session() instead
+    #source: DataSource that load_data reads the most recent download from; if None, the default DataSource is used
+    def __init__(self, as_of=None, keep_last=True, source=None):
+        #If as_of is specified and it is not a string, return error
+        if (as_of!=None) and (type(as_of)!=str):
+            raise TypeError("'as_of' must be of type 'str' or None.")
+        #If keep_last is not of type 'bool', return error
+        if type(keep_last)!=bool:
+            raise TypeError("'keep_last' must be of type 'bool'.")
+        #If source is specified and it is not a DataSource, return error
+        if (source!=None) and (type(source)!=DataSource):
+            raise TypeError("'source' must be of type 'DataSource' or None.")
+        self._data = None
+        self._dataloaded = False
+        self._last_command = None
+        self._last_output = None
+        self._last_output_exist = False
+        self._index = None
+        self._as_of = as_of
+        self._keep_last = keep_last
+        self._source = DataSource() if source==None else source
+        self._columns = None
+        self._quality = None
+        self._partitions = None
+        print(f"{type(self).__name__} object created.")
     ################################################
     
     def __bool__(self):
         """
         Description
         -------
-        Boolean representation of a Sectors object.
-        Returns True if data has been loaded to a Sectors object.
+        Boolean representation of a Sectors or Themes object.
+        Returns True if data has been loaded to the object.
         """
-        return self.__dataloaded
+        return self._dataloaded
     ################################################
     
     def __str__(self):
         """
         Description
         -------
-        String representation of a Sectors object.
+        String representation of a Sectors or Themes object.
         """
-        return ("Object class: Sectors. " +
-                f"Holds data: {self.__dataloaded}. " +
-                f"Most recent call: {self.__last_command}.")
+        return (f"Object class: {type(self).__name__}. " +
+                f"Holds data: {self._dataloaded}. " +
+                f"Most recent call: {self._last_command}.")
     ################################################
     
-    def load_data(self):
+    def _load_partitions(self, memory_limit=None, quality=None):
+        #Data loading sequence of load_data(out_of_core=True): split the most recent download, or the snapshot requested with as_of,
+        #into partitions on disk, keeping only the list of partitions in memory
+        import time
+        start_time = time.time()
+        
+        print(f"Splitting WB project {self._spec['kind']}s data into partitions on disk." + "\n" +
+              "This is done once per download and memory limit. Please wait...")
+        
+        #the most recent download is first added to the snapshot store, unless it is already in it, and read from there in batches
+        store = SnapshotStore()
+        as_of = self._as_of
+        if as_of==None:
+            data_file_to_import, download_date = self._source.latest_file()
+            as_of = store.ingest(data_file_to_import)
+        self._partitions = _build_partitions(store, as_of, self._spec, OUT_OF_CORE_MEMORY if memory_limit==None else memory_limit, quality)
+        self._quality = self._partitions.quality_report()
+        self._dataloaded = True
+        
+        #Alert users that data was loaded successfully
+        print("Data loading successful!" + "\n" +
+              f"Data contains {self._partitions.n_rows} rows and {self._partitions.n_projects} unique WB projects, " +
+              f"held on disk in {len(self._partitions.partitions)} partitions." + "\n" +
+              f"Total loading time: {round(time.time()-start_time, 1)} seconds." + "\n" +
+              "Data source: World Bank Standard Reports." + "\n" +
+              f"Data download date: {self._partitions.snapshot_date}.")
+        
+        #Alert users to projects flagged by the data quality checks
+        if not self._quality.empty:
+            print(f"WARNING! {self._quality['Project Id'].nunique()} projects failed data quality checks. See quality_report().")
+    ################################################
+    
+    def _full_data(self):
+        #Return the loaded data with every metadata column, reading those not loaded by load_data(lazy=True) from the column cache
+        if self._columns==None:
+            return self._data
+        return self._columns.attach(self._data)
+    ################################################
+    
+    def __getstate__(self):
+        #Return the state of the object for pickling, with the loaded data and other DataFrames as Arrow tables (see _pack_frames)
+        return _pack_frames(self.__dict__)
+    ################################################
+    
+    def __setstate__(self, state):
+        #Restore the state of the object when unpickling, and give the index back the data it was built on
+        self.__dict__.update(_unpack_frames(state))
+        if self._index!=None:
+            self._index.attach(self._data)
+    ################################################
+    
+    def save_state(self, path):
         """
         Description
         ----------
-        Loads all available data on WB project sectors.
-        Data loading occurs in place and does not support variable assignment.
-        User access to IEG N:\ drive is required for successful execution. 
-        Data loading typically takes 1-2 minutes.
-        Loading time over 3 minutes is an indication that attempt to access to IEG N:\ drive has failed.
+        Saves the data loaded into a Sectors or Themes object, along with its code indexes and the output of the most recent query, to a file.
+        Data is stored column by column in Arrow format, and indexes as arrays, so that load_state can memory-map them
+        instead of reading the download again. Restoring a saved state typically takes 1-2 seconds.
+        Sectors and Themes objects can also be pickled, e.g. to send them to another process, in which case data is stored in the same form.
+        Requires pyarrow.
         
         Parameters
         ----------
-        None
+        path : str
+            Path of the file to save to. An existing file at path is replaced.
         
         Returns
         ----------
-        Creates a DataFrame object that is loaded into the private data attribute of a Sectors object.
-        To access this DataFrame, use data_info or copy_data.
+        None
         """
         
         #Record command call in the last_command attribute
-        self.__last_command = "load_data"
+        self._last_command = "save_state"
         
-        #if data has already been loaded to the object
-        if self.__dataloaded == True:
-            print("Data already loaded to this object.")
+        #If path is not a string, return error
+        if type(path)!=str:
+            raise TypeError("'path' must be of type 'str'.")
         
-        #if data not yet loaded to the object, begin data loading sequence
+        #if data is held on disk, alert user
+        if self._partitions!=None:
+            print("Not available for data loaded with out_of_core=True.")
+        
+        #if data has been loaded to the object, save it
+        elif self._dataloaded:
+            _save_state(self, path)
+            print(f"State saved to {path}.")
+        
+        #Otherwise, alert user that data has not been loaded yet
         else:
-            
-            #record start time
-            import time
-            start_time = time.time()                             
-            
-            #alert user that sequence to load data has begun
-            print("Loading WB project sectors data." + "\n" +  
-                  "This typically takes 1-2 minutes. Please wait...")  
-            
-            #specify the name and file path of the sectors data to be imported
-            import os
-            import pandas as pd   
-            
-            #list all the files in the N drive folder, and choose the relevant file to import
-            file_list = os.listdir("N:\\BASE_DATA")
-            data_file = [x for x in file_list if "Project_data" in x][0]
-            data_file_info = data_file.split('.')
-            data_file_to_import = "N:\\BASE_DATA\\"+data_file
-            
-            #import projects metadata and drop unnecessary columns
-            meta_data = pd.read_excel(data_file_to_import, sheet_name="metadata")  
-            meta_data.drop(['Project Status Code','Lending Instrument Code'], axis=1, inplace=True)                        
-            
-            #import the sector data
-            sector_data = pd.read_excel(data_file_to_import, sheet_name="sectors",     
-                          usecols=['Project Id', 'Major Sector Code', 'Major Sector Long Name', 'Sector Code', 
-                                   'Sector Long Name', 'Sector Percentage'])
-            
-            #merge the two datasets and compute sector percentage as a percentage
-            sector_and_meta = sector_data.merge(meta_data, on="Project Id", how="outer", validate="m:1")
-            sector_and_meta['Sector Percentage'] = sector_and_meta['Sector Percentage'] * 100
-            
-            #save the merged data to the data attribute of the object and set .dataloaded to True
-            self.__data = sector_and_meta                                    
-            self.__dataloaded = True                                    
-            
-            #delete residual files
-            del(meta_data)
-            del(sector_data)
-            del(data_file_to_import)
-            
-            #record end time and calculate elapsed time
-            end_time = time.time() 
-            elapsed_time = end_time-start_time
-            
-            #Alert users that data was loaded successfully
-            print("Data loading successful!" + "\n" +
-                  f"Loaded data contains {self.__data.shape[0]} rows and {self.__data['Project Id'].nunique()} unique WB projects." + "\n" +
-                  f"Total loading time: {round(elapsed_time, 1)} seconds." + "\n" +
-                  "Data source: World Bank Standard Reports." + "\n" +
-                  f"Data download date: {data_file_info[2]}.")
-    ################################################        
+            print("Data not yet loaded.")
+    ################################################
     
-    def unload_data(self): 
+    def load_state(self, path):
         """
         Description
         ----------
-        Deletes the DataFrame, if any, that has been loaded into the data attribute of a Sectors object.
-        Data unloading occurs in place and does not support variable assignment.
+        Loads the data, code indexes and most recent query output saved by save_state into a Sectors or Themes object.
+        Data loading occurs in place and does not support variable assignment.
+        The object keeps its own keep_last and source settings.
         
         Parameters
         ----------
-        None
+        path : str
+            Path of a file saved by the save_state method of an object of the same class.
         
         Returns
         ----------
-        None
+        Loads the saved DataFrame into the private data attribute of the object, as load_data does.
         """
         
-        #Record command call in the last_command attribute
-        self.__last_command = "unload_data"
+        #If path is not a string, return error
+        if type(path)!=str:
+            raise TypeError("'path' must be of type 'str'.")
         
-        #Delete internal data and reset all internal attributes
-        self.__data = None
-        self.__dataloaded = False
-        self.__last_output = None
-        self.__last_output_exist = False
-        print("Data unloading complete.") 
+        #if data has already been loaded to the object
+        if self._dataloaded == True:
+            print("Data already loaded to this object.")
+        
+        #if data not yet loaded to the object, restore the saved object and take over its data
+        else:
+            import time
+            start_time = time.time()
+            
+            saved = _load_state(path)
+            #If the file holds another kind of object, return error
+            if type(saved)!=type(self):
+                raise TypeError(f"'{path}' does not hold the state of a {type(self).__name__} object.")
+            self._data = saved._data
+            self._dataloaded = saved._dataloaded
+            self._last_output = saved._last_output
+            self._last_output_exist = saved._last_output_exist
+            self._index = saved._index
+            self._as_of = saved._as_of
+            self._columns = saved._columns
+            self._quality = saved._quality
+            self._partitions = saved._partitions
+            
+            #Record command call in the last_command attribute
+            self._last_command = "load_state"
+            
+            print("State loading successful!" + "\n" +
+                  f"Loaded data contains {self._data.shape[0]} rows and {self._index.n_projects} unique WB projects." + "\n" +
+                  f"Total loading time: {round(time.time()-start_time, 1)} seconds.")
     ################################################
-         
-    def data_info(self):
+    
+    def session(self):
         """
         Description
         ----------
-        Prints summary information on the DataFrame, if any, that has been loaded into the data attribute of a Sectors object.
-        Variable assignment not supported.
+        Returns a session over the data loaded into the Sectors or Themes object.
+        A session has its own save_last and plot_last, which act on the output of the session's own most recent query,
+        so several sessions (e.g. one per request in a web server) can share one loaded object from different threads.
+        Query methods of a session take the same arguments as those of the object.
         
         Parameters
         ----------
@@ -160,1118 +288,915 @@ class Sectors():
         
         Returns
         ----------
-        None
+        Session object
         """
         
-        #Record command call in the last_command attribute
-        self.__last_command = "data_info"
+        #Sessions query data held in memory only
+        if self._partitions!=None:
+            print("Not available for data loaded with out_of_core=True.")
+            return None
         
-        #if data has been loaded to the object, return info of the df
-        if self.__dataloaded:                      
-            print(self.__data.info())            
+        return Session(self._session_queries(), save=self._save_output, plot=self._plot_output,
+                       plot_commands=["get_projects", f"get_{self._spec['kind']}s"])
+    ################################################
+    
+    def _remember(self, command, output_df):
+        #Record a query in the last_command attribute, and its output for save_last and plot_last unless the object was created with keep_last=False
+        self._last_command = command
+        if self._keep_last:
+            self._last_output = output_df
+            self._last_output_exist = output_df is not None
+    ################################################
+    
+    def __partition(self, data):
+        #Return an object of the same class over one partition of data loaded with load_data(out_of_core=True), for the query cores to run on
+        part = type(self).__new__(type(self))
+        part._data = data
+        part._dataloaded = True
+        part._index = _CodeIndex(data, self._spec)
+        part._columns = None
+        part._partitions = None
+        #take the options of the query filters from the whole data rather than from the partition
+        part._index.column_values.update(self._partitions.column_values())
+        return part
+    ################################################
+    
+    def _stream(self, query, pids=None, found="{} unique projects meet the specified criteria.",
+                none="No projects meet the specified criteria.", pid_col='Project Id', start_FY=None, stop_FY=None):
+        #Run query(part, part_pids) on each partition of data loaded with load_data(out_of_core=True) in turn, and return an iterator over its outputs.
+        #If pids is specified, only the partitions holding them are read, and part_pids holds those of the partition.
+        #If start_FY or stop_FY is specified, only the partitions of approval FYs in that range, or of missing approval FY, are read.
+        #The messages printed by query on each partition are replaced by one for all partitions, printed once the iterator is exhausted.
+        #The first partition is queried before returning, so that input errors are raised by the call rather than by the iteration
+        import contextlib
+        import io
         
-        #Otherwise, alert user that data has not been loaded yet
-        else:                                      
-            print("Data not yet loaded.")                        
+        partitions = self._partitions.select(pids, start_FY, stop_FY)
+        buckets = None if pids is None else self._partitions.buckets_of(pids)
+        
+        def run(partition):
+            part = self.__partition(self._partitions.read(partition))
+            part_pids = None if pids is None else pids[buckets==partition["bucket"]]
+            with contextlib.redirect_stdout(io.StringIO()) as messages:
+                return query(part, part_pids), messages.getvalue()
+        
+        def outputs(output_df):
+            n_found = 0
+            for partition in partitions[1:]+[None]:
+                if (output_df is not None) and (not output_df.empty):
+                    n_found += output_df[pid_col].nunique()
+                    yield output_df
+                output_df = None if partition==None else run(partition)[0]
+            print(found.format(n_found) if n_found>0 else none)
+        
+        if not partitions:
+            return outputs(None)
+        #Input warnings are the same on every partition, so those of the first are passed on
+        output_df, messages = run(partitions[0])
+        for line in messages.splitlines():
+            if line.startswith("WARNING!"):
+                print(line)
+        return outputs(output_df)
     ################################################
     
-    def copy_data(self):
+    def _iter_chunks(self, pid_list, chunk_size, rows):
+        #Yield rows(pids) for each batch of chunk_size PIDs read from pid_list, skipping empty batches; shared by the iter_chunks methods
+        #if data is not loaded to the object, alert user
+        if self._dataloaded==False:
+            print ("Data not yet loaded.")
+            return
+        #if data is held on disk, alert user
+        if self._partitions!=None:
+            print(f"Not available for data loaded with out_of_core=True. Use get_{self._spec['kind']}s, which reads one partition at a time.")
+            return
+        
+        #Extract the rows of each batch of PIDs, counting the PIDs found
+        n_requested, n_found = 0, 0
+        for pids in _pid_chunks(pid_list, chunk_size):
+            output_df = rows(pids)
+            n_requested += len(pids)
+            n_found += output_df['Project Id'].nunique()
+            if not output_df.empty:
+                yield output_df
+        print(f"Data found for {n_found} out of {n_requested} requested PIDs.")
+    ################################################
+    
+    def query(self):
         """
         Description
         ----------
-        Returns a copy of the DataFrame, if any, that has been loaded into the data attribute of a Sectors object.
-        Supports variable assignment.
-        
+        Returns a lazy query over the data loaded into the Sectors or Themes object.
+        Filters are chained onto the query and are only evaluated when collect, count or pids is called.
+        For example: Sectors.query().codes(['TI','TW']).min_pct(5).fy(2015, 2022).status(['Active']).collect()
+        Data must already be loaded into the object.
+
         Parameters
         ----------
         None
-        
+
         Returns
         ----------
-        DataFrame object
+        ProjectQuery object
         """
-        
-        #Record command call in the last_command attribute
-        self.__last_command = "copy_data"
-        
-        #if data has been loaded to the object, return the data
-        if self.__dataloaded:                 
-            return self.__data
-        
-        #Otherwise, alert user that data has not been loaded yet                      
-        else:                                       
-            print("Data not yet loaded.")
-    ################################################       
-    
-    def get_projects(self, 
-                     sector_codes,
-                     min_pct=1,
-                     start_FY=None, stop_FY=None,
-                     product_type=None, 
-                     project_status=None,
-                     include_AF=True,
-                     show_all=False,
-                     show_meta=False):
-        
+
+        #if data is not loaded to the object, alert user
+        if self._dataloaded==False:
+            print ("Data not yet loaded.")
+        elif self._partitions!=None:
+            print("Not available for data loaded with out_of_core=True.")
+        else:
+            return ProjectQuery(self._data, self._spec, self._index, self._columns)
+    ################################################
+
+    def search_codes(self, text, limit=20):
         """
         Description
         ----------
-        Returns projects that are mapped to the specified sector codes and that satisfy other optional criteria.
-        Supports a variable assignment.
-        Data must already be loaded into the Sectors object.
+        Returns the sector or theme codes whose code or name best matches text, most relevant first, e.g. search_codes('renewable').
+        Matching is fuzzy: words are compared by their three-letter fragments, so partial words and small typos still match.
+        The search index is built on first use, after which each search takes about a millisecond.
+        Data must already be loaded into the object.
         
         Parameters
         ----------
-        sector_codes : list
-            Returned projects must be mapped to one or more sector codes in sector_codes.
-            Only sub-sector level codes are accepted.
-        min_pct : int, default 1
-            Indicates the minimum percentage of a project that at least one sector code in sector_codes must account for before that project will be returned.
-            If project's sector codes matches one or more sector codes in sector_codes but none of the matching sector codes account for up to the min_pct value, such a project will not be returned. 
-        start_FY : int or None, default None
-            If int, returns projects approved in or after the specified value of start_FY, and projects with missing approval FY data.
-            If None, returns all eligible projects, regardless of approval FY.
-        stop_FY : int or None, default None
-            If int, returns projects approved in or before the specified value of stop_FY, and projects with missing approval FY data.
-            If None, returns all eligible projects, regardless of approval FY.
-        product_type : list or None, default None
-            If list, returns projects whose product type matches any of the specified values in product_types.
-            Automatically excludes projects with missing product type data.
-            Acceptable values are:
-                "L": for lending products,
-                "A": for AAA products,
-                "S": for standard products, or any combination of these. 
-            If None, returns all eligible projects, regardless of product type.
-        project_status : list or None, default None
-            If list, returns projects whose completion status matches any of the specified values in project_status.
-            Automatically excludes observations with missing project status data.
-            Acceptable values are: "Active", "Canceled", "Closed", "Dropped", "Draft", "Legacy Dropped", "Legacy", and "Pipeline".
-            If None, return all eligible projects regardless of project status.
-        include_AF : bool, default True
-            If True, eligible additional financing projects will be included in the output.
-        show_all : bool, default False
-            If True, returns all sector codes that matching projects are mapped to, rather than those in sector_codes only.
-        show_meta : bool, default False
-            If True, returns additional project-level meta data.
+        text : str
+            Words to search for.
+        limit : int, default 20
+            Maximum number of codes returned.
         
         Returns
         ----------
-        DataFrame object
-        """ 
+        DataFrame object, with the code, name and major sector or theme level of each match, the number of projects mapped to it, and a relevance score
+        """
         
-        #Record command call in the last_command attribute
-        self.__last_command = "get_projects"
+        #If text is not a string, return error
+        if type(text)!=str:
+            raise TypeError("'text' must be of type 'str'.")
+        #If limit is not a positive int, return error
+        if type(limit)!=int or limit<1:
+            raise ValueError("'limit' must be a positive 'int'.")
         
         #if data is not loaded to the object, alert user
-        if self.__dataloaded==False:
-            self.__last_output = None
-            self.__last_output_exist = False
+        if self._dataloaded==False:
             print ("Data not yet loaded.")
-    
-        #Otherwise, begin data extraction sequence
+        elif self._partitions!=None:
+            print("Not available for data loaded with out_of_core=True.")
         else:
-            
-            #create copy of internal data
-            temp_data = self.__data   
-            
-            import numpy as np
-            
-            #Check if any auxiliary argument is provided
-            aux_args = (start_FY==None) & (stop_FY==None) & (product_type==None) & (project_status==None) & (include_AF==True)
-            
-            #USER INPUT VALIDATION
-            #---------------------------------------------#
-            #If sector_codes is not a list, return error
-            if type(sector_codes)!=list:
-                raise TypeError("'sector_codes' must be of type 'list'.")
-            #If any item in sector_codes is not a string, return error
-            elif any(type(item)!=str for item in sector_codes):
-                raise TypeError("All items in 'sector_codes' must be of type 'str'.")
-            #If sector_codes is a list and every element in that list is a string, convert all element in sector_codes to upper case
-            else:
-                sector_codes = [item.upper() for item in sector_codes]
-                
-            #If any element in sector_codes is a major sector code (i.e. end with 'X'), warn user
-            if any(item[-1]=='X' for item in sector_codes):
-                print("WARNING! One or more items in 'sector_codes' is not of the accepted sector hierarchy.")
-            
-            #---------------------------------------------#
-            #If min_pct is not an int, return error
-            if type(min_pct)!=int:
-                raise TypeError("'min_pct' must be of type 'int'.") 
-            #If min_pct is <0 or >100, warn user
-            elif min_pct not in range(0,101):
-                print("WARNING! 'min_pct' is outside expected range of 0 to 100.")
-                
-            #--------------------------------------------#
-            #If start_FY is specified by user and it is not of type 'int', return error
-            if (start_FY!=None) and (type(start_FY)!=int):
-                raise TypeError("start_FY must be of type 'int'.")    
-            
-            #If stop_FY is specified by user and it is not of type 'int', return error
-            if (stop_FY!=None) and (type(stop_FY)!=int):
-                raise TypeError("stop_FY must be of type 'int'.")    
-            
-            #if start_FY and stop_FY are unspecified by user, set them to first and last year available in the data respectively
-            start_FY = int(temp_data['Project Approval FY'].min()) if start_FY==None else int(start_FY)
-            stop_FY = int(temp_data['Project Approval FY'].max()) if stop_FY==None else int(stop_FY)
-            
-            #If stop_FY precedes start_FY, return error
-            if stop_FY < start_FY:
-                raise ValueError("'start_FY' and 'stop_FY' arguments are not in chronological order.")
-            
-            #create a list of integers between start_FY and stop_FY 
-            timeline = list(range(int(start_FY), int(stop_FY)+1))
-            timeline.append(np.nan)
-            
-            #--------------------------------------------#            
-            #If product_type is specified by user and it is not of type 'list', return error
-            if (product_type!=None) and (type(product_type)!=list):
-                raise TypeError("product_type must be of type 'list'.")
-            #If product_type is a list and any element in product_type is not a string, return error
-            elif (type(product_type)==list) and (any(type(item)!=str for item in product_type)):
-                raise TypeError("All values in 'product_type' must be of type 'str'.")
-            else:
-                #If product_type is specified correctly as a list, convert to upper, else leave as None
-                #NOTE FOR DEVELOPER: CHECK THAT CASING STYLE USED MATCHES THAT IN THE RAW DATA FROM POWERBI
-                product_type = [item.upper() for item in product_type] if product_type!=None else product_type
-                
-            #Create a list of all available values for Product Line Type
-            prod_type_options = list(temp_data['Product Line Type'].unique())
-            #Remove any nan from this list, and record it in the nan_removed variable
-            nan_removed = False
-            if np.nan in prod_type_options:
-                prod_type_options.remove(np.nan)
-                nan_removed = True
-            #Then convert prod_type_options to upper case to match product_type
-            #NOTE FOR DEVELOPER: CHECK THAT CASING STYLE USED MATCHES THAT IN THE RAW DATA FROM POWERBI
-            prod_type_options = [item.upper() for item in prod_type_options]
+            return self._index.name_index().search(text, limit)
+    ################################################
     
-            #If product_type is specified by user and it is not among acceptable options, exit
-            if (product_type!=None) and set(product_type).isdisjoint(set(prod_type_options)):
-                raise ValueError("Unrecognized product_type input. Acceptable values are:" + "\n" +
-                        "'L', for lending products," + "\n" +
-                        "'A', for AAA products, and" + "\n" + 
-                        "'S', for standard products.") 
-            
-            #If product_type is not specified by user, set prod_type to all acceptable options
-            if product_type==None:
-                #If nan values were removed from prod_type_options, put them back
-                if nan_removed:
-                    prod_type_options.append(np.nan)
-                prod_type = prod_type_options
-            #Finally, if product_type is specified correctly by user, set prod_type to the specified value of product_type
-            else:
-                prod_type = product_type
-            
-            #--------------------------------------------#
-            #If project_status is specified by user and it is not of type 'list', return error
-            if (project_status!=None) and (type(project_status)!=list):
-                raise TypeError("'project_status' must be of type 'list'.")
-            #If project_status is specified as a list and any item in project_status is not a string, return error
-            elif (type(project_status)==list) and (any(type(item)!=str for item in project_status)):
-                raise ValueError("All values in 'project_status' must be of type 'str'.")
-            else:
-                #If project_status is specified correctly as a list, convert to title, else leave as None
-                #NOTE FOR DEVELOPER: CHECK THAT CASING STYLE USED MATCHES THAT IN THE RAW DATA FROM POWERBI
-                project_status = [item.title() for item in project_status] if project_status!=None else project_status
-            
-            #Get the list of possible options for project status
-            proj_stat_options = list(temp_data['Project Status Name'].unique())
-            #Remove any nan from this list, and record it in the nan_removed variables
-            nan_removed = False
-            if np.nan in proj_stat_options:
-                proj_stat_options.remove(np.nan)
-                nan_removed=True
-            #Then convert proj_stat_options to title case to match project_status
-            proj_stat_options = [item.title() for item in proj_stat_options]
-            
-            #If project_status is specified by user and it is not among acceptable options, return error
-            if (project_status!=None) and set(project_status).isdisjoint(set(proj_stat_options)):
-                raise ValueError("Unrecognized project_status input. Acceptable values are:" + "\n" +
-                        '"Active", "Canceled", "Closed", "Dropped", "Draft", "Legacy Dropped", "Legacy", and "Pipeline".')
-            
-            #If project_status is not specified by user, set proj_status to all acceptable options
-            if project_status==None:
-                #If nan was removed, put them back
-                if nan_removed:
-                    proj_stat_options.append(np.nan)
-                proj_status = proj_stat_options
-            #Finally, if project_status is specified correctly by user, set proj_status to the specified value in project_status
-            else:
-                proj_status = project_status
-                
-            #--------------------------------------------#
-            #If include_AF is not of type 'bool', return error
-            if type(include_AF)!=bool:
-               raise TypeError("'include_AF' must be of type 'bool'.")
-            #If include_AF is True, set add_fin_choice to all available values of the Additional Financing Flag
+    def has_code(self, code, min_pct=None):
+        """
+        Description
+        ----------
+        Returns a boolean code expression matching the projects mapped to the specified sector or theme code.
+        Expressions from Sectors and Themes objects can be combined with & (and), | (or), ^ (xor), - (and not) and ~ (not),
+        and are evaluated with bitwise operations over per-code project bitmaps built when data is loaded.
+        For example: (sectors.has_code('TI') & themes.has_code(811)) - sectors.has_code('TW')
+        Data must already be loaded into the object.
 
-            add_fin_choice=list(temp_data['Additional Financing Flag'].unique())
-            #If include_AF is False, exclude add_fin_choice value from the Additional Financing Flag
-            if include_AF==False:
-                #NOTE FOR DEVELOPER: CONFIRM THAT 'Y' IS THE VALUE FOR ADDITIONAL FINANCING FLAG
-                add_fin_choice.remove('Y')
-            
-            #If show_all is not of type 'bool', return error
-            if type(show_all)!=bool:
-                raise TypeError("'show_all' must be of type 'bool'.")
-                
-            #If show_meta is not of type 'bool', return error
-            if type(show_meta)!=bool:
-                raise TypeError("'show_meta' must be of type 'bool'.")
-            
-            #IDENTIFY PROJECTS MATCHING THE SECTOR_CODES AND MIN_PCT ARGUMENTS SPECIFIED
-            #--------------------------------------------#
-            #Step 1: get the rows with sector codes that match any of those in sector_codes
-            matching_sector_filter = temp_data['Sector Code'].isin(sector_codes)
+        Parameters
+        ----------
+        code : str or int
+            The code projects must be mapped to: a str sector code for Sectors objects, or an int theme code for Themes objects.
+        min_pct : int or None, default None
+            If int, only projects where the code accounts for at least min_pct percent are matched.
+            If None, every project mapped to the code is matched, regardless of percentage.
 
-            #filter temp data to extract these matching sector codes only
-            matching_sector_df = temp_data.loc[matching_sector_filter,:].copy()
-            
-            #Step 2: Extract PIDs where at least one sector code match has a sector percentage > the min_pct value
-            #Pivot the data so that each pid occupy a single row only
-            matching_sector_pivoted_df = matching_sector_df.pivot(index='Project Id', 
-                                                                columns='Sector Code', 
-                                                                values='Sector Percentage')
-            
-            #compute a min_pct_exceeded column that returns True if at least on sector code has percentage >= min_pct
-            matching_sector_pivoted_df['min_pct_exceeded'] = (matching_sector_pivoted_df>=min_pct).any(axis=1,skipna=True)
-            
-            #Reset index
-            matching_sector_pivoted_df.reset_index(inplace=True)
-            
-            #Extract PIDs where min_pct_exceeded column is True
-            pids_with_sector_above_min_pct = list(matching_sector_pivoted_df.loc[matching_sector_pivoted_df['min_pct_exceeded'],'Project Id'])
-            
-            #--------------------------------------------#
-            #Specify the output rows depending on the values of the auxiliary arguments
-            if aux_args:
-                output_rows = temp_data['Project Id'].isin(pids_with_sector_above_min_pct)
-            else:
-                output_rows = ((temp_data['Project Id'].isin(pids_with_sector_above_min_pct)) &            
-                               (temp_data['Product Line Type'].isin(prod_type)) &
-                               (temp_data['Project Status Name'].isin(proj_status)) &
-                               (temp_data['Project Approval FY'].isin(timeline)) & 
-                               (temp_data['Additional Financing Flag'].isin(add_fin_choice)))
-            
-            #--------------------------------------------#
-            #Specify the output columns depending on the value of show_meta
-            all_cols = list(temp_data.columns)
-            sel_cols = ['Project Id', 'Sector Code', 'Sector Long Name', 'Sector Percentage', 'Additional Financing Flag',
-                        'Project Approval FY', 'Project Status Name', 'Product Line Type', 'Lead GP/Global Themes']
-            
-            #Output columns is all columns if show_meta is true, else show sel_cols
-            output_cols = all_cols if show_meta else sel_cols
-            
-            #--------------------------------------------#
-            #Filter the data based on output_rows and output_cols
-            output_df = temp_data.loc[output_rows,output_cols].copy()
-            
-            #If user only wants to see the specified sector codes rather than all sector codes the matching projects are mapped to
-            if show_all==False:
-                #filter the data to show only the specified sector codes
-                output_df = output_df.loc[(output_df['Sector Code'].isin(sector_codes) & 
-                                           (output_df['Sector Percentage']>=min_pct)),:].copy()
-            #reset the index
-            output_df.reset_index(drop=True,inplace=True)
-            
-            #--------------------------------------------#
-            #Check if output df is empty and alert user accordingly
-            if output_df.empty:
-                print("No projects meet the specified criteria.")
-                self.__last_output_exist = False
-            else: 
-                no_of_unique = output_df['Project Id'].nunique()
-                print(f"{no_of_unique} unique projects meet the specified criteria.") 
-                self.__last_output = output_df
-                self.__last_output_exist = True
-                return output_df
-    ################################################        
-    
-    def get_sectors(self, pid_list, show_meta=False):
-                
+        Returns
+        ----------
+        CodeExpr object
+        """
+
+        #if data is not loaded to the object, alert user
+        if self._dataloaded==False:
+            print ("Data not yet loaded.")
+        elif self._partitions!=None:
+            print("Not available for data loaded with out_of_core=True.")
+        else:
+            #If code is not of the expected type, return error
+            code_type = self._spec["code_type"]
+            if type(code)!=code_type:
+                raise TypeError(f"'code' must be of type '{code_type.__name__}'.")
+            #If min_pct is specified and it is not an int, return error
+            if (min_pct!=None) and (type(min_pct)!=int):
+                raise TypeError("'min_pct' must be of type 'int' or None.")
+            return CodeExpr("code", index=self._index, code=code.upper() if code_type==str else code, min_pct=min_pct)
+    ################################################
+
+    def code_matrix(self):
         """
         Description
         ----------
-        Returns sector codes that the specified list of projects are mapped to.
+        Returns the loaded data as a sparse projects x sector (or theme) codes matrix, built once and then reused.
+        Matrix values are code percentages. Requires scipy.
+        Data must already be loaded into the object.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        tuple of (scipy.sparse CSR matrix, array of project IDs labelling the rows, array of codes labelling the columns)
+        """
+
+        #if data is not loaded to the object, alert user
+        if self._dataloaded==False:
+            print ("Data not yet loaded.")
+        elif self._partitions!=None:
+            print("Not available for data loaded with out_of_core=True.")
+        else:
+            return self._index.matrix(), self._index.pids, self._index.codes
+    ################################################
+
+    def project_summary(self):
+        """
+        Description
+        ----------
+        Returns the project summary table built when data is loaded into the object: one row per project, holding
+        its main code (the code with the largest percentage, missing if several codes share it), its number of codes,
+        its largest percentage, the list of its codes, and the metadata used by query filters.
         Supports variable assignment.
-        Data must already be loaded into the Sectors object.
-        
+        Data must already be loaded into the object.
+
         Parameters
         ----------
-        pid_list : list
-            The ID numbers of projects for which sector codes are to be returned. 
-        show_meta : bool, default False
-            If True, returns additional project-level meta data.
-        
+        None
+
         Returns
         ----------
         DataFrame object
         """
-        #Record command call in the last_command attribute
-        self.__last_command = "get_sectors"
-        
+
         #if data is not loaded to the object, alert user
-        if self.__dataloaded==False:
-            self.__last_output = None
-            self.__last_output_exist = False
+        if self._dataloaded==False:
             print ("Data not yet loaded.")
+        elif self._partitions!=None:
+            print("Not available for data loaded with out_of_core=True.")
+        else:
+            return self._index.summary.copy()
+    ################################################
 
-        #Otherwise, begin data extraction sequence
+    def quality_report(self):
+        """
+        Description
+        ----------
+        Returns the results of the data quality checks run when data was loaded into the object, one row per project and failed check:
+            "Percentage sum": the project's sector percentages do not sum to 100, or, for themes, the percentages of the themes under one of its themes
+                in the theme taxonomy do not sum to that theme's percentage,
+            "Repeated code": the project is mapped to the same code in more than one row,
+            "Missing metadata": the project has no metadata in the downloaded data,
+            "No code rows": the project has metadata but is not mapped to any code in the downloaded data.
+        Checks are run on the data as downloaded, before any exclusion or repair requested with load_data.
+        Supports variable assignment.
+        Data must already be loaded into the object.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        DataFrame object
+        """
+
+        #if data is not loaded to the object, alert user
+        if self._dataloaded==False:
+            print ("Data not yet loaded.")
         else:
-            
-            #create copy of internal data
-            temp_data = self.__data  
+            return self._quality.copy()
+    ################################################
 
-            #USER INPUT VALIDATION
-            #If pids is not a list, return error
-            if type(pid_list)!=list:
-                raise TypeError("'pid_list' must be of type 'list'.")
-            #If each pid in pids is not a string, return error
-            elif any(type(pid)!=str for pid in pid_list):
-                raise TypeError("Every item in 'pid_list' must be of type 'str'.")
-                
-            #Convert pids to upper
-            #NOTE FOR DEVELOPER: CHECK THAT CASING STYLE USED MATCHES THAT IN THE RAW DATA FROM POWERBI
-            pids = [item.upper() for item in pid_list]
-      
-            #--------------------------------------------#
-            #Identify the rows in temp_data that matches the PIDs
-            output_rows = temp_data['Project Id'].isin(pids)
-            
-            #--------------------------------------------#
-            #Specify the output columns depending on the value of show_meta
-            all_cols = list(temp_data.columns)
-            sel_cols = ['Project Id', 'Major Sector Code', 'Major Sector Long Name', 'Sector Code', 'Sector Long Name', 'Sector Percentage']
-            
-            #Show all columns if show_meta is true, else show sel_cols
-            output_cols = all_cols if show_meta else sel_cols
-        
-            #--------------------------------------------#
-            #Filter the data based on output_rows and output_cols
-            output_df = temp_data.loc[output_rows,output_cols].copy()
-            output_df.reset_index(drop=True,inplace=True)
-            
-            #--------------------------------------------#
-            #Check if output df is empty and alert user accordingly
-            if output_df.empty:
-                self.__last_output_exist = False
-                print("No data found for specified PID(s).")
-            else:
-                no_of_unique = output_df['Project Id'].nunique()
-                print(f"Data found for {no_of_unique} out of {len(pids)} requested PIDs.")
-                self.__last_output = output_df
-                self.__last_output_exist = True
-                return output_df
-    ################################################ 
+    def cooccurrence(self, codes=None, by_FY=False, portfolio=None):
+        """
+        Description
+        ----------
+        Returns the number of projects mapped to each pair of sector (or theme) codes, computed as a sparse matrix product.
+        The diagonal holds the number of projects mapped to each code. Requires scipy.
+        Data must already be loaded into the object.
+
+        Parameters
+        ----------
+        codes : list or None, default None
+            If list, only co-occurrences between the specified codes are returned.
+            If None, co-occurrences between all codes are returned.
+        by_FY : bool, default False
+            If True, co-occurrences are counted separately for each approval FY and returned in long format.
+        portfolio : str or None, default None
+            If str, only the projects in the portfolio of that name, defined with define_portfolio, are counted.
+
+        Returns
+        ----------
+        DataFrame object
+        """
+
+        #if data is not loaded to the object, alert user
+        if self._dataloaded==False:
+            print ("Data not yet loaded.")
+        elif self._partitions!=None:
+            #If portfolio is specified, return error, as portfolios are defined on data held in memory
+            if portfolio!=None:
+                raise ValueError("'portfolio' is not available for data loaded with out_of_core=True.")
+            return _cooccurrence(self._partitions.indexes(self._spec), self._spec, codes, by_FY)
+        else:
+            return _cooccurrence([self._portfolio_index(portfolio)], self._spec, codes, by_FY)
+    ################################################
 
-    def count_sectors(self, pid_list, summarize=False):
+    def trend(self, by="FY", codes="all", measure="projects", window=None, share=False, portfolio=None):
         """
         Description
         ----------
-        Returns the number of sub-sectors that the specified projects are mapped to.
+        Returns a codes x approval FY (or other grouping variable) matrix for every sector or theme code at once, computed in a single groupby.
         Supports variable assignment.
-        Data must already be loaded into the Sectors object.
-        
+        Data must already be loaded into the object.
+
         Parameters
         ----------
-        pid_list : list
-            The ID numbers of projects for which sub-sector counts are to be returned. 
-        summarize : bool, default False
-            If True, returns frequency count of each sub-sector count.
-        
+        by : str, default "FY"
+            The grouping variable of the matrix columns. Acceptable values are "FY", "GP", "Status", "Region" and "Instrument".
+        codes : list or "all", default "all"
+            If list, only the specified codes are returned.
+        measure : str, default "projects"
+            The value of each cell. Acceptable values are:
+                "projects": the number of unique projects mapped to the code,
+                "commitment": the sum of Theme Lending Commitment Amount; not available for sector data,
+                "pct_weighted": the sum of the code percentages as shares of 1, i.e. project-equivalents.
+        window : int or None, default None
+            If int, values are replaced by their rolling mean over window consecutive fiscal years, counting years without data as 0. Requires by="FY".
+        share : bool, default False
+            If True, values are divided by the portfolio total of each column, i.e. the number of unique projects for measure="projects",
+            and the sum over all codes otherwise.
+        portfolio : str or None, default None
+            If str, only the projects in the portfolio of that name, defined with define_portfolio, are counted.
+
         Returns
         ----------
         DataFrame object
         """
+
+        #if data is not loaded to the object, alert user
+        if self._dataloaded==False:
+            print ("Data not yet loaded.")
+        elif self._partitions!=None:
+            #If portfolio is specified, return error, as portfolios are defined on data held in memory
+            if portfolio!=None:
+                raise ValueError("'portfolio' is not available for data loaded with out_of_core=True.")
+            return _trend(self._partitions.indexes(self._spec), self._spec, by, codes, measure, window, share)
+        else:
+            return _trend([self._portfolio_index(portfolio)], self._spec, by, codes, measure, window, share)
+    ################################################
+
+    def top_k(self, k=10, by="code", within=None, measure="projects", portfolio=None):
+        """
+        Description
+        ----------
+        Returns the k sector or theme codes (or values of another variable) with the largest measure within each approval FY, region, GP, or other grouping,
+        as a long table with one row per group and rank. Values are selected from an aggregate computed once per grouping and measure,
+        without sorting each group.
+        Supports variable assignment.
+        Data must already be loaded into the object.
+
+        Parameters
+        ----------
+        k : int, default 10
+            The number of values returned per group. Groups with fewer values return all of them; ties at the k-th value are broken in order of by.
+        by : str, default "code"
+            The variable whose values are ranked. Acceptable values are "code", for sector or theme codes, "FY", "GP", "Status", "Region", "Instrument",
+            or the name of another project-level column of the data.
+        within : list or None, default None
+            The variables defining the groups, with the same acceptable values as by, e.g. ["FY", "Region Name"].
+            If None, the k values of by are returned for the whole portfolio. "code" must be either by or an item in within.
+        measure : str, default "projects"
+            The value ranked. Acceptable values are:
+                "projects": the number of unique projects mapped to the code,
+                "commitment": the sum of Theme Lending Commitment Amount; not available for sector data,
+                "pct_weighted": the sum of the code percentages as shares of 1, i.e. project-equivalents.
+        portfolio : str or None, default None
+            If str, only the projects in the portfolio of that name, defined with define_portfolio, are counted.
+
+        Returns
+        ----------
+        DataFrame object with the within variables, a Rank column, by and the measure
+        """
+
+        #if data is not loaded to the object, alert user
+        if self._dataloaded==False:
+            print ("Data not yet loaded.")
+        elif self._partitions!=None:
+            #If portfolio is specified, return error, as portfolios are defined on data held in memory
+            if portfolio!=None:
+                raise ValueError("'portfolio' is not available for data loaded with out_of_core=True.")
+            return _top_k(self._partitions.indexes(self._spec), self._spec, k, by, within, measure)
+        else:
+            return _top_k([self._portfolio_index(portfolio)], self._spec, k, by, within, measure)
+    ################################################
+
+    def define_portfolio(self, name, **filters):
+        """
+        Description
+        ----------
+        Defines a named portfolio: the projects matching the specified filters, evaluated once and kept as a bitmap of projects.
+        Query methods with a portfolio argument, e.g. get_projects(..., portfolio=name), are then restricted to the portfolio
+        without evaluating its filters again. Defining a portfolio with the name of an existing one replaces it.
+        Portfolios are kept until data is unloaded, and are saved by save_state.
+        Data must already be loaded into the object.
+
+        Parameters
+        ----------
+        name : str
+            The name of the portfolio.
+        **filters
+            The filters defining the portfolio, as in get_projects: codes, min_pct, start_FY, stop_FY, product_type, project_status and include_AF.
+            For example, define_portfolio("evaluable", product_type=["L"], include_AF=False, start_FY=2010, project_status=["Closed", "Active"]).
+
+        Returns
+        ----------
+        None
+        """
+
+        #if data is not loaded to the object, alert user
+        if self._dataloaded==False:
+            print ("Data not yet loaded.")
+        #if data is held on disk, alert user
+        elif self._partitions!=None:
+            print("Not available for data loaded with out_of_core=True.")
+        else:
+            #If name is not a string, return error
+            if type(name)!=str:
+                raise TypeError("'name' must be of type 'str'.")
+            pids = _filtered_query(self.query(), filters).pids()
+            self._index.define_portfolio(name, pids)
+            print(f"Portfolio '{name}' defined, with {len(pids)} projects.")
+    ################################################
+
+    def _portfolio_index(self, portfolio=None):
+        #Return the code index of the loaded data, or of the rows of the projects in the portfolio if portfolio is specified
+        if portfolio==None:
+            return self._index
+        return self._index.portfolio_index(portfolio)
+    ################################################
+
+    def sample(self, n=None, frac=None, strata=None, seed=None, allocation="proportional", replace=False, query=None):
+        """
+        Description
+        ----------
+        Returns a stratified random sample of projects, e.g. for evaluation work, drawn from the project summary table in one vectorized pass.
+        The sample is the same for the same seed and data, and redrawing is fast enough for bootstrap samples.
+        Supports variable assignment.
+        Data must already be loaded into the object.
+
+        Parameters
+        ----------
+        n : int or None, default None
+            The sample size: the total number of projects with allocation="proportional", or the number per stratum with allocation="fixed".
+        frac : float or None, default None
+            The share of the projects of each stratum sampled. Exactly one of n and frac must be specified.
+        strata : list or None, default None
+            The variables defining the strata. Acceptable values are "main", for the main code, "FY", "GP", "Status", "Region",
+            "Instrument", or the name of another project-level column of the data. Missing values make up strata of their own.
+            If None, projects are sampled without stratification.
+        seed : int or None, default None
+            Seed of the random number generator. If None, a different sample is drawn on each call.
+        allocation : str, default "proportional"
+            Acceptable values are:
+                "proportional": n is split across strata in proportion to their number of projects,
+                "fixed": n projects are drawn from each stratum, or all its projects if it holds fewer and replace is False.
+        replace : bool, default False
+            If True, projects are drawn with replacement, e.g. for bootstrap samples.
+        query : ProjectQuery or None, default None
+            If ProjectQuery, e.g. Sectors.query().fy(2015, 2022).status(['Closed']), only the projects matching it are sampled.
+
+        Returns
+        ----------
+        DataFrame object with one row per sampled project, ordered by stratum, and a Weight column holding the number of projects of its stratum
+        per sampled project
+        """
+
+        #if data is not loaded to the object, alert user
+        if self._dataloaded==False:
+            print ("Data not yet loaded.")
+        #if data is held on disk, alert user
+        elif self._partitions!=None:
+            print("Not available for data loaded with out_of_core=True.")
+        else:
+            #If query is specified and it is not a ProjectQuery, return error
+            if (query!=None) and (type(query)!=ProjectQuery):
+                raise TypeError("'query' must be of type 'ProjectQuery' or None.")
+            return _sample(self._index, n, frac, strata, seed, allocation, replace, None if query==None else query.pids())
+    ################################################
+
+    def sweep_min_pct(self, codes, thresholds=range(0,101,5)):
+        """
+        Description
+        ----------
+        Returns the number of projects that get_projects returns for the specified codes at each of several min_pct values,
+        from one sort of the matching percentages rather than one get_projects call per value.
+        Data must already be loaded into the object.
+
+        Parameters
+        ----------
+        codes : list
+            The codes, as in get_projects.
+        thresholds : iterable of int, default range(0,101,5)
+            The min_pct values.
+
+        Returns
+        ----------
+        DataFrame object with one row per threshold and a Projects column
+        """
+
+        #if data is not loaded to the object, alert user
+        if self._dataloaded==False:
+            print ("Data not yet loaded.")
+        elif self._partitions!=None:
+            return _sweep_min_pct(self._partitions.indexes(self._spec), self._spec, codes, thresholds)
+        else:
+            return _sweep_min_pct([self._index], self._spec, codes, thresholds)
+    ################################################
+
+    def diff(self, old_snapshot, new_snapshot=None):
+        """
+        Description
+        ----------
+        Returns the sector or theme code mappings that were added, removed or changed in percentage between two downloads.
+        Projects whose mappings are unchanged are skipped by comparing per-project content hashes before any row is merged.
+        Snapshots are read from the snapshot store; see SnapshotStore.
+        Supports variable assignment.
+
+        Parameters
+        ----------
+        old_snapshot : str
+            Date of the earlier download. The most recent snapshot on or before this date is used.
+        new_snapshot : str or None, default None
+            Date of the later download. If None, the data loaded into the object is used.
+
+        Returns
+        ----------
+        DataFrame object with one row per changed project and code, and a Change column of "added", "removed" or "changed".
+        """
+
+        #If new_snapshot is not specified, compare against the loaded data
+        if new_snapshot==None:
+            if self._dataloaded==False:
+                print ("Data not yet loaded.")
+                return None
+            if self._partitions!=None:
+                print("Not available for data loaded with out_of_core=True. Specify new_snapshot instead.")
+                return None
+            new_df = self._data
+        else:
+            new_df = _snapshot_mappings(new_snapshot, self._spec)
+        old_df = _snapshot_mappings(old_snapshot, self._spec)
+
+        output_df = _diff_mappings(old_df, new_df, self._spec)
+        print(f"{output_df['Project Id'].nunique()} projects with changed {self._spec['kind']} mappings.")
+        return output_df
+    ################################################
+
+    def render_charts(self, specs, out_dir, workers=None, fmt="png"):
+        """
+        Description
+        ----------
+        Renders many plot_last bar charts at once and saves them to files, e.g. for a monthly chart pack.
+        Each distinct query is run once and shared by the charts that use it, and the project counts of every chart are computed
+        in the calling process; the charts are then drawn without pyplot, with the Agg backend, in a pool of processes if workers is specified.
+        Data must already be loaded into the object.
+
+        Parameters
+        ----------
+        specs : list
+            One dict per chart, with the keys:
+                "name": str, the file name of the chart, without extension,
+                "plot_by": str, the grouping variable, as in plot_last,
+                "query": dict, optional, keyword arguments of get_projects selecting the projects plotted. If missing, every project is plotted,
+                "where": dict, optional, mapping columns to the value, or list of values, of the rows plotted, e.g. {"Lead GP/Global Themes":"Energy"}.
+        out_dir : str
+            Folder the charts are saved to, created if needed. Existing files of the same name are overwritten.
+        workers : int or None, default None
+            If int, draws the charts in a pool of that many processes. If None, draws them in the calling process.
+        fmt : str, default "png"
+            File format of the charts. Acceptable values are "png" and "svg".
+
+        Returns
+        ----------
+        list of the paths of the saved charts, in the order of specs
+        """
+
+        import os
+        from concurrent.futures import ProcessPoolExecutor
+
+        #if data is not loaded to the object, alert user
+        if self._dataloaded==False:
+            print ("Data not yet loaded.")
+            return None
+        #if data is held on disk, alert user
+        if self._partitions!=None:
+            print("Not available for data loaded with out_of_core=True.")
+            return None
+
+        #If specs is not a list of dicts, return error
+        if (type(specs)!=list) or any(type(spec)!=dict for spec in specs):
+            raise TypeError("'specs' must be a list of 'dict'.")
+        #If a spec lacks a name or a plot_by, or has a query or where that is not a dict, return error
+        for spec in specs:
+            if (type(spec.get("name"))!=str) or (type(spec.get("plot_by"))!=str):
+                raise ValueError("Every item in 'specs' must have a 'name' and a 'plot_by' of type 'str'.")
+            if any((spec.get(key)!=None) and (type(spec.get(key))!=dict) for key in ["query", "where"]):
+                raise TypeError("The 'query' and 'where' of every item in 'specs' must be of type 'dict' or None.")
+        #If out_dir is not a string, return error
+        if type(out_dir)!=str:
+            raise TypeError("'out_dir' must be of type 'str'.")
+        #If workers is specified and it is not a positive int, return error
+        if (workers!=None) and (type(workers)!=int or workers<1):
+            raise ValueError("'workers' must be a positive 'int' or None.")
+        #If fmt is not one of the acceptable options, return error
+        if fmt not in ("png", "svg"):
+            raise ValueError("Unrecognized fmt input. Acceptable values are 'png' and 'svg'.")
+        os.makedirs(out_dir, exist_ok=True)
+
+        #Run each distinct query once, and compute the project counts of every chart from its output
+        outputs, tasks = {}, []
+        for spec in specs:
+            query = spec.get("query")
+            key = None if query==None else repr(sorted(query.items()))
+            if key not in outputs:
+                outputs[key] = self._full_data() if query==None else self._get_projects(**query)
+            output_df = outputs[key]
+            if output_df is None:
+                print(f"WARNING! No projects to plot in chart '{spec['name']}'. It was not saved.")
+                continue
+            for col, values in (spec.get("where") or {}).items():
+                if col not in output_df.columns:
+                    raise KeyError(f"'{col}' in 'where' of chart '{spec['name']}' is not a column of the data plotted.")
+                output_df = output_df.loc[output_df[col].isin(values if type(values)==list else [values])]
+            plot_df, plot_by_var = self._plot_data(output_df.copy(deep=False), spec["plot_by"])
+            tasks.append((plot_df, plot_by_var, self._plot_size(plot_df[plot_by_var].nunique()),
+                          os.path.join(out_dir, spec["name"]+"."+fmt)))
+
+        #Draw the charts, each on a figure of its own, so that processes share no pyplot state
+        if (workers==None) or (len(tasks)==0):
+            paths = [_render_chart(*task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                paths = list(executor.map(_render_chart, *zip(*tasks)))
+        print(f"{len(paths)} charts saved to {out_dir}.")
+        return paths
+    ################################################
+    
+    def _plot_output(self, output_df, plot_by, save_name=None):
+        #Plot output_df by plot_by; shared by plot_last and Session.plot_last
+
+        #If save_name is specified and it's not a string, return error
+        if save_name!=None and type(save_name)!=str:
+            raise TypeError("'save_name' must be of type 'str' or None.")
+
+        #import required libraries
+        from matplotlib import pyplot as plt
+
+        plot_df, plot_by_var = self._plot_data(output_df, plot_by)
+
+        #Create plot canvass
+        fig, ax = plt.subplots(figsize=self._plot_size(plot_df[plot_by_var].nunique()))
+
+        #Draw the horizontal bar chart
+        _draw_bar_chart(ax, plot_df, plot_by_var)
+
+        fig.savefig(save_name, bbox_inches='tight') if save_name!=None else plt.show()
+
+        if save_name!=None:
+            print("Plot saved.")
+    ################################################
+    ################################################
+    ################################################
+
+class Sectors(_CodeData):
+    
+    _spec = _SECTOR_SPEC
+    
+    def load_data(self, lazy=False, memory_budget=None, quality=None, out_of_core=False, memory_limit=None):
+        """
+        Description
+        ----------
+        Loads all available data on WB project sectors.
+        Data loading occurs in place and does not support variable assignment.
+        If the object was created with as_of, data is loaded from the snapshot store of past downloads instead.
+        Data is read from a local mirror of the most recent download in the IEG N:\ drive folder (see DataSource), so loading reads from local disk.
+        Before loading, the listing of the N:\ drive folder is checked, and a new or changed download is copied to the mirror and checked against
+        the SHA-256 checksum of the source. The checksum, and the size and modification time of the verified copy, are kept next to it in .sha256 and .stat files;
+        a mirrored download is only hashed again at load if it no longer matches its .stat file.
+        If the N:\ drive cannot be reached, the last mirrored download is loaded with a warning, so N:\ drive access is only needed for new downloads.
+        DataSource.start_sync copies new downloads in the background, so that they are already mirrored when data is loaded.
+        Downloads may be Excel workbooks, or CSV or Parquet files, one per sheet; the format is detected from the file name.
+        Reading a workbook typically takes 1-2 minutes, and CSV and Parquet files are read faster.
         
-        #Record command call in the last_command attribute
-        self.__last_command = "count_sectors"
-        
-        #If summarize is not boolean, return error
-        if type(summarize)!=bool:
-            raise TypeError("'summarize' must be of type 'bool'.")
-        
-        #Call the get_sectors command on the pid_list and save output
-        temp_data = self.get_sectors(pid_list)
-        
-        #If get_sectors yielded an empty df, report it and exit
-        if self.__last_output_exist == False:
-            print("")
+        Parameters
+        ----------
+        lazy : bool, default False
+            If True, loads only the metadata columns used by query filters and default outputs, through the snapshot store (see SnapshotStore),
+            adding the download to the store first if needed. Other metadata columns are read from the store on first access,
+            e.g. by show_meta=True or copy_data. Requires pyarrow.
+        memory_budget : int or None, default None
+            Used if lazy is True. If int, the number of bytes that metadata columns read on first access may take up;
+            the least recently used columns are dropped beyond it, and read again when next needed. If None, they are kept.
+        quality : str or None, default None
+            What to do with projects flagged by the data quality checks run at load (see quality_report).
+            If None, flagged projects are loaded as they are.
+            If "exclude", flagged projects are not loaded.
+            If "repair", repeated sector code rows are dropped and sector percentages are rescaled to sum to 100; projects with missing metadata or no code rows are loaded as they are.
+        out_of_core : bool, default False
+            If True, data is held on disk rather than in memory, for data too large to load at once. The download is added to the snapshot store
+            if needed, and split by project into partitions on disk, grouped by approval FY, once per download and memory_limit. get_projects, get_sectors,
+            count_sectors and main_sector then read one partition at a time, get_projects only those of the FYs queried, and return an iterator of DataFrames, one per partition with data,
+            and trend and cooccurrence add up their result over the partitions. Other query methods are not available. Requires pyarrow.
+        memory_limit : int or None, default None
+            Used if out_of_core is True. The number of bytes that a query may hold in memory at once.
+            Partitions are sized to a quarter of it, and reading a partition that takes up more than half of it raises MemoryError.
+            If None, OUT_OF_CORE_MEMORY is used.
         
-        #Otherwise, begin computation sequence for count_sect
+        Returns
+        ----------
+        Creates a DataFrame object that is loaded into the private data attribute of a Sectors object.
+        To access this DataFrame, use data_info or copy_data.
+        """
+        
+        #Record command call in the last_command attribute
+        self._last_command = "load_data"
+        
+        #If lazy is not boolean, return error
+        if type(lazy)!=bool:
+            raise TypeError("'lazy' must be of type 'bool'.")
+        #If memory_budget is specified and it is not a positive int, return error
+        if (memory_budget!=None) and (type(memory_budget)!=int or memory_budget<1):
+            raise ValueError("'memory_budget' must be a positive 'int' or None.")
+        #If quality is specified and it is not an acceptable option, return error
+        if quality not in [None, "exclude", "repair"]:
+            raise ValueError("Unrecognized quality input. Acceptable values are None, 'exclude' and 'repair'.")
+        #If out_of_core is not boolean, return error
+        if type(out_of_core)!=bool:
+            raise TypeError("'out_of_core' must be of type 'bool'.")
+        #If lazy and out_of_core are both True, return error
+        if lazy and out_of_core:
+            raise ValueError("'lazy' and 'out_of_core' cannot both be True.")
+        #If memory_limit is specified and it is not a positive int, return error
+        if (memory_limit!=None) and (type(memory_limit)!=int or memory_limit<1):
+            raise ValueError("'memory_limit' must be a positive 'int' or None.")
+        
+        #if data has already been loaded to the object
+        if self._dataloaded == True:
+            print("Data already loaded to this object.")
+        
+        #if data is to be held on disk, split it into partitions instead of loading it
+        elif out_of_core:
+            self._load_partitions(memory_limit, quality)
+        
+        #if data not yet loaded to the object, begin data loading sequence
         else:
-            #Import the required libraries
-            from collections import defaultdict
-            import numpy as np
-            import pandas as pd
             
-            #--------------------------------------------#
+            #record start time
+            import time
+            start_time = time.time()                             
             
-            #Replace sector name with sector code if sector name is missing, creating a new column
-            temp_data['Sector Name_'] = np.where(temp_data['Sector Long Name'].isnull(),
-                                                    temp_data['Sector Code'],
-                                                    temp_data['Sector Long Name'])
+            #alert user that sequence to load data has begun
+            print("Loading WB project sectors data." + "\n" +  
+                  "This typically takes 1-2 minutes. Please wait...")  
             
-            #--------------------------------------------#
+            #specify the columns of the sectors data to be imported
+            sector_cols = list(_SECTOR_SPEC["sheet_cols"])
+            
+            #if a past download is requested, or only the core columns are to be loaded, import it from the snapshot store
+            if (self._as_of!=None) or lazy:
+                store = SnapshotStore()
+                as_of = self._as_of
+                #in lazy mode, the most recent download is first added to the snapshot store, unless it is already in it
+                if as_of==None:
+                    data_file_to_import, download_date = self._source.latest_file()
+                    as_of = store.ingest(data_file_to_import)
+                    del(data_file_to_import)
+                meta_data, snapshot_date = store.load("metadata", as_of, columns=_CORE_META_COLS if lazy else None)
+                sector_data, snapshot_date = store.load("sectors", as_of, columns=sector_cols)
+                if self._as_of!=None:
+                    download_date = snapshot_date
+            
+            #otherwise, mirror the most recent download in the N drive folder to local disk and import it
+            else:
+                data_file_to_import, download_date = self._source.latest_file()
+                sheets = _read_sheets(data_file_to_import, {"metadata":None, "sectors":sector_cols})
+                meta_data, sector_data = sheets.pop("metadata"), sheets.pop("sectors")
+                del(data_file_to_import)
             
-            #Create a dictionary that stores all the sub-sector codes for each PID 
-            PIDs_n_sectors = defaultdict(dict)
+            #drop unnecessary metadata columns
+            meta_data.drop(['Project Status Code','Lending Instrument Code'], axis=1, inplace=True, errors="ignore")                        
             
-            #for each pid, sector code and sector percentage combination in the data
-            for pid,sector,pct in zip(temp_data['Project Id'],temp_data['Sector Name_'],temp_data['Sector Percentage']):
-                #Update the PIDs_n_sectors using PID as key and dict of sector code and sector percentage as value
-                PIDs_n_sectors[pid].update({sector:pct})
-                
-            #--------------------------------------------#
+            #merge the two datasets and compute sector percentage as a percentage
+            sector_and_meta = sector_data.merge(meta_data, on="Project Id", how="outer", validate="m:1")
+            sector_and_meta['Sector Percentage'] = sector_and_meta['Sector Percentage'] * 100
             
-            #Create a dictionary that stores the number of sub-sectors each PID is mapped to
-            sector_counts = defaultdict(int) 
+            #check the integrity of the merged data, then exclude or repair the flagged projects if requested
+            self._quality = _quality_report(sector_and_meta, _SECTOR_SPEC)
+            sector_and_meta = _apply_quality(sector_and_meta, self._quality, _SECTOR_SPEC, quality)
             
-            #for each PID key-value pairs in the PIDs_n_sectors dict
-            for pid,sub_sectors in PIDs_n_sectors.items():
-                
-                #collect all the sub-sector codes for that pid
-                all_sub_sectors = set(sub_sectors.keys())
-                
-                #discard null values from the set
-                all_sub_sectors.discard(np.nan)
-                
-                #Count the number of unique sector codes mapped to that PID and assign it to the pid key
-                sector_counts[pid] = len(all_sub_sectors)
-                
-            #--------------------------------------------#
+            #save the merged data to the data attribute of the object and set .dataloaded to True
+            self._data = sector_and_meta                                    
+            self._dataloaded = True                                    
             
-            #Convert the output to a dataframe
-            sector_counts = dict(sector_counts)
-            temp_df = pd.DataFrame.from_dict(sector_counts, 
-                                                   orient="index",
-                                                   columns=["Sector Counts"])
-            output_df = temp_df.reset_index()
-            output_df.rename(columns={"index":"PID"}, inplace=True)
+            #build the project and sector code indexes used by boolean code expressions
+            self._index = _CodeIndex(self._data, _SECTOR_SPEC)
             
-            #--------------------------------------------#
+            #in lazy mode, the other metadata columns are read from the snapshot store on first access
+            if lazy:
+                self._columns = _ColumnCache(store, snapshot_date, self._index, list(sector_cols)+store.columns("metadata", snapshot_date), memory_budget)
+                self._index.column_cache = self._columns
             
-            #If summarize is set to True
-            if summarize:
-                #Create pivot table of the number of PIDs that have each sector count
-                plot_df = output_df.pivot_table(values="PID",index="Sector Counts",aggfunc="count")
-                plot_df.reset_index(inplace=True)
-                plot_df.rename(columns={"PID":"Frequency"}, inplace=True)
-                plot_df.sort_values(['Sector Counts'], ascending=True, inplace=True)
-                
-                from matplotlib import pyplot as plt 
-                
-                #Create plot canvass
-                fig, ax = plt.subplots()
-                
-                #Create horizontal bar chart, using a container to save the chart
-                fig_con = ax.barh(plot_df['Sector Counts'],plot_df["Frequency"])
-                
-                #Add data label
-                ax.bar_label(fig_con)
-                
-                # make the x ticks integers, not floats
-                x_label_int = []
-                locs, labels = plt.xticks()
-                for each in locs:
-                    x_label_int.append(int(each))
-                plt.xticks(x_label_int)
-                
-                #Add title to X-Axis
-                ax.set_xlabel("Project count")
-                
-                #Add title to Y-Axis
-                ax.set_ylabel("Number of sectors projects are mapped to")
-                ax.invert_yaxis()
-                
-                #Add chart title
-                ax.set_title("Project counts, by Sector Counts")
-                
-                plt.show()
-                    
-            self.__last_output = output_df
-            self.__last_output_exist = True
-            #Re-record last command to overwrite that recorded by the get_sectors call
-            self.__last_command = "count_sectors"
-            return output_df
+            #delete residual files
+            del(meta_data)
+            del(sector_data)
             
-    ################################################
+            #record end time and calculate elapsed time
+            end_time = time.time() 
+            elapsed_time = end_time-start_time
+            
+            #Alert users that data was loaded successfully
+            print("Data loading successful!" + "\n" +
+                  f"Loaded data contains {self._data.shape[0]} rows and {self._data['Project Id'].nunique()} unique WB projects." + "\n" +
+                  f"Total loading time: {round(elapsed_time, 1)} seconds." + "\n" +
+                  "Data source: World Bank Standard Reports." + "\n" +
+                  f"Data download date: {download_date}.")
+            
+            #Alert users to projects flagged by the data quality checks
+            if not self._quality.empty:
+                print(f"WARNING! {self._quality['Project Id'].nunique()} projects failed data quality checks. See quality_report().")
+    ################################################        
     
-    def main_sector(self, pid_list, threshold=None, summarize=False):
+    def unload_data(self): 
         """
         Description
         ----------
-        Returns the main sector that each project in the specified list is mapped to.
-        Supports variable assignment.
-        Data must already be loaded into the Sectors object.
+        Deletes the DataFrame, if any, that has been loaded into the data attribute of a Sectors object.
+        Data unloading occurs in place and does not support variable assignment.
         
         Parameters
         ----------
-        pid_list : list
-            The ID numbers of projects for which sector codes are to be returned. 
-        threshold : int or None, default None
-            If None, main sector is the sector that accounts for the largest percentage of a project. If multiple sectors account for the largest share of the project, the main sub-sector for that project is ambiguous.
-            If int, the main sub-sector is the sub-sector that accounts for a percentage value greater than or equal to the threshold value.
-            For example, if threshold = 70, any sub-sector that account at least 70% of a project is its main sub-sector. If no sub-sector accounts for up to 70%, the main sub-sector is ambiguous.
-            CAUTION: if threshold is 50 or less, multiple sub-sectors may account for a percentage greater than or equal to threshold value, but only one will be returned.
-        summarize : bool, default False
-            If True, returns frequency counts of each main sub-sector.
+        None
         
         Returns
         ----------
-        DataFrame object
+        None
         """
         
         #Record command call in the last_command attribute
-        self.__last_command = "main_sector"
-    
-        #--------------------------------------------#
-    
-        #If summarize is not a boolean, return error
-        if type(summarize)!=bool:
-            raise TypeError("'summarize' must be of type 'bool'.")
-            
-        #If Threshold is specified, validate the specified value
-        if threshold!=None:
-            #If threshold is not an integer, return error
-            if type(threshold)!=int:
-                raise TypeError("'threshold' must be of type 'int'.")
-            #If threshold is an integer but not in range 0-101
-            elif not threshold in range(0,101):
-                raise ValueError("'threshold' is outside expected range of 0 to 100.")
-            #If threshold is 50 or less, warn user of potential result unreability
-            elif threshold<51:
-                print(f"WARNING! A 'threshold' value of {threshold}% may give rise to multiple main sectors, but only one will be returned.")
-            
-        #--------------------------------------------#
-        
-        #Call the get_sectors command on the pid_list and save output
-        temp_data = self.get_sectors(pid_list)
-        
-        #If get_sectors yielded an empty df, report it and exit
-        if self.__last_output_exist == False:
-            print("")
-        #Otherwise, begin computation sequence for main sector
-        else:
-            
-            #Import the required libraries
-            from collections import defaultdict
-            import numpy as np
-            import pandas as pd
-            
-            #--------------------------------------------#
-            
-            #Replace sector name with sector code if sector name is missing, creating a new column
-            temp_data['Sector Name_'] = np.where(temp_data['Sector Long Name'].isnull(),
-                                                    temp_data['Sector Code'],
-                                                    temp_data['Sector Long Name'])
-            
-            #--------------------------------------------#
-            
-            #Create a dictionary that stores the sub-sectors for each PID 
-            PIDs_n_sectors = defaultdict(dict)
-            
-            #For each pid, sector code and sector percentage combination in the data
-            for pid,sector,pct in zip(temp_data['Project Id'],temp_data['Sector Name_'],temp_data['Sector Percentage']):
-                #Update the PIDs_n_sectors using PID as key, and sector code and sector percentage as a dict
-                PIDs_n_sectors[pid].update({sector:pct})
-                
-            #--------------------------------------------#
-            
-            #Create a dictionary that stores the dominant sub-sector for each PID
-            dom_sector = defaultdict(dict)
-        
-            #If user wants the sector with the highest percentage, whatever that percentage is
-            if threshold==None:
-                
-                #For each PID and its sub-sector dict in PIDs_n_sectors
-                for pid,sub_sectors in PIDs_n_sectors.items():
-                    
-                    #unpack the sub-sector dict into sector names and pct
-                    names,pct_values = (list(sub_sectors.keys()),list(sub_sectors.values()))
-                    
-                    #Get the maximum sector percentage
-                    max_pct = max(pct_values)
-                    
-                    #Determine if there are multiple max sector percentages
-                    weak_max = True if pct_values.count(max_pct)>1 else False
-                    
-                    #If max is a weak max, indicate that there is no dominant sector
-                    if weak_max:
-                        dom_dict = {"AMBIGUOUS":np.nan}
-                    #else, collect the dominanct sector and pct in a dict
-                    else:
-                        max_pct_idx = pct_values.index(max_pct)
-                        dom_dict = {names[max_pct_idx]:max_pct}
-                    
-                    #Assign dom_dict to that pid
-                    dom_sector[pid] = dom_dict
-            
-            #If user defines main sector as sector whose percentage is higher than a given threshold
-            else:
-                
-                #For each PID and its sub-sector dict in PIDs_n_sectors
-                for pid,sub_sectors in PIDs_n_sectors.items():
-                    
-                    #Initially designate each pid as a multi-sector project
-                    dom_sector[pid] = {"AMBIGUOUS":np.nan}
-                    
-                    #Then, unpack the sub-sector dict into sector names and pct
-                    names,pct_values = (list(sub_sectors.keys()),list(sub_sectors.values()))
-                    
-                    #If project is mapped to only one sector, then invariably that sector code is the dominant one for that project
-                    if len(names)==1:
-                        #create dict for the dominant sector
-                        dom_dict = {names[0]:pct_values[0]}
-                        #Re-assign dom_dict to that project
-                        dom_sector[pid]=dom_dict
-                    
-                    #If project is mapped to more than one sector code
-                    else:
-                        
-                        #for each key-value pair in the sub-sector dict
-                        for k,v in sub_sectors.items():
-                            
-                            #If v >= threshold
-                            if v>=threshold:
-                                #create dict for the dominant sector
-                                dom_dict = {k:v}
-                                #Re-assign the dict to that project
-                                dom_sector[pid]=dom_dict
-                            #continue to the next iteration in loop
-                            continue
-                    continue
-                            
-            #Convert dom_sector to regular dict
-            dom_sector_dict = dict(dom_sector)
-            
-            #--------------------------------------------#
-            
-            #Now, convert the nested dom_sector_dict to a pandas dataframe
-            pids = []
-            dominant_sectors = []
-            
-            for pid,d in dom_sector_dict.items():
-                pids.append(pid)
-                dominant_sectors.append(pd.DataFrame.from_dict(d, orient='index'))
+        self._last_command = "unload_data"
         
-            output_df = pd.concat(dominant_sectors, keys=pids)
-            output_df.reset_index(inplace=True)
-            output_df.rename(columns={'level_0':'PID',
-                                      'level_1':'Main Sector', 
-                                      0:'Sector Percentage'}, 
-                             inplace=True)
-            
-            #--------------------------------------------#
-            
-            #If summarize is set to True
-            if summarize:
-                #Create pivot table of the number of PIDs that have each sector count
-                plot_df = output_df.pivot_table(values="PID",index="Main Sector",aggfunc="count")
-                plot_df.rename(columns={"PID":"Frequency",}, inplace=True)
-                plot_df.reset_index(inplace=True)
-                plot_df.sort_values(['Frequency'], ascending=False, inplace=True)
-                
-                from matplotlib import pyplot as plt
-                
-                #Create plot canvass
-                if plot_df["Main Sector"].nunique() in range(20,40):
-                    fig, ax = plt.subplots(figsize=(7,7))
-                elif plot_df["Main Sector"].nunique()>40:
-                    fig, ax = plt.subplots(figsize=(10,10))
-                else:
-                    fig, ax = plt.subplots()
-                
-                #Create horizontal bar chart, using a container to save the chart
-                fig_con = ax.barh(plot_df['Main Sector'], plot_df["Frequency"])
-                
-                #Add data label
-                ax.bar_label(fig_con)
-                
-                # make the x ticks integers, not floats
-                x_label_int = []
-                locs, labels = plt.xticks()
-                for each in locs:
-                    x_label_int.append(int(each))
-                plt.xticks(x_label_int)
-                
-                #Add title to X-Axis
-                ax.set_xlabel("Project count")
-                
-                ax.invert_yaxis()
-                
-                #Add chart title
-                ax.set_title("Project count, by Main Sectors")
-                
-                plt.show()
-                    
-            self.__last_output = output_df
-            self.__last_output_exist = True
-            #Re-record last command to overwrite that recorded by the get_sectors call
-            self.__last_command = "main_sector"
-            return output_df
-    
+        #Delete internal data and reset all internal attributes
+        self._data = None
+        self._dataloaded = False
+        self._last_output = None
+        self._last_output_exist = False
+        self._index = None
+        self._columns = None
+        self._quality = None
+        self._partitions = None
+        print("Data unloading complete.") 
     ################################################
-    
-    def save_last(self, save_name=None):
- 
+         
+    def data_info(self):
         """
         Description
         ----------
-        Exports the output from the most recent call of a get_projects or get_sectors command.
-        Output is saved in .xlsx format.
+        Prints summary information on the DataFrame, if any, that has been loaded into the data attribute of a Sectors object.
+        Variable assignment not supported.
         
         Parameters
         ----------
-        save_name : str or None, default None
-            Name exported data should be saved with.
-            If None, exported data is saved with name "Sector_extract".
-            Overwrites any pre-existing file of the same name in the save folder.
+        None
         
         Returns
         ----------
         None
         """
         
-        try:
-            #Record command in the last_command attribute
-            self.__last_command = "save_last"
-            
-            #If there is no last output, alert user
-            if self.__last_output_exist == False:
-                print("No output to save.")
-            #If there is last output
-            else:
-                #Check if save_name is specified
-                if save_name==None:
-                    save_name = "Sector_extract.xlsx"
-                else:
-                    #If specified save_name is not a str, return error
-                    if type(save_name)!=str:
-                        raise TypeError("'save_name' must be of type 'str'.")
-                    #Add fill extension to the save_name
-                    save_name = save_name + ".xlsx"
-                #Extract the output df
-                output_df = self.__last_output 
-                #Save it to save_name
-                output_df.to_excel(save_name,index=False)
-                print("Data extract saved.")
-        except PermissionError:
-            print("ERROR! Save was unsuccessful. A file with the same name is currently open.")
-    
-    ################################################   
-
-    def plot_last(self, plot_by="sectors", save_name=None):
-        
-        """
-        Description
-        ----------
-        Plots the output from the most recent call of a get_projects or get_sectors command.
-        Output can be saved in .png format.
+        #Record command call in the last_command attribute
+        self._last_command = "data_info"
         
-        Parameters
-        ----------
-        plot_by : str, default "sectors"
-            The grouping variable over which project counts will be plotted. 
-            Default value is "sectors", but other acceptable values are "GP", "FY", "Status", "region" and "Instrument".
-        save_name : str or None, default None
-            If str, plot created will be saved as a .png file with the string value as the file name.
-            Plot will be saved in the current working directory, and will overwrite any pre-existing file of the same name in the save folder.
-            If None, plot created will not be saved locally.
+        #if data is held on disk, alert user
+        if self._partitions!=None:
+            print("Not available for data loaded with out_of_core=True.")
         
-        Returns
-        ----------
-        None
-        """
-            
-        #If command not preceeded by get_projects or get_sectors, alert user
-        if ((self.__last_command!= "get_projects") and 
-              (self.__last_command!= "get_sectors") and
-              (self.__last_command!="plot_last")):
-            print("Command must be preceded by 'get_projects' or 'get_sectors'.")
-            
-        #If the previous command did not return a valid output, alert user
-        elif self.__last_output_exist == False:
-            print("No output to plot.")
+        #if data has been loaded to the object, return info of the df
+        elif self._dataloaded:                      
+            print(self._full_data().info())            
         
-        #Else, begin data plotting sequence
-        else:
-            
-            #If save_name is specified and it's not a string, return error
-            if save_name!=None and type(save_name)!=str:
-                raise TypeError("'save_name' must be of type 'str' or None.")
-            
-            #Extract the output_df from the last command
-            output_df = self.__last_output 
-            
-            #import required libraries
-            import numpy as np
-            from matplotlib import pyplot as plt
-            
-            #Replace sector name with sector code if sector name is missing, creating a new column
-            output_df['Sector Name_'] = np.where(output_df['Sector Long Name'].isnull(),
-                                                    output_df['Sector Code'],
-                                                    output_df['Sector Long Name'])
-            
-            #Convert the plot_by input to variable in the output_df data
-            plot_by_dict = {"sectors":"Sector Name_",
-                           "gp":"Lead GP/Global Themes",
-                           "fy":"Project Approval FY",
-                           "region":"Region Name",
-                           "instrument":"Lending Instrument Long Name",
-                           "status":"Project Status Name"}
-            
-            #Convert plot_by input to lower. If operation fails, report that it is not one of the acceptable options.  
-            try:
-                plot_by_var = plot_by_dict[plot_by.lower()]
-            except:
-                raise ValueError("'plot_by' value is unrecognized. Acceptable values are 'sectors', 'GP', 'FY', STatus', 'Region', and 'Instrument'.")
-            
-            if plot_by_var not in (output_df.columns):
-                raise KeyError("'plot_by' value missing in output from previous command. Consider setting the 'show_meta' argument in previous command to True.")
-            
-            #Count the number of projects missing data for the plot_by_input
-            missing_df = output_df[output_df[plot_by_var].isna()].copy()
-            missing_count = missing_df["Project Id"].nunique()
-            
-            #If missing_FY_count > 0, notify user of of the impending exclusion
-            if missing_count>0:
-                print(f"WARNING! {missing_count} project(s) with missing values for {plot_by_var} got excluded from the plot.")
-                
-            #Create pivot table of project count by plot_by_var
-            plot_series = output_df.groupby(plot_by_var)["Project Id"].nunique()
-            
-            #Reset the index to transform plot series to dataframe
-            plot_df = plot_series.reset_index()
-            
-            #Sort data accordingly
-            if plot_by_var == "Project Approval FY":
-                plot_df.sort_values(plot_by_var, ascending=False, inplace=True)
-            else:
-                plot_df.sort_values("Project Id", ascending=True, inplace=True)
-                
-            #Create plot canvass
-            if plot_df[plot_by_var].nunique() in range(20,40):
-                fig, ax = plt.subplots(figsize=(7,7))
-            elif plot_df[plot_by_var].nunique()>40:
-                fig, ax = plt.subplots(figsize=(10,10))
-            else:
-                fig, ax = plt.subplots()
-            
-            #Create horizontal bar chart, using a container to save the chart
-            fig_con = ax.barh(plot_df[plot_by_var],plot_df["Project Id"])
-            
-            #Add data label
-            ax.bar_label(fig_con)
-            
-            # make the x ticks integers, not floats
-            x_label_int = []
-            locs, labels = plt.xticks()
-            for each in locs:
-                x_label_int.append(int(each))
-            plt.xticks(x_label_int)
-            
-            if plot_by_var == "Project Approval FY":
-                ax.invert_yaxis()
-                
-            #Add title to X-Axis
-            ax.set_xlabel("Project count")
-            
-            #Add chart title
-            ax.set_title(f"Project count, by {plot_by_var}")
-            
-            fig.savefig(save_name, bbox_inches='tight') if save_name!=None else plt.show()
-            
-            if save_name!=None:
-                print("Plot saved.")
-            
-            #Record command in the last_command attribute
-            self.__last_command = "plot_last"
-    
-    ################################################  
-    ################################################
-    ################################################
-
-class Themes():
-    
-    #Initialize the object
-    def __init__(self):
-        self.__data = None
-        self.__dataloaded = False
-        self.__last_command = None
-        self.__last_output = None
-        self.__last_output_exist = False
-        print("Themes object created.")
-    ################################################
-    
-    def __bool__(self):
-        """
-        Description
-        -------
-        Boolean representation of a Themes object.
-        Returns True if data has been loaded to a Themes object.
-        """
-        return self.__dataloaded
-    ################################################
-    
-    def __str__(self):
-        """
-        Description
-        -------
-        String representation of a Themes object.
-        """
-        return ("Object class: Themes. " +
-                f"Holds data: {self.__dataloaded}. " +
-                f"Most recent call: {self.__last_command}.")
+        #Otherwise, alert user that data has not been loaded yet
+        else:                                      
+            print("Data not yet loaded.")                        
     ################################################
     
-    def load_data(self):
-        
+    def copy_data(self):
         """
         Description
         ----------
-        Loads all available data on WB project themes.
-        Data loading occurs in place and does not support variable assignment.
-        User access to IEG N:\ drive is required for successful execution. 
-        Data loading typically takes 2-4 minutes.
-        Loading time over 4 minutes is an indication that attempt to access to IEG N:\ drive has failed.
-        
-        Parameters
-        ----------
-        None
-        
-        Returns
-        ----------
-        Creates a DataFrame object that is loaded into the private data attribute of a Themes object.
-        To access this DataFrame, use data_info or copy_data.
-        """
-        
-        #Record function call in the last_command attribute
-        self.__last_command = "load_data"
-        
-        #if data has already been loaded to the object
-        if self.__dataloaded == True:
-            print("Data already loaded to this object.")
-        
-        #if data not yet loaded to the object
-        else:   
-            
-            #record start time
-            import time
-            start_time = time.time()                             
-            
-            #let user know that sequence to load data has begun
-            print("Loading WB project Themes data." + "\n" +  
-                  "This typically takes 2-4 minutes. Please wait...")  
-            
-            #specify the name and file path of the Themes data to be imported
-            import os
-            import pandas as pd   
-            
-            #list all the files in the N drive folder, and choose the relevant file to import
-            file_list = os.listdir("N:\\BASE_DATA")
-            data_file = [x for x in file_list if "Project_data" in x][0]
-            data_file_info = data_file.split('.')
-            data_file_to_import = "N:\\BASE_DATA\\"+data_file
-            
-            #import projects metadata
-            meta_data = pd.read_excel(data_file_to_import, sheet_name="metadata")
-            meta_data.drop(['Project Status Code','Lending Instrument Code'], axis=1, inplace=True)                         
-            
-            #import the Themes data
-            theme_data = pd.read_excel(data_file_to_import, sheet_name="themes",     
-                          usecols=['Project Id', 'Theme Code', 'Theme Level', 'Theme Name', 
-                                   'Theme Percentage', 'Theme Lending Commitment Amount', 'Theme Portfolio Net Commitment Amount'])
-            
-            #merge the two datasets
-            theme_and_meta = theme_data.merge(meta_data, on="Project Id", how="outer", validate="m:1")
-            theme_and_meta['Theme Percentage'] = theme_and_meta['Theme Percentage'] * 100
-            
-            #save the merged data to the data attribute of the object and set .dataloaded to True
-            self.__data = theme_and_meta                                    
-            self.__dataloaded = True                                    
-            
-            #delete residual files
-            del(meta_data)
-            del(theme_data)
-            del(data_file_to_import)
-            
-            #record end time and calculate elapsed time
-            end_time = time.time() 
-            elapsed_time = end_time-start_time
-            
-            #Alert users that data was loaded successfully
-            print("Data loading successful!" + "\n" +
-                  f"Loaded data contains {self.__data.shape[0]} rows and {self.__data['Project Id'].nunique()} unique WB projects." + "\n" +
-                  f"Total loading time: {round(elapsed_time, 1)} seconds." + "\n" +
-                  "Data source: World Bank Standard Reports." + "\n" +
-                  f"Data download date: {data_file_info[2]}.")
-    ################################################
-    
-    def unload_data(self):
-        
-        """
-        Description
-        ----------
-        Deletes the DataFrame, if any, that has been loaded into the data attribute of a Themes object.
-        Data unloading occurs in place and does not support variable assignment.
-        
-        Parameters
-        ----------
-        None
-        
-        Returns
-        ----------
-        None
-        """
-        
-        #Record function call in the last_command attribute
-        self.__last_command = "unload_data"
-        
-        #Delete internal data and reset all internal attributes
-        self.__data = None
-        self.__dataloaded = False
-        self.__last_output = None
-        self.__last_output_exist = False
-        print("Data unloading complete.") 
-    ################################################
-         
-    def data_info(self):
-        """
-        Description
-        ----------
-        Prints summary information on the DataFrame, if any, that has been loaded into the data attribute of a Themes object.
-        Variable assignment not supported.
-        
-        Parameters
-        ----------
-        None
-        
-        Returns
-        ----------
-        None
-        """
-        
-        #Record function call in the last_command attribute
-        self.__last_command = "data_info"
-        
-        #if data has been loaded to the object, return info of the df
-        if self.__dataloaded:                      
-            print(self.__data.info())            
-        
-        #Otherwise, alert user that data has not been loaded yet
-        else:                                      
-            print("Data not yet loaded.")                        
-    ################################################
-    
-    def copy_data(self):
-        """
-        Description
-        ----------
-        Returns a copy of the DataFrame, if any, that has been loaded into the data attribute of a WBTheme object.
-        Supports variable assignment.
+        Returns a copy of the DataFrame, if any, that has been loaded into the data attribute of a Sectors object.
+        Supports variable assignment.
         
         Parameters
         ----------
@@ -1282,49 +1207,54 @@ class Themes():
         DataFrame object
         """
         
-        #Record function call in the last_command attribute
-        self.__last_command = "copy_data"
+        #Record command call in the last_command attribute
+        self._last_command = "copy_data"
+        
+        #if data is held on disk, alert user
+        if self._partitions!=None:
+            print("Not available for data loaded with out_of_core=True.")
         
         #if data has been loaded to the object, return the data
-        if self.__dataloaded:                 
-            return self.__data
+        elif self._dataloaded:                 
+            return self._full_data()
         
         #Otherwise, alert user that data has not been loaded yet                      
         else:                                       
             print("Data not yet loaded.")
-    ################################################    
-        
+    ################################################       
+    
     def get_projects(self, 
-                     theme_codes,
+                     sector_codes,
                      min_pct=1,
                      start_FY=None, stop_FY=None,
                      product_type=None, 
                      project_status=None,
                      include_AF=True,
                      show_all=False,
-                     show_meta=False):
+                     show_meta=False,
+                     portfolio=None):
         
         """
         Description
         ----------
-        Returns projects that are mapped to the specified theme codes and that satisfy other optional criteria.
+        Returns projects that are mapped to the specified sector codes and that satisfy other optional criteria.
         Supports a variable assignment.
-        Data must already be loaded into the Themes object.
+        Data must already be loaded into the Sectors object.
         
         Parameters
         ----------
-        theme_codes : list
-        Returned projects must be mapped to one or more theme codes in theme_codes.
-        
+        sector_codes : list
+            Returned projects must be mapped to one or more sector codes in sector_codes.
+            Only sub-sector level codes are accepted.
         min_pct : int, default 1
-            Indicates the minimum percentage of a project that at least one theme code in theme_codes must account for before that project will be returned.
-            If project's theme codes matches one or more theme codes in theme_codes but none of the matching theme codes account for up to the min_pct value, such a project will not be returned. 
+            Indicates the minimum percentage of a project that at least one sector code in sector_codes must account for before that project will be returned.
+            If project's sector codes matches one or more sector codes in sector_codes but none of the matching sector codes account for up to the min_pct value, such a project will not be returned. 
         start_FY : int or None, default None
-            If int, returns projects approved in or after the specified value of start_FY, and projects with missing Approval FY data.
+            If int, returns projects approved in or after the specified value of start_FY, and projects with missing approval FY data.
             If None, returns all eligible projects, regardless of approval FY.
         stop_FY : int or None, default None
-            If int, returns projects approved in or before the specified value of stop_FY, and projects with missing Approval FY data.
-            If None, returns all eligible projects, regardless of approval FY.    
+            If int, returns projects approved in or before the specified value of stop_FY, and projects with missing approval FY data.
+            If None, returns all eligible projects, regardless of approval FY.
         product_type : list or None, default None
             If list, returns projects whose product type matches any of the specified values in product_types.
             Automatically excludes projects with missing product type data.
@@ -1332,95 +1262,125 @@ class Themes():
                 "L": for lending products,
                 "A": for AAA products,
                 "S": for standard products, or any combination of these. 
-            If None, returns all eligible projects regardless of product type.
+            If None, returns all eligible projects, regardless of product type.
         project_status : list or None, default None
-            If list, returns projects with project status matches any of the specified values in project_status.
+            If list, returns projects whose completion status matches any of the specified values in project_status.
             Automatically excludes observations with missing project status data.
-            Acceptable values are as follows: "Active", "Canceled", "Closed", "Dropped", "Draft", "Legacy Dropped", "Legacy", and "Pipeline".
+            Acceptable values are: "Active", "Canceled", "Closed", "Dropped", "Draft", "Legacy Dropped", "Legacy", and "Pipeline".
             If None, return all eligible projects regardless of project status.
+        include_AF : bool, default True
+            If True, eligible additional financing projects will be included in the output.
         show_all : bool, default False
-            If True, returns all theme codes that matching projects are mapped to, rather than those that match theme_codes only.
+            If True, returns all sector codes that matching projects are mapped to, rather than those in sector_codes only.
         show_meta : bool, default False
             If True, returns additional project-level meta data.
+        portfolio : str or None, default None
+            If str, returns only projects in the portfolio of that name, defined with define_portfolio.
         
         Returns
         ----------
-        DataFrame object
+        DataFrame object, or, if data was loaded with load_data(out_of_core=True), an iterator of DataFrame objects, one per partition with matching projects
         """ 
         
-        #Record function call in the last_command attribute
-        self.__last_command = "get_projects"
+        #If data is held on disk, run the query on one partition at a time, streaming the outputs
+        if self._partitions!=None:
+            #If portfolio is specified, return error, as portfolios are defined on data held in memory
+            if portfolio!=None:
+                raise ValueError("'portfolio' is not available for data loaded with out_of_core=True.")
+            #If only one of start_FY and stop_FY is specified, bound the other by the first or last approval FY of the whole data rather than of each partition
+            first_FY, last_FY = self._partitions.fy_bounds()
+            if (type(start_FY)==int) and (stop_FY==None):
+                stop_FY = last_FY
+            elif (type(stop_FY)==int) and (start_FY==None):
+                start_FY = first_FY
+            #Only the partitions of approval FYs from start_FY to stop_FY, or of missing approval FY, are read
+            return self._stream(lambda part, part_pids: part._get_projects(sector_codes, min_pct, start_FY, stop_FY, product_type, project_status,
+                                                                             include_AF, show_all, show_meta),
+                                 start_FY=start_FY if type(start_FY)==int else None, stop_FY=stop_FY if type(stop_FY)==int else None)
+        
+        #Run the query, and record it for save_last and plot_last
+        output_df = self._get_projects(sector_codes, min_pct, start_FY, stop_FY, product_type, project_status, include_AF, show_all, show_meta, portfolio)
+        self._remember("get_projects", output_df)
+        return output_df
+    ################################################
+    
+    def _get_projects(self, 
+                       sector_codes,
+                       min_pct=1,
+                       start_FY=None, stop_FY=None,
+                       product_type=None, 
+                       project_status=None,
+                       include_AF=True,
+                       show_all=False,
+                       show_meta=False,
+                       portfolio=None):
+        #Stateless core of get_projects: reads the loaded data and returns the output without recording it,
+        #so it can be called from several threads at once
         
         #if data is not loaded to the object, alert user
-        if self.__dataloaded==False:
-            self.__last_output = None
-            self.__last_output_exist = False
+        if self._dataloaded==False:
             print ("Data not yet loaded.")
     
         #Otherwise, begin data extraction sequence
         else:
             
-            
             #create copy of internal data
-            temp_data = self.__data   
+            temp_data = self._data   
             
-            #USER INPUT VALIDATION
             import numpy as np
             
             #Check if any auxiliary argument is provided
             aux_args = (start_FY==None) & (stop_FY==None) & (product_type==None) & (project_status==None) & (include_AF==True)
             
+            #USER INPUT VALIDATION
             #---------------------------------------------#
-            #If theme_code is not a list, return error
-            if type(theme_codes)!=list:
-                raise TypeError("'theme_codes' must be of type 'list'.")
-            #If any item in theme_codes is not a string, return error
-            elif any(type(item)!=int for item in theme_codes):
-                raise TypeError("Every item in 'theme_codes' must be of type 'int'.")
-                
+            #Check sector_codes, converting them to upper case and warning about major sector codes
+            sector_codes = _code_list(sector_codes, self._spec, "sector_codes")
+            
             #---------------------------------------------#
             #If min_pct is not an int, return error
             if type(min_pct)!=int:
-                raise TypeError("'min_pct' must be of type 'int'.")
+                raise TypeError("'min_pct' must be of type 'int'.") 
             #If min_pct is <0 or >100, warn user
-            elif min_pct<0 or min_pct>100:
+            elif min_pct not in range(0,101):
                 print("WARNING! 'min_pct' is outside expected range of 0 to 100.")
                 
             #--------------------------------------------#
             #If start_FY is specified by user and it is not of type 'int', return error
             if (start_FY!=None) and (type(start_FY)!=int):
-                raise TypeError("'start_FY' must be of type 'int'.")    
+                raise TypeError("start_FY must be of type 'int'.")    
             
             #If stop_FY is specified by user and it is not of type 'int', return error
             if (stop_FY!=None) and (type(stop_FY)!=int):
-                raise TypeError("'stop_FY' must be of type 'int'.")    
+                raise TypeError("stop_FY must be of type 'int'.")    
             
             #if start_FY and stop_FY are unspecified by user, set them to first and last year available in the data respectively
-            start_FY = int(temp_data['Project Approval FY'].min()) if start_FY==None else int(start_FY)
-            stop_FY = int(temp_data['Project Approval FY'].max()) if stop_FY==None else int(stop_FY)
+            first_FY, last_FY = self._index.fy_bounds()
+            start_FY = first_FY if start_FY==None else int(start_FY)
+            stop_FY = last_FY if stop_FY==None else int(stop_FY)
             
-            #If stop_FY precedes stop_FY, return error
+            #If stop_FY precedes start_FY, return error
             if stop_FY < start_FY:
-                raise ValueError("Values of 'start_FY' and 'stop_FY' are not in chronological order.")
+                raise ValueError("'start_FY' and 'stop_FY' arguments are not in chronological order.")
             
             #create a list of integers between start_FY and stop_FY 
             timeline = list(range(int(start_FY), int(stop_FY)+1))
             timeline.append(np.nan)
             
-            #--------------------------------------------#
+            #--------------------------------------------#            
             #If product_type is specified by user and it is not of type 'list', return error
             if (product_type!=None) and (type(product_type)!=list):
-                raise TypeError("'product_type' must be of type 'list'.")
+                raise TypeError("product_type must be of type 'list'.")
             #If product_type is a list and any element in product_type is not a string, return error
             elif (type(product_type)==list) and (any(type(item)!=str for item in product_type)):
-                raise ValueError("Every item in 'product_type' must be of type 'str'.")
+                raise TypeError("All values in 'product_type' must be of type 'str'.")
             else:
                 #If product_type is specified correctly as a list, convert to upper, else leave as None
                 #NOTE FOR DEVELOPER: CHECK THAT CASING STYLE USED MATCHES THAT IN THE RAW DATA FROM POWERBI
                 product_type = [item.upper() for item in product_type] if product_type!=None else product_type
                 
             #Create a list of all available values for Product Line Type
-            prod_type_options = list(temp_data['Product Line Type'].unique())
+            prod_type_options = self._index.values('Product Line Type')
             #Remove any nan from this list, and record it in the nan_removed variable
             nan_removed = False
             if np.nan in prod_type_options:
@@ -1430,38 +1390,37 @@ class Themes():
             #NOTE FOR DEVELOPER: CHECK THAT CASING STYLE USED MATCHES THAT IN THE RAW DATA FROM POWERBI
             prod_type_options = [item.upper() for item in prod_type_options]
     
-            #If product_type is specified by user and it is not among acceptable options, return error
+            #If product_type is specified by user and it is not among acceptable options, exit
             if (product_type!=None) and set(product_type).isdisjoint(set(prod_type_options)):
                 raise ValueError("Unrecognized product_type input. Acceptable values are:" + "\n" +
                         "'L', for lending products," + "\n" +
                         "'A', for AAA products, and" + "\n" + 
                         "'S', for standard products.") 
             
-            #If product_type is not specified by user, set product_type to all acceptable options
+            #If product_type is not specified by user, set prod_type to all acceptable options
             if product_type==None:
                 #If nan values were removed from prod_type_options, put them back
                 if nan_removed:
                     prod_type_options.append(np.nan)
                 prod_type = prod_type_options
-            
-            #Finally, if product_type is specified correctly by user, set product_type to the corresponding value in prod_type_options
+            #Finally, if product_type is specified correctly by user, set prod_type to the specified value of product_type
             else:
                 prod_type = product_type
-                
+            
             #--------------------------------------------#
             #If project_status is specified by user and it is not of type 'list', return error
             if (project_status!=None) and (type(project_status)!=list):
                 raise TypeError("'project_status' must be of type 'list'.")
             #If project_status is specified as a list and any item in project_status is not a string, return error
             elif (type(project_status)==list) and (any(type(item)!=str for item in project_status)):
-                raise TypeError("Every item in 'project_status' must be of type 'str'.")
+                raise ValueError("All values in 'project_status' must be of type 'str'.")
             else:
                 #If project_status is specified correctly as a list, convert to title, else leave as None
                 #NOTE FOR DEVELOPER: CHECK THAT CASING STYLE USED MATCHES THAT IN THE RAW DATA FROM POWERBI
                 project_status = [item.title() for item in project_status] if project_status!=None else project_status
-                
+            
             #Get the list of possible options for project status
-            proj_stat_options = list(temp_data['Project Status Name'].unique())
+            proj_stat_options = self._index.values('Project Status Name')
             #Remove any nan from this list, and record it in the nan_removed variables
             nan_removed = False
             if np.nan in proj_stat_options:
@@ -1475,12 +1434,12 @@ class Themes():
                 raise ValueError("Unrecognized project_status input. Acceptable values are:" + "\n" +
                         '"Active", "Canceled", "Closed", "Dropped", "Draft", "Legacy Dropped", "Legacy", and "Pipeline".')
             
-            #If project_status is not specified by user, set product_type to all acceptable options
+            #If project_status is not specified by user, set proj_status to all acceptable options
             if project_status==None:
                 #If nan was removed, put them back
                 if nan_removed:
                     proj_stat_options.append(np.nan)
-                proj_status = proj_stat_options           
+                proj_status = proj_stat_options
             #Finally, if project_status is specified correctly by user, set proj_status to the specified value in project_status
             else:
                 proj_status = project_status
@@ -1488,54 +1447,62 @@ class Themes():
             #--------------------------------------------#
             #If include_AF is not of type 'bool', return error
             if type(include_AF)!=bool:
-                raise TypeError("'include_AF' must be of type 'bool'.")
+               raise TypeError("'include_AF' must be of type 'bool'.")
             #If include_AF is True, set add_fin_choice to all available values of the Additional Financing Flag
-            elif include_AF==True:
-                add_fin_choice=list(temp_data['Additional Financing Flag'].unique())
+
+            add_fin_choice=self._index.values('Additional Financing Flag')
             #If include_AF is False, exclude add_fin_choice value from the Additional Financing Flag
-            else:
-                add_fin_choice=list(temp_data['Additional Financing Flag'].unique())
+            if include_AF==False:
                 #NOTE FOR DEVELOPER: CONFIRM THAT 'Y' IS THE VALUE FOR ADDITIONAL FINANCING FLAG
                 add_fin_choice.remove('Y')
             
-            #--------------------------------------------#
             #If show_all is not of type 'bool', return error
             if type(show_all)!=bool:
-                raise TypeError("show_all must be of type 'bool'.")
+                raise TypeError("'show_all' must be of type 'bool'.")
                 
             #If show_meta is not of type 'bool', return error
             if type(show_meta)!=bool:
-                raise TypeError("show_meta must be of type 'bool'.")
+                raise TypeError("'show_meta' must be of type 'bool'.")
             
-            #IDENTIFY PROJECTS MATCHING THE TARGET_THEMES AND Min_PCT ARGUMENTS SPECIFIED
+            #If the auxiliary arguments are used, keep only the rows approved from start_FY to stop_FY or with missing approval FY,
+            #taken from the FY partitions of the index, so that FY-bounded queries do not scan the rows of other years
+            base_rows = None if aux_args else self._index.fy_positions(start_FY, stop_FY)
+            #If portfolio is specified, keep only the rows of its projects, materialized by define_portfolio, without evaluating its filters again
+            if portfolio!=None:
+                portfolio_rows = self._index.portfolio_rows(portfolio)
+                base_rows = portfolio_rows if base_rows is None else np.intersect1d(base_rows, portfolio_rows, assume_unique=True)
+            if base_rows is not None:
+                temp_data = temp_data.take(base_rows)
+            
+            #IDENTIFY PROJECTS MATCHING THE SECTOR_CODES AND MIN_PCT ARGUMENTS SPECIFIED
             #--------------------------------------------#
-            #Step 1: get the rows with sector codes that match any of those in theme_codes
-            matching_theme_filter = temp_data['Theme Code'].isin(theme_codes)
+            #Step 1: get the rows with sector codes that match any of those in sector_codes
+            matching_sector_filter = temp_data['Sector Code'].isin(sector_codes)
 
             #filter temp data to extract these matching sector codes only
-            matching_theme_df = temp_data.loc[matching_theme_filter,:].copy()
+            matching_sector_df = temp_data.loc[matching_sector_filter,:].copy()
             
-            #Step 2: Extract PIDs where at least one sector code match has a theme percentage >= the min_pct value
+            #Step 2: Extract PIDs where at least one sector code match has a sector percentage > the min_pct value
             #Pivot the data so that each pid occupy a single row only
-            matching_theme_pivoted_df = matching_theme_df.pivot(index='Project Id', 
-                                                                columns='Theme Code', 
-                                                                values='Theme Percentage')
+            matching_sector_pivoted_df = matching_sector_df.pivot(index='Project Id', 
+                                                                columns='Sector Code', 
+                                                                values='Sector Percentage')
             
-            #compute a min_pct_exceeded column that returns True if at least on theme code has percentage >= min_pct
-            matching_theme_pivoted_df['min_pct_exceeded'] = (matching_theme_pivoted_df>=min_pct).any(axis=1,skipna=True)
+            #compute a min_pct_exceeded column that returns True if at least on sector code has percentage >= min_pct
+            matching_sector_pivoted_df['min_pct_exceeded'] = (matching_sector_pivoted_df>=min_pct).any(axis=1,skipna=True)
             
             #Reset index
-            matching_theme_pivoted_df.reset_index(inplace=True)
+            matching_sector_pivoted_df.reset_index(inplace=True)
             
             #Extract PIDs where min_pct_exceeded column is True
-            pids_with_theme_above_min_pct = list(matching_theme_pivoted_df.loc[matching_theme_pivoted_df['min_pct_exceeded'],'Project Id'])
+            pids_with_sector_above_min_pct = list(matching_sector_pivoted_df.loc[matching_sector_pivoted_df['min_pct_exceeded'],'Project Id'])
             
             #--------------------------------------------#
             #Specify the output rows depending on the values of the auxiliary arguments
             if aux_args:
-                output_rows = temp_data['Project Id'].isin(pids_with_theme_above_min_pct)
+                output_rows = temp_data['Project Id'].isin(pids_with_sector_above_min_pct)
             else:
-                output_rows = ((temp_data['Project Id'].isin(pids_with_theme_above_min_pct)) &            
+                output_rows = ((temp_data['Project Id'].isin(pids_with_sector_above_min_pct)) &            
                                (temp_data['Product Line Type'].isin(prod_type)) &
                                (temp_data['Project Status Name'].isin(proj_status)) &
                                (temp_data['Project Approval FY'].isin(timeline)) & 
@@ -1543,25 +1510,27 @@ class Themes():
             
             #--------------------------------------------#
             #Specify the output columns depending on the value of show_meta
+            #In lazy mode, read the metadata columns not yet loaded
+            if show_meta:
+                temp_data = self._full_data() if base_rows is None else self._full_data().take(base_rows)
             all_cols = list(temp_data.columns)
-            sel_cols = ['Project Id', 'Theme Code', 'Theme Name', 'Theme Percentage', 
-                        'Project Approval FY', 'Project Status Name', 'Product Line Type', 
-                        'Additional Financing Flag', 'Lead GP/Global Themes']
+            sel_cols = ['Project Id', 'Sector Code', 'Sector Long Name', 'Sector Percentage', 'Additional Financing Flag',
+                        'Project Approval FY', 'Project Status Name', 'Product Line Type', 'Lead GP/Global Themes']
             
             #Output columns is all columns if show_meta is true, else show sel_cols
             output_cols = all_cols if show_meta else sel_cols
             
             #--------------------------------------------#
-            #Filter the data based on output_rows and output_cols, and reset index
-            output_df = temp_data.loc[output_rows,output_cols]
-            output_df.reset_index(drop=True,inplace=True)
+            #Filter the data based on output_rows and output_cols
+            output_df = temp_data.loc[output_rows,output_cols].copy()
             
-            #If user only wants to see the specified theme codes rather than all theme codes the matching projects are mapped to
+            #If user only wants to see the specified sector codes rather than all sector codes the matching projects are mapped to
             if show_all==False:
-                #filter the data to show only the selected theme codes at cut-off
-                output_df = output_df.loc[output_df['Theme Code'].isin(theme_codes) & 
-                                           (output_df['Theme Percentage']>=min_pct), :].copy()
-                output_df.reset_index(drop=True,inplace=True)
+                #filter the data to show only the specified sector codes
+                output_df = output_df.loc[(output_df['Sector Code'].isin(sector_codes) & 
+                                           (output_df['Sector Percentage']>=min_pct)),:].copy()
+            #reset the index
+            output_df.reset_index(drop=True,inplace=True)
             
             #--------------------------------------------#
             #Check if output df is empty and alert user accordingly
@@ -1569,272 +1538,5510 @@ class Themes():
                 print("No projects meet the specified criteria.")
             else: 
                 no_of_unique = output_df['Project Id'].nunique()
-                print(f"{no_of_unique} unique projects meet the specified criteria..") 
-                self.__last_output = output_df
-                self.__last_output_exist = True
+                print(f"{no_of_unique} unique projects meet the specified criteria.") 
                 return output_df
     ################################################        
-                  
-    def get_themes(self, pid_list, theme_level=None, show_meta=False):
+
+    def get_sectors(self, pid_list, show_meta=False, workers=None, portfolio=None):
                 
         """
         Description
         ----------
-        Returns theme codes that the specified projects are mapped to.
+        Returns sector codes that the specified list of projects are mapped to.
         Supports variable assignment.
-        Data must already be loaded into the Themes object.
+        Data must already be loaded into the Sectors object.
         
         Parameters
         ----------
-        pid_list : list
-            The ID numbers of projects for which theme codes are to be returned. 
-        theme_level : list or None, default None
-            If list, returns only the theme codes matching the specified level(s).
-            Acceptable values are:
-                1: for the highest theme level,
-                2: for middle theme level,
-                3: for lowest theme level, or any combination of these. 
-            If None, returns all eligible themes, regardless of theme level.
-        show_meta : bool, default False
-            If True, returns additional project-level meta data.
-        
+        pid_list : list, tuple, set, array, Series or other iterable of str
+            The ID numbers of projects for which sector codes are to be returned. 
+        show_meta : bool, default False
+            If True, returns additional project-level meta data.
+        workers : int or None, default None
+            If int, looks up the rows of the projects in a pool of that many processes, which pays off for very long pid_list.
+            If None, looks them up in the calling process.
+        portfolio : str or None, default None
+            If str, only the projects in pid_list that are in the portfolio of that name, defined with define_portfolio, are returned.
+        
+        Returns
+        ----------
+        DataFrame object, or, if data was loaded with load_data(out_of_core=True), an iterator of DataFrame objects, one per partition with data
+        """
+        
+        #If data is held on disk, run the query on the partitions holding the PIDs, one at a time, streaming the outputs
+        if self._partitions!=None:
+            #If portfolio is specified, return error, as portfolios are defined on data held in memory
+            if portfolio!=None:
+                raise ValueError("'portfolio' is not available for data loaded with out_of_core=True.")
+            pids = _normalize_pids(pid_list)
+            return self._stream(lambda part, part_pids: part.__get_sectors(part_pids, show_meta, workers), pids,
+                                 found=f"Data found for {{}} out of {len(pids)} requested PIDs.", none="No data found for specified PID(s).")
+        
+        #Run the query, and record it for save_last and plot_last
+        output_df = self.__get_sectors(pid_list, show_meta, workers, portfolio)
+        self._remember("get_sectors", output_df)
+        return output_df
+    ################################################
+    
+    def __get_sectors(self, pid_list, show_meta=False, workers=None, portfolio=None):
+        #Stateless core of get_sectors: reads the loaded data and returns the output without recording it,
+        #so it can be called from several threads at once
+        
+        #if data is not loaded to the object, alert user
+        if self._dataloaded==False:
+            print ("Data not yet loaded.")
+
+        #Otherwise, begin data extraction sequence
+        else:
+            
+            #USER INPUT VALIDATION
+            #Convert pid_list to an array of upper-case PIDs, returning error if it is not a collection of strings
+            #NOTE FOR DEVELOPER: CHECK THAT CASING STYLE USED MATCHES THAT IN THE RAW DATA FROM POWERBI
+            pids = _normalize_pids(pid_list)
+            #If workers is specified and it is not a positive int, return error
+            if (workers!=None) and (type(workers)!=int or workers<1):
+                raise ValueError("'workers' must be a positive 'int' or None.")
+            #If portfolio is specified, keep only the PIDs in the portfolio
+            if portfolio!=None:
+                pids = self._index.portfolio_pids(portfolio, pids)
+      
+            #--------------------------------------------#
+            #Extract the rows of the PIDs
+            output_df = self.__sector_rows(pids, show_meta, workers)
+            
+            #--------------------------------------------#
+            #Check if output df is empty and alert user accordingly
+            if output_df.empty:
+                print("No data found for specified PID(s).")
+            else:
+                no_of_unique = output_df['Project Id'].nunique()
+                print(f"Data found for {no_of_unique} out of {len(pids)} requested PIDs.")
+                return output_df
+    ################################################ 
+    
+    def __sector_rows(self, pids, show_meta=False, workers=None):
+        #Return the rows of the normalized pids, as get_sectors does, without alerting user
+        import numpy as np
+        
+        #create copy of internal data
+        temp_data = self._data
+        
+        #--------------------------------------------#
+        #Identify the rows in temp_data that matches the PIDs, in a process pool if workers is specified
+        #Long PID lists often repeat PIDs; dropping repeats first keeps isin fast
+        if workers==None:
+            output_rows = temp_data['Project Id'].isin(np.unique(pids))
+        else:
+            output_rows = temp_data.index[_fan_out(self._index, "rows", pids, workers)]
+        
+        #--------------------------------------------#
+        #Specify the output columns depending on the value of show_meta
+        #In lazy mode, read the metadata columns not yet loaded
+        if show_meta:
+            temp_data = self._full_data()
+        all_cols = list(temp_data.columns)
+        sel_cols = ['Project Id', 'Major Sector Code', 'Major Sector Long Name', 'Sector Code', 'Sector Long Name', 'Sector Percentage']
+        
+        #Show all columns if show_meta is true, else show sel_cols
+        output_cols = all_cols if show_meta else sel_cols
+    
+        #--------------------------------------------#
+        #Filter the data based on output_rows and output_cols
+        output_df = temp_data.loc[output_rows,output_cols].copy()
+        output_df.reset_index(drop=True,inplace=True)
+        return output_df
+    ################################################ 
+    
+    def iter_chunks(self, pid_list, chunk_size=10000, show_meta=False):
+        """
+        Description
+        ----------
+        Returns sector codes that the specified projects are mapped to, as get_sectors does, in batches of chunk_size PIDs.
+        PIDs are read from pid_list only as each batch is needed, so very long lists (e.g. a generator reading a file) can be written out batch by batch
+        without holding the whole output in memory.
+        Does not record its output for save_last and plot_last.
+        Data must already be loaded into the Sectors object.
+        
+        Parameters
+        ----------
+        pid_list : list, tuple, set, array, Series or other iterable of str
+            The ID numbers of projects for which sector codes are to be returned.
+        chunk_size : int, default 10000
+            Number of PIDs per batch.
+        show_meta : bool, default False
+            If True, returns additional project-level meta data.
+        
+        Returns
+        ----------
+        generator of DataFrame objects, one per batch with data
+        """
+        
+        yield from self._iter_chunks(pid_list, chunk_size, lambda pids: self.__sector_rows(pids, show_meta))
+    ################################################ 
+
+    def count_sectors(self, pid_list, summarize=False, workers=None, portfolio=None):
+        """
+        Description
+        ----------
+        Returns the number of sub-sectors that the specified projects are mapped to.
+        Supports variable assignment.
+        Data must already be loaded into the Sectors object.
+        
+        Parameters
+        ----------
+        pid_list : list, tuple, set, array, Series or other iterable of str
+            The ID numbers of projects for which sub-sector counts are to be returned. 
+        summarize : bool, default False
+            If True, returns frequency count of each sub-sector count.
+        workers : int or None, default None
+            If int, counts the sub-sectors of chunks of pid_list in a pool of that many processes, which pays off for very long pid_list.
+            If None, counts them in the calling process.
+        portfolio : str or None, default None
+            If str, only the projects in pid_list that are in the portfolio of that name, defined with define_portfolio, are returned.
+        
+        Returns
+        ----------
+        DataFrame object, or, if data was loaded with load_data(out_of_core=True), an iterator of DataFrame objects, one per partition with data
+        """
+        
+        #If data is held on disk, run the query on the partitions holding the PIDs, one at a time, streaming the outputs
+        if self._partitions!=None:
+            #If summarize is True, return error, as the output of all partitions is not held at once
+            if summarize:
+                raise ValueError("'summarize' is not available for data loaded with out_of_core=True.")
+            #If portfolio is specified, return error, as portfolios are defined on data held in memory
+            if portfolio!=None:
+                raise ValueError("'portfolio' is not available for data loaded with out_of_core=True.")
+            pids = _normalize_pids(pid_list)
+            return self._stream(lambda part, part_pids: part.__count_sectors(part_pids, False, workers), pids,
+                                 found=f"Data found for {{}} out of {len(pids)} requested PIDs.", none="No data found for specified PID(s).", pid_col="PID")
+        
+        #Run the query, and record it for save_last and plot_last
+        output_df = self.__count_sectors(pid_list, summarize, workers, portfolio)
+        self._remember("count_sectors", output_df)
+        return output_df
+    ################################################
+    
+    def __count_sectors(self, pid_list, summarize=False, workers=None, portfolio=None):
+        #Stateless core of count_sectors: reads the loaded data and returns the output without recording it,
+        #so it can be called from several threads at once
+        
+        #If summarize is not boolean, return error
+        if type(summarize)!=bool:
+            raise TypeError("'summarize' must be of type 'bool'.")
+        
+        #If workers is specified, count the sub-sectors in a process pool instead
+        if workers!=None:
+            output_df = self.__pool_query("count", pid_list, workers, portfolio=portfolio)
+            if output_df is None:
+                print("")
+            elif summarize:
+                self.__summarize_counts(output_df)
+            return output_df
+        
+        #Call the get_sectors command on the pid_list and save output
+        temp_data = self.__get_sectors(pid_list, portfolio=portfolio)
+        
+        #If get_sectors yielded an empty df, report it and exit
+        if temp_data is None:
+            print("")
+        
+        #Otherwise, begin computation sequence for count_sect
+        else:
+            #Import the required libraries
+            from collections import defaultdict
+            import numpy as np
+            import pandas as pd
+            
+            #--------------------------------------------#
+            
+            #Replace sector name with sector code if sector name is missing, creating a new column
+            temp_data['Sector Name_'] = np.where(temp_data['Sector Long Name'].isnull(),
+                                                    temp_data['Sector Code'],
+                                                    temp_data['Sector Long Name'])
+            
+            #--------------------------------------------#
+            
+            #Create a dictionary that stores all the sub-sector codes for each PID 
+            PIDs_n_sectors = defaultdict(dict)
+            
+            #for each pid, sector code and sector percentage combination in the data
+            for pid,sector,pct in zip(temp_data['Project Id'],temp_data['Sector Name_'],temp_data['Sector Percentage']):
+                #Update the PIDs_n_sectors using PID as key and dict of sector code and sector percentage as value
+                PIDs_n_sectors[pid].update({sector:pct})
+                
+            #--------------------------------------------#
+            
+            #Create a dictionary that stores the number of sub-sectors each PID is mapped to
+            sector_counts = defaultdict(int) 
+            
+            #for each PID key-value pairs in the PIDs_n_sectors dict
+            for pid,sub_sectors in PIDs_n_sectors.items():
+                
+                #collect all the sub-sector codes for that pid
+                all_sub_sectors = set(sub_sectors.keys())
+                
+                #discard null values from the set
+                all_sub_sectors.discard(np.nan)
+                
+                #Count the number of unique sector codes mapped to that PID and assign it to the pid key
+                sector_counts[pid] = len(all_sub_sectors)
+                
+            #--------------------------------------------#
+            
+            #Convert the output to a dataframe
+            sector_counts = dict(sector_counts)
+            temp_df = pd.DataFrame.from_dict(sector_counts, 
+                                                   orient="index",
+                                                   columns=["Sector Counts"])
+            output_df = temp_df.reset_index()
+            output_df.rename(columns={"index":"PID"}, inplace=True)
+            
+            #--------------------------------------------#
+            
+            #If summarize is set to True, plot the frequency of each sector count
+            if summarize:
+                self.__summarize_counts(output_df)
+                    
+            return output_df
+            
+    ################################################
+    
+    def __summarize_counts(self, output_df):
+        #Plot the number of projects that have each sector count in the output of count_sectors
+        
+        #Create pivot table of the number of PIDs that have each sector count
+        plot_df = output_df.pivot_table(values="PID",index="Sector Counts",aggfunc="count")
+        plot_df.reset_index(inplace=True)
+        plot_df.rename(columns={"PID":"Frequency"}, inplace=True)
+        plot_df.sort_values(['Sector Counts'], ascending=True, inplace=True)
+        
+        from matplotlib import pyplot as plt 
+        
+        #Create plot canvass
+        fig, ax = plt.subplots()
+        
+        #Create horizontal bar chart, using a container to save the chart
+        fig_con = ax.barh(plot_df['Sector Counts'],plot_df["Frequency"])
+        
+        #Add data label
+        ax.bar_label(fig_con)
+        
+        # make the x ticks integers, not floats
+        x_label_int = []
+        locs, labels = plt.xticks()
+        for each in locs:
+            x_label_int.append(int(each))
+        plt.xticks(x_label_int)
+        
+        #Add title to X-Axis
+        ax.set_xlabel("Project count")
+        
+        #Add title to Y-Axis
+        ax.set_ylabel("Number of sectors projects are mapped to")
+        ax.invert_yaxis()
+        
+        #Add chart title
+        ax.set_title("Project counts, by Sector Counts")
+        
+        plt.show()
+    ################################################
+    
+    def main_sector(self, pid_list, threshold=None, summarize=False, workers=None, portfolio=None):
+        """
+        Description
+        ----------
+        Returns the main sector that each project in the specified list is mapped to.
+        Supports variable assignment.
+        Data must already be loaded into the Sectors object.
+        
+        Parameters
+        ----------
+        pid_list : list, tuple, set, array, Series or other iterable of str
+            The ID numbers of projects for which sector codes are to be returned. 
+        threshold : int or None, default None
+            If None, main sector is the sector that accounts for the largest percentage of a project. If multiple sectors account for the largest share of the project, the main sub-sector for that project is ambiguous.
+            If int, the main sub-sector is the sub-sector that accounts for a percentage value greater than or equal to the threshold value.
+            For example, if threshold = 70, any sub-sector that account at least 70% of a project is its main sub-sector. If no sub-sector accounts for up to 70%, the main sub-sector is ambiguous.
+            CAUTION: if threshold is 50 or less, multiple sub-sectors may account for a percentage greater than or equal to threshold value, but only one will be returned.
+        summarize : bool, default False
+            If True, returns frequency counts of each main sub-sector.
+        workers : int or None, default None
+            If int, finds the main sub-sectors of chunks of pid_list in a pool of that many processes, which pays off for very long pid_list.
+            If None, finds them in the calling process.
+        portfolio : str or None, default None
+            If str, only the projects in pid_list that are in the portfolio of that name, defined with define_portfolio, are returned.
+        
+        Returns
+        ----------
+        DataFrame object, or, if data was loaded with load_data(out_of_core=True), an iterator of DataFrame objects, one per partition with data
+        """
+        
+        #If data is held on disk, run the query on the partitions holding the PIDs, one at a time, streaming the outputs
+        if self._partitions!=None:
+            #If summarize is True, return error, as the output of all partitions is not held at once
+            if summarize:
+                raise ValueError("'summarize' is not available for data loaded with out_of_core=True.")
+            #If portfolio is specified, return error, as portfolios are defined on data held in memory
+            if portfolio!=None:
+                raise ValueError("'portfolio' is not available for data loaded with out_of_core=True.")
+            pids = _normalize_pids(pid_list)
+            return self._stream(lambda part, part_pids: part.__main_sector(part_pids, threshold, False, workers), pids,
+                                 found=f"Data found for {{}} out of {len(pids)} requested PIDs.", none="No data found for specified PID(s).", pid_col="PID")
+        
+        #Run the query, and record it for save_last and plot_last
+        output_df = self.__main_sector(pid_list, threshold, summarize, workers, portfolio)
+        self._remember("main_sector", output_df)
+        return output_df
+    ################################################
+    
+    def __main_sector(self, pid_list, threshold=None, summarize=False, workers=None, portfolio=None):
+        #Stateless core of main_sector: reads the loaded data and returns the output without recording it,
+        #so it can be called from several threads at once
+        
+    
+        #--------------------------------------------#
+    
+        #If summarize is not a boolean, return error
+        if type(summarize)!=bool:
+            raise TypeError("'summarize' must be of type 'bool'.")
+            
+        #If Threshold is specified, validate the specified value
+        if threshold!=None:
+            #If threshold is not an integer, return error
+            if type(threshold)!=int:
+                raise TypeError("'threshold' must be of type 'int'.")
+            #If threshold is an integer but not in range 0-101
+            elif not threshold in range(0,101):
+                raise ValueError("'threshold' is outside expected range of 0 to 100.")
+            #If threshold is 50 or less, warn user of potential result unreability
+            elif threshold<51:
+                print(f"WARNING! A 'threshold' value of {threshold}% may give rise to multiple main sectors, but only one will be returned.")
+            
+        #--------------------------------------------#
+        
+        #If workers is specified, find the main sectors in a process pool instead
+        if workers!=None:
+            output_df = self.__pool_query("main", pid_list, workers, threshold, portfolio)
+            if output_df is None:
+                print("")
+            elif summarize:
+                self.__summarize_main(output_df)
+            return output_df
+        
+        #Call the get_sectors command on the pid_list and save output
+        temp_data = self.__get_sectors(pid_list, portfolio=portfolio)
+        
+        #If get_sectors yielded an empty df, report it and exit
+        if temp_data is None:
+            print("")
+        #Otherwise, begin computation sequence for main sector
+        else:
+            
+            #Import the required libraries
+            from collections import defaultdict
+            import numpy as np
+            import pandas as pd
+            
+            #--------------------------------------------#
+            
+            #Replace sector name with sector code if sector name is missing, creating a new column
+            temp_data['Sector Name_'] = np.where(temp_data['Sector Long Name'].isnull(),
+                                                    temp_data['Sector Code'],
+                                                    temp_data['Sector Long Name'])
+            
+            #--------------------------------------------#
+            
+            #Create a dictionary that stores the sub-sectors for each PID 
+            PIDs_n_sectors = defaultdict(dict)
+            
+            #For each pid, sector code and sector percentage combination in the data
+            for pid,sector,pct in zip(temp_data['Project Id'],temp_data['Sector Name_'],temp_data['Sector Percentage']):
+                #Update the PIDs_n_sectors using PID as key, and sector code and sector percentage as a dict
+                PIDs_n_sectors[pid].update({sector:pct})
+                
+            #--------------------------------------------#
+            
+            #Create a dictionary that stores the dominant sub-sector for each PID
+            dom_sector = defaultdict(dict)
+        
+            #If user wants the sector with the highest percentage, whatever that percentage is
+            if threshold==None:
+                
+                #For each PID and its sub-sector dict in PIDs_n_sectors
+                for pid,sub_sectors in PIDs_n_sectors.items():
+                    
+                    #unpack the sub-sector dict into sector names and pct
+                    names,pct_values = (list(sub_sectors.keys()),list(sub_sectors.values()))
+                    
+                    #Get the maximum sector percentage
+                    max_pct = max(pct_values)
+                    
+                    #Determine if there are multiple max sector percentages
+                    weak_max = True if pct_values.count(max_pct)>1 else False
+                    
+                    #If max is a weak max, indicate that there is no dominant sector
+                    if weak_max:
+                        dom_dict = {"AMBIGUOUS":np.nan}
+                    #else, collect the dominanct sector and pct in a dict
+                    else:
+                        max_pct_idx = pct_values.index(max_pct)
+                        dom_dict = {names[max_pct_idx]:max_pct}
+                    
+                    #Assign dom_dict to that pid
+                    dom_sector[pid] = dom_dict
+            
+            #If user defines main sector as sector whose percentage is higher than a given threshold
+            else:
+                
+                #For each PID and its sub-sector dict in PIDs_n_sectors
+                for pid,sub_sectors in PIDs_n_sectors.items():
+                    
+                    #Initially designate each pid as a multi-sector project
+                    dom_sector[pid] = {"AMBIGUOUS":np.nan}
+                    
+                    #Then, unpack the sub-sector dict into sector names and pct
+                    names,pct_values = (list(sub_sectors.keys()),list(sub_sectors.values()))
+                    
+                    #If project is mapped to only one sector, then invariably that sector code is the dominant one for that project
+                    if len(names)==1:
+                        #create dict for the dominant sector
+                        dom_dict = {names[0]:pct_values[0]}
+                        #Re-assign dom_dict to that project
+                        dom_sector[pid]=dom_dict
+                    
+                    #If project is mapped to more than one sector code
+                    else:
+                        
+                        #for each key-value pair in the sub-sector dict
+                        for k,v in sub_sectors.items():
+                            
+                            #If v >= threshold
+                            if v>=threshold:
+                                #create dict for the dominant sector
+                                dom_dict = {k:v}
+                                #Re-assign the dict to that project
+                                dom_sector[pid]=dom_dict
+                            #continue to the next iteration in loop
+                            continue
+                    continue
+                            
+            #Convert dom_sector to regular dict
+            dom_sector_dict = dict(dom_sector)
+            
+            #--------------------------------------------#
+            
+            #Now, convert the nested dom_sector_dict to a pandas dataframe
+            pids = []
+            dominant_sectors = []
+            
+            for pid,d in dom_sector_dict.items():
+                pids.append(pid)
+                dominant_sectors.append(pd.DataFrame.from_dict(d, orient='index'))
+        
+            output_df = pd.concat(dominant_sectors, keys=pids)
+            output_df.reset_index(inplace=True)
+            output_df.rename(columns={'level_0':'PID',
+                                      'level_1':'Main Sector', 
+                                      0:'Sector Percentage'}, 
+                             inplace=True)
+            
+            #--------------------------------------------#
+            
+            #If summarize is set to True, plot the frequency of each main sector
+            if summarize:
+                self.__summarize_main(output_df)
+                    
+            return output_df
+    
+    ################################################
+    
+    def __summarize_main(self, output_df):
+        #Plot the number of projects that have each main sector in the output of main_sector
+        
+        #Create pivot table of the number of PIDs that have each sector count
+        plot_df = output_df.pivot_table(values="PID",index="Main Sector",aggfunc="count")
+        plot_df.rename(columns={"PID":"Frequency",}, inplace=True)
+        plot_df.reset_index(inplace=True)
+        plot_df.sort_values(['Frequency'], ascending=False, inplace=True)
+        
+        from matplotlib import pyplot as plt
+        
+        #Create plot canvass
+        if plot_df["Main Sector"].nunique() in range(20,40):
+            fig, ax = plt.subplots(figsize=(7,7))
+        elif plot_df["Main Sector"].nunique()>40:
+            fig, ax = plt.subplots(figsize=(10,10))
+        else:
+            fig, ax = plt.subplots()
+        
+        #Create horizontal bar chart, using a container to save the chart
+        fig_con = ax.barh(plot_df['Main Sector'], plot_df["Frequency"])
+        
+        #Add data label
+        ax.bar_label(fig_con)
+        
+        # make the x ticks integers, not floats
+        x_label_int = []
+        locs, labels = plt.xticks()
+        for each in locs:
+            x_label_int.append(int(each))
+        plt.xticks(x_label_int)
+        
+        #Add title to X-Axis
+        ax.set_xlabel("Project count")
+        
+        ax.invert_yaxis()
+        
+        #Add chart title
+        ax.set_title("Project count, by Main Sectors")
+        
+        plt.show()
+    ################################################
+    
+    def sweep_main_sector(self, thresholds=range(0,101,5), pid_list=None, assignments=False):
+        """
+        Description
+        ----------
+        Returns the number of projects of each main sector that main_sector returns at each of several threshold values,
+        computed for every threshold at once rather than with one main_sector call per value.
+        Data must already be loaded into the Sectors object.
+        
+        Parameters
+        ----------
+        thresholds : iterable of int, default range(0,101,5)
+            The threshold values, as in main_sector.
+        pid_list : list, tuple, set, array, Series or other iterable of str, or None, default None
+            If None, all loaded projects are included.
+        assignments : bool, default False
+            If True, returns the main sector of each project at each threshold instead of the counts.
+        
+        Returns
+        ----------
+        DataFrame object with one row per threshold and one column per main sector, plus an AMBIGUOUS column,
+        or, if assignments is True, one row per project and one column per threshold
+        """
+        
+        #if data is not loaded to the object, alert user
+        if self._dataloaded==False:
+            print ("Data not yet loaded.")
+            return None
+        
+        pids = None if pid_list is None else _normalize_pids(pid_list)
+        if self._partitions!=None:
+            return _sweep_main(self._partitions.indexes(_SECTOR_SPEC), thresholds, pids, assignments)
+        return _sweep_main([self._index], thresholds, pids, assignments)
+    ################################################
+    
+    def __pool_query(self, task, pid_list, workers, threshold=None, portfolio=None):
+        #Run count_sectors ("count") or main_sector ("main") on pid_list in a pool of workers processes,
+        #returning the same output as the computation in the calling process
+        import numpy as np
+        import pandas as pd
+        
+        #if data is not loaded to the object, alert user
+        if self._dataloaded==False:
+            print ("Data not yet loaded.")
+            return None
+        
+        #USER INPUT VALIDATION, as in get_sectors
+        pids = _normalize_pids(pid_list)
+        if type(workers)!=int or workers<1:
+            raise ValueError("'workers' must be a positive 'int' or None.")
+        if portfolio!=None:
+            pids = self._index.portfolio_pids(portfolio, pids)
+        
+        #--------------------------------------------#
+        #Compute the result of each chunk of PIDs in the pool, merged in data order
+        results = _fan_out(self._index, task, pids, workers, threshold)
+        if len(results[0])==0:
+            print("No data found for specified PID(s).")
+            return None
+        print(f"Data found for {len(results[0])} out of {len(pids)} requested PIDs.")
+        
+        if task=="count":
+            return pd.DataFrame({"PID":results[0], "Sector Counts":results[2]})
+        
+        #Sector names are numbered in the pool; -1 stands for a missing name and -2 for an ambiguous main sector
+        names = np.asarray(self._index.pool_names, dtype=object)
+        main_sectors = np.where(results[2]>=0, names[np.maximum(results[2],0)], np.nan)
+        main_sectors[results[2]==-2] = "AMBIGUOUS"
+        return pd.DataFrame({"PID":results[0], "Main Sector":main_sectors, "Sector Percentage":results[3]})
+    ################################################
+    
+    def save_last(self, save_name=None):
+ 
+        """
+        Description
+        ----------
+        Exports the output from the most recent call of a get_projects or get_sectors command.
+        Output is saved in .xlsx format.
+        
+        Parameters
+        ----------
+        save_name : str or None, default None
+            Name exported data should be saved with.
+            If None, exported data is saved with name "Sector_extract".
+            Overwrites any pre-existing file of the same name in the save folder.
+        
+        Returns
+        ----------
+        None
+        """
+        
+        #Record command in the last_command attribute
+        self._last_command = "save_last"
+        
+        #If there is no last output, alert user
+        if self._last_output_exist == False:
+            print("No output to save.")
+        #If there is last output, save it
+        else:
+            self._save_output(self._last_output, save_name)
+    ################################################
+    
+    def _session_queries(self):
+        #Return the query methods that a session exposes, by name
+        return {"get_projects":self._get_projects,
+                "get_sectors":self.__get_sectors,
+                "count_sectors":self.__count_sectors,
+                "main_sector":self.__main_sector}
+    ################################################
+    
+    def _save_output(self, output_df, save_name=None):
+        #Save output_df in .xlsx format; shared by save_last and Session.save_last
+        try:
+            #Check if save_name is specified
+            if save_name==None:
+                save_name = "Sector_extract.xlsx"
+            else:
+                #If specified save_name is not a str, return error
+                if type(save_name)!=str:
+                    raise TypeError("'save_name' must be of type 'str'.")
+                #Add fill extension to the save_name
+                save_name = save_name + ".xlsx"
+            #Save it to save_name
+            output_df.to_excel(save_name,index=False)
+            print("Data extract saved.")
+        except PermissionError:
+            print("ERROR! Save was unsuccessful. A file with the same name is currently open.")
+    
+    ################################################   
+
+    def plot_last(self, plot_by="sectors", save_name=None):
+        
+        """
+        Description
+        ----------
+        Plots the output from the most recent call of a get_projects or get_sectors command.
+        Output can be saved in .png format.
+        
+        Parameters
+        ----------
+        plot_by : str, default "sectors"
+            The grouping variable over which project counts will be plotted. 
+            Default value is "sectors", but other acceptable values are "GP", "FY", "Status", "region" and "Instrument".
+        save_name : str or None, default None
+            If str, plot created will be saved as a .png file with the string value as the file name.
+            Plot will be saved in the current working directory, and will overwrite any pre-existing file of the same name in the save folder.
+            If None, plot created will not be saved locally.
+        
+        Returns
+        ----------
+        None
+        """
+            
+        #If command not preceeded by get_projects or get_sectors, alert user
+        if ((self._last_command!= "get_projects") and 
+              (self._last_command!= "get_sectors") and
+              (self._last_command!="plot_last")):
+            print("Command must be preceded by 'get_projects' or 'get_sectors'.")
+            
+        #If the previous command did not return a valid output, alert user
+        elif self._last_output_exist == False:
+            print("No output to plot.")
+        
+        #Else, plot the last output and record command in the last_command attribute
+        else:
+            self._plot_output(self._last_output, plot_by, save_name)
+            self._last_command = "plot_last"
+    ################################################
+    
+    def _plot_data(self, output_df, plot_by):
+        #Return the project counts of output_df by plot_by, sorted for plotting, and the plotted variable; shared by plot_last and render_charts
+        import numpy as np
+
+        #Replace sector name with sector code if sector name is missing, creating a new column
+        output_df['Sector Name_'] = np.where(output_df['Sector Long Name'].isnull(),
+                                                output_df['Sector Code'],
+                                                output_df['Sector Long Name'])
+
+        #Convert the plot_by input to variable in the output_df data
+        plot_by_dict = {"sectors":"Sector Name_",
+                       "gp":"Lead GP/Global Themes",
+                       "fy":"Project Approval FY",
+                       "region":"Region Name",
+                       "instrument":"Lending Instrument Long Name",
+                       "status":"Project Status Name"}
+
+        #Convert plot_by input to lower. If operation fails, report that it is not one of the acceptable options.  
+        try:
+            plot_by_var = plot_by_dict[plot_by.lower()]
+        except:
+            raise ValueError("'plot_by' value is unrecognized. Acceptable values are 'sectors', 'GP', 'FY', STatus', 'Region', and 'Instrument'.")
+
+        if plot_by_var not in (output_df.columns):
+            raise KeyError("'plot_by' value missing in output from previous command. Consider setting the 'show_meta' argument in previous command to True.")
+
+        #Count the number of projects missing data for the plot_by_input
+        missing_df = output_df[output_df[plot_by_var].isna()].copy()
+        missing_count = missing_df["Project Id"].nunique()
+
+        #If missing_FY_count > 0, notify user of of the impending exclusion
+        if missing_count>0:
+            print(f"WARNING! {missing_count} project(s) with missing values for {plot_by_var} got excluded from the plot.")
+
+        #Create pivot table of project count by plot_by_var
+        plot_series = output_df.groupby(plot_by_var)["Project Id"].nunique()
+
+        #Reset the index to transform plot series to dataframe
+        plot_df = plot_series.reset_index()
+
+        #Sort data accordingly
+        if plot_by_var == "Project Approval FY":
+            plot_df.sort_values(plot_by_var, ascending=False, inplace=True)
+        else:
+            plot_df.sort_values("Project Id", ascending=True, inplace=True)
+
+        return plot_df, plot_by_var
+    ################################################
+
+    def _plot_size(self, n_bars):
+        #Return the figure size of a plot of n_bars bars, or None for the default size
+        if n_bars in range(20,40):
+            return (7,7)
+        elif n_bars>40:
+            return (10,10)
+        return None
+    ################################################
+    ################################################
+    ################################################
+
+class Themes(_CodeData):
+    
+    _spec = _THEME_SPEC
+    
+    def load_data(self, lazy=False, memory_budget=None, quality=None, out_of_core=False, memory_limit=None):
+        
+        """
+        Description
+        ----------
+        Loads all available data on WB project themes.
+        Data loading occurs in place and does not support variable assignment.
+        If the object was created with as_of, data is loaded from the snapshot store of past downloads instead.
+        Data is read from a local mirror of the most recent download in the IEG N:\ drive folder (see DataSource), so loading reads from local disk.
+        Before loading, the listing of the N:\ drive folder is checked, and a new or changed download is copied to the mirror and checked against
+        the SHA-256 checksum of the source. The checksum, and the size and modification time of the verified copy, are kept next to it in .sha256 and .stat files;
+        a mirrored download is only hashed again at load if it no longer matches its .stat file.
+        If the N:\ drive cannot be reached, the last mirrored download is loaded with a warning, so N:\ drive access is only needed for new downloads.
+        DataSource.start_sync copies new downloads in the background, so that they are already mirrored when data is loaded.
+        Downloads may be Excel workbooks, or CSV or Parquet files, one per sheet; the format is detected from the file name.
+        Reading a workbook typically takes 2-4 minutes, and CSV and Parquet files are read faster.
+        
+        Parameters
+        ----------
+        lazy : bool, default False
+            If True, loads only the metadata columns used by query filters and default outputs, through the snapshot store (see SnapshotStore),
+            adding the download to the store first if needed. Other metadata columns are read from the store on first access,
+            e.g. by show_meta=True or copy_data. Requires pyarrow.
+        memory_budget : int or None, default None
+            Used if lazy is True. If int, the number of bytes that metadata columns read on first access may take up;
+            the least recently used columns are dropped beyond it, and read again when next needed. If None, they are kept.
+        quality : str or None, default None
+            What to do with projects flagged by the data quality checks run at load (see quality_report).
+            If None, flagged projects are loaded as they are.
+            If "exclude", flagged projects are not loaded.
+            If "repair", repeated theme code rows are dropped and the percentages of the themes under each theme are rescaled to sum to its percentage;
+            projects with missing metadata or no code rows are loaded as they are.
+        out_of_core : bool, default False
+            If True, data is held on disk rather than in memory, for data too large to load at once. The download is added to the snapshot store
+            if needed, and split by project into partitions on disk, grouped by approval FY, once per download and memory_limit. get_projects, get_themes then read one partition at a time, get_projects only those of the FYs queried, and return an iterator of DataFrames, one per partition with data,
+            and trend and cooccurrence add up their result over the partitions. Other query methods are not available. Requires pyarrow.
+        memory_limit : int or None, default None
+            Used if out_of_core is True. The number of bytes that a query may hold in memory at once.
+            Partitions are sized to a quarter of it, and reading a partition that takes up more than half of it raises MemoryError.
+            If None, OUT_OF_CORE_MEMORY is used.
+        
+        Returns
+        ----------
+        Creates a DataFrame object that is loaded into the private data attribute of a Themes object.
+        To access this DataFrame, use data_info or copy_data.
+        """
+        
+        #Record function call in the last_command attribute
+        self._last_command = "load_data"
+        
+        #If lazy is not boolean, return error
+        if type(lazy)!=bool:
+            raise TypeError("'lazy' must be of type 'bool'.")
+        #If memory_budget is specified and it is not a positive int, return error
+        if (memory_budget!=None) and (type(memory_budget)!=int or memory_budget<1):
+            raise ValueError("'memory_budget' must be a positive 'int' or None.")
+        #If quality is specified and it is not an acceptable option, return error
+        if quality not in [None, "exclude", "repair"]:
+            raise ValueError("Unrecognized quality input. Acceptable values are None, 'exclude' and 'repair'.")
+        #If out_of_core is not boolean, return error
+        if type(out_of_core)!=bool:
+            raise TypeError("'out_of_core' must be of type 'bool'.")
+        #If lazy and out_of_core are both True, return error
+        if lazy and out_of_core:
+            raise ValueError("'lazy' and 'out_of_core' cannot both be True.")
+        #If memory_limit is specified and it is not a positive int, return error
+        if (memory_limit!=None) and (type(memory_limit)!=int or memory_limit<1):
+            raise ValueError("'memory_limit' must be a positive 'int' or None.")
+        
+        #if data has already been loaded to the object
+        if self._dataloaded == True:
+            print("Data already loaded to this object.")
+        
+        #if data is to be held on disk, split it into partitions instead of loading it
+        elif out_of_core:
+            self._load_partitions(memory_limit, quality)
+        
+        #if data not yet loaded to the object
+        else:   
+            
+            #record start time
+            import time
+            start_time = time.time()                             
+            
+            #let user know that sequence to load data has begun
+            print("Loading WB project Themes data." + "\n" +  
+                  "This typically takes 2-4 minutes. Please wait...")  
+            
+            #specify the columns of the Themes data to be imported
+            theme_cols = list(_THEME_SPEC["sheet_cols"])
+            
+            #if a past download is requested, or only the core columns are to be loaded, import it from the snapshot store
+            if (self._as_of!=None) or lazy:
+                store = SnapshotStore()
+                as_of = self._as_of
+                #in lazy mode, the most recent download is first added to the snapshot store, unless it is already in it
+                if as_of==None:
+                    data_file_to_import, download_date = self._source.latest_file()
+                    as_of = store.ingest(data_file_to_import)
+                    del(data_file_to_import)
+                meta_data, snapshot_date = store.load("metadata", as_of, columns=_CORE_META_COLS if lazy else None)
+                theme_data, snapshot_date = store.load("themes", as_of, columns=theme_cols)
+                if self._as_of!=None:
+                    download_date = snapshot_date
+            
+            #otherwise, mirror the most recent download in the N drive folder to local disk and import it
+            else:
+                data_file_to_import, download_date = self._source.latest_file()
+                sheets = _read_sheets(data_file_to_import, {"metadata":None, "themes":theme_cols})
+                meta_data, theme_data = sheets.pop("metadata"), sheets.pop("themes")
+                del(data_file_to_import)
+            
+            #drop unnecessary metadata columns
+            meta_data.drop(['Project Status Code','Lending Instrument Code'], axis=1, inplace=True, errors="ignore")                         
+            
+            #merge the two datasets
+            theme_and_meta = theme_data.merge(meta_data, on="Project Id", how="outer", validate="m:1")
+            theme_and_meta['Theme Percentage'] = theme_and_meta['Theme Percentage'] * 100
+            
+            #check the integrity of the merged data, then exclude or repair the flagged projects if requested
+            self._quality = _quality_report(theme_and_meta, _THEME_SPEC)
+            theme_and_meta = _apply_quality(theme_and_meta, self._quality, _THEME_SPEC, quality)
+            
+            #save the merged data to the data attribute of the object and set .dataloaded to True
+            self._data = theme_and_meta                                    
+            self._dataloaded = True                                    
+            
+            #build the project and theme code indexes used by boolean code expressions
+            self._index = _CodeIndex(self._data, _THEME_SPEC)
+            
+            #in lazy mode, the other metadata columns are read from the snapshot store on first access
+            if lazy:
+                self._columns = _ColumnCache(store, snapshot_date, self._index, list(theme_cols)+store.columns("metadata", snapshot_date), memory_budget)
+                self._index.column_cache = self._columns
+            
+            #delete residual files
+            del(meta_data)
+            del(theme_data)
+            
+            #record end time and calculate elapsed time
+            end_time = time.time() 
+            elapsed_time = end_time-start_time
+            
+            #Alert users that data was loaded successfully
+            print("Data loading successful!" + "\n" +
+                  f"Loaded data contains {self._data.shape[0]} rows and {self._data['Project Id'].nunique()} unique WB projects." + "\n" +
+                  f"Total loading time: {round(elapsed_time, 1)} seconds." + "\n" +
+                  "Data source: World Bank Standard Reports." + "\n" +
+                  f"Data download date: {download_date}.")
+            
+            #Alert users to projects flagged by the data quality checks
+            if not self._quality.empty:
+                print(f"WARNING! {self._quality['Project Id'].nunique()} projects failed data quality checks. See quality_report().")
+    ################################################
+    
+    def unload_data(self):
+        
+        """
+        Description
+        ----------
+        Deletes the DataFrame, if any, that has been loaded into the data attribute of a Themes object.
+        Data unloading occurs in place and does not support variable assignment.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        ----------
+        None
+        """
+        
+        #Record function call in the last_command attribute
+        self._last_command = "unload_data"
+        
+        #Delete internal data and reset all internal attributes
+        self._data = None
+        self._dataloaded = False
+        self._last_output = None
+        self._last_output_exist = False
+        self._index = None
+        self._columns = None
+        self._quality = None
+        self._partitions = None
+        print("Data unloading complete.") 
+    ################################################
+         
+    def data_info(self):
+        """
+        Description
+        ----------
+        Prints summary information on the DataFrame, if any, that has been loaded into the data attribute of a Themes object.
+        Variable assignment not supported.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        ----------
+        None
+        """
+        
+        #Record function call in the last_command attribute
+        self._last_command = "data_info"
+        
+        #if data is held on disk, alert user
+        if self._partitions!=None:
+            print("Not available for data loaded with out_of_core=True.")
+        
+        #if data has been loaded to the object, return info of the df
+        elif self._dataloaded:                      
+            print(self._full_data().info())            
+        
+        #Otherwise, alert user that data has not been loaded yet
+        else:                                      
+            print("Data not yet loaded.")                        
+    ################################################
+    
+    def copy_data(self):
+        """
+        Description
+        ----------
+        Returns a copy of the DataFrame, if any, that has been loaded into the data attribute of a WBTheme object.
+        Supports variable assignment.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        ----------
+        DataFrame object
+        """
+        
+        #Record function call in the last_command attribute
+        self._last_command = "copy_data"
+        
+        #if data is held on disk, alert user
+        if self._partitions!=None:
+            print("Not available for data loaded with out_of_core=True.")
+        
+        #if data has been loaded to the object, return the data
+        elif self._dataloaded:                 
+            return self._full_data()
+        
+        #Otherwise, alert user that data has not been loaded yet                      
+        else:                                       
+            print("Data not yet loaded.")
+    ################################################    
+        
+    def get_projects(self, 
+                     theme_codes,
+                     min_pct=1,
+                     start_FY=None, stop_FY=None,
+                     product_type=None, 
+                     project_status=None,
+                     include_AF=True,
+                     show_all=False,
+                     show_meta=False,
+                     portfolio=None):
+        
+        """
+        Description
+        ----------
+        Returns projects that are mapped to the specified theme codes and that satisfy other optional criteria.
+        Supports a variable assignment.
+        Data must already be loaded into the Themes object.
+        
+        Parameters
+        ----------
+        theme_codes : list
+        Returned projects must be mapped to one or more theme codes in theme_codes.
+        
+        min_pct : int, default 1
+            Indicates the minimum percentage of a project that at least one theme code in theme_codes must account for before that project will be returned.
+            If project's theme codes matches one or more theme codes in theme_codes but none of the matching theme codes account for up to the min_pct value, such a project will not be returned. 
+        start_FY : int or None, default None
+            If int, returns projects approved in or after the specified value of start_FY, and projects with missing Approval FY data.
+            If None, returns all eligible projects, regardless of approval FY.
+        stop_FY : int or None, default None
+            If int, returns projects approved in or before the specified value of stop_FY, and projects with missing Approval FY data.
+            If None, returns all eligible projects, regardless of approval FY.    
+        product_type : list or None, default None
+            If list, returns projects whose product type matches any of the specified values in product_types.
+            Automatically excludes projects with missing product type data.
+            Acceptable values are:
+                "L": for lending products,
+                "A": for AAA products,
+                "S": for standard products, or any combination of these. 
+            If None, returns all eligible projects regardless of product type.
+        project_status : list or None, default None
+            If list, returns projects with project status matches any of the specified values in project_status.
+            Automatically excludes observations with missing project status data.
+            Acceptable values are as follows: "Active", "Canceled", "Closed", "Dropped", "Draft", "Legacy Dropped", "Legacy", and "Pipeline".
+            If None, return all eligible projects regardless of project status.
+        show_all : bool, default False
+            If True, returns all theme codes that matching projects are mapped to, rather than those that match theme_codes only.
+        show_meta : bool, default False
+            If True, returns additional project-level meta data.
+        portfolio : str or None, default None
+            If str, returns only projects in the portfolio of that name, defined with define_portfolio.
+        
+        Returns
+        ----------
+        DataFrame object, or, if data was loaded with load_data(out_of_core=True), an iterator of DataFrame objects, one per partition with matching projects
+        """ 
+        
+        #If data is held on disk, run the query on one partition at a time, streaming the outputs
+        if self._partitions!=None:
+            #If portfolio is specified, return error, as portfolios are defined on data held in memory
+            if portfolio!=None:
+                raise ValueError("'portfolio' is not available for data loaded with out_of_core=True.")
+            #If only one of start_FY and stop_FY is specified, bound the other by the first or last approval FY of the whole data rather than of each partition
+            first_FY, last_FY = self._partitions.fy_bounds()
+            if (type(start_FY)==int) and (stop_FY==None):
+                stop_FY = last_FY
+            elif (type(stop_FY)==int) and (start_FY==None):
+                start_FY = first_FY
+            #Only the partitions of approval FYs from start_FY to stop_FY, or of missing approval FY, are read
+            return self._stream(lambda part, part_pids: part._get_projects(theme_codes, min_pct, start_FY, stop_FY, product_type, project_status,
+                                                                             include_AF, show_all, show_meta),
+                                 start_FY=start_FY if type(start_FY)==int else None, stop_FY=stop_FY if type(stop_FY)==int else None)
+        
+        #Run the query, and record it for save_last and plot_last
+        output_df = self._get_projects(theme_codes, min_pct, start_FY, stop_FY, product_type, project_status, include_AF, show_all, show_meta, portfolio)
+        self._remember("get_projects", output_df)
+        return output_df
+    ################################################
+    
+    def _get_projects(self, 
+                       theme_codes,
+                       min_pct=1,
+                       start_FY=None, stop_FY=None,
+                       product_type=None, 
+                       project_status=None,
+                       include_AF=True,
+                       show_all=False,
+                       show_meta=False,
+                       portfolio=None):
+        #Stateless core of get_projects: reads the loaded data and returns the output without recording it,
+        #so it can be called from several threads at once
+        
+        #if data is not loaded to the object, alert user
+        if self._dataloaded==False:
+            print ("Data not yet loaded.")
+    
+        #Otherwise, begin data extraction sequence
+        else:
+            
+            
+            #create copy of internal data
+            temp_data = self._data   
+            
+            #USER INPUT VALIDATION
+            import numpy as np
+            
+            #Check if any auxiliary argument is provided
+            aux_args = (start_FY==None) & (stop_FY==None) & (product_type==None) & (project_status==None) & (include_AF==True)
+            
+            #---------------------------------------------#
+            #Check theme_codes
+            theme_codes = _code_list(theme_codes, self._spec, "theme_codes")
+                
+            #---------------------------------------------#
+            #If min_pct is not an int, return error
+            if type(min_pct)!=int:
+                raise TypeError("'min_pct' must be of type 'int'.")
+            #If min_pct is <0 or >100, warn user
+            elif min_pct<0 or min_pct>100:
+                print("WARNING! 'min_pct' is outside expected range of 0 to 100.")
+                
+            #--------------------------------------------#
+            #If start_FY is specified by user and it is not of type 'int', return error
+            if (start_FY!=None) and (type(start_FY)!=int):
+                raise TypeError("'start_FY' must be of type 'int'.")    
+            
+            #If stop_FY is specified by user and it is not of type 'int', return error
+            if (stop_FY!=None) and (type(stop_FY)!=int):
+                raise TypeError("'stop_FY' must be of type 'int'.")    
+            
+            #if start_FY and stop_FY are unspecified by user, set them to first and last year available in the data respectively
+            first_FY, last_FY = self._index.fy_bounds()
+            start_FY = first_FY if start_FY==None else int(start_FY)
+            stop_FY = last_FY if stop_FY==None else int(stop_FY)
+            
+            #If stop_FY precedes stop_FY, return error
+            if stop_FY < start_FY:
+                raise ValueError("Values of 'start_FY' and 'stop_FY' are not in chronological order.")
+            
+            #create a list of integers between start_FY and stop_FY 
+            timeline = list(range(int(start_FY), int(stop_FY)+1))
+            timeline.append(np.nan)
+            
+            #--------------------------------------------#
+            #If product_type is specified by user and it is not of type 'list', return error
+            if (product_type!=None) and (type(product_type)!=list):
+                raise TypeError("'product_type' must be of type 'list'.")
+            #If product_type is a list and any element in product_type is not a string, return error
+            elif (type(product_type)==list) and (any(type(item)!=str for item in product_type)):
+                raise ValueError("Every item in 'product_type' must be of type 'str'.")
+            else:
+                #If product_type is specified correctly as a list, convert to upper, else leave as None
+                #NOTE FOR DEVELOPER: CHECK THAT CASING STYLE USED MATCHES THAT IN THE RAW DATA FROM POWERBI
+                product_type = [item.upper() for item in product_type] if product_type!=None else product_type
+                
+            #Create a list of all available values for Product Line Type
+            prod_type_options = self._index.values('Product Line Type')
+            #Remove any nan from this list, and record it in the nan_removed variable
+            nan_removed = False
+            if np.nan in prod_type_options:
+                prod_type_options.remove(np.nan)
+                nan_removed = True
+            #Then convert prod_type_options to upper case to match product_type
+            #NOTE FOR DEVELOPER: CHECK THAT CASING STYLE USED MATCHES THAT IN THE RAW DATA FROM POWERBI
+            prod_type_options = [item.upper() for item in prod_type_options]
+    
+            #If product_type is specified by user and it is not among acceptable options, return error
+            if (product_type!=None) and set(product_type).isdisjoint(set(prod_type_options)):
+                raise ValueError("Unrecognized product_type input. Acceptable values are:" + "\n" +
+                        "'L', for lending products," + "\n" +
+                        "'A', for AAA products, and" + "\n" + 
+                        "'S', for standard products.") 
+            
+            #If product_type is not specified by user, set product_type to all acceptable options
+            if product_type==None:
+                #If nan values were removed from prod_type_options, put them back
+                if nan_removed:
+                    prod_type_options.append(np.nan)
+                prod_type = prod_type_options
+            
+            #Finally, if product_type is specified correctly by user, set product_type to the corresponding value in prod_type_options
+            else:
+                prod_type = product_type
+                
+            #--------------------------------------------#
+            #If project_status is specified by user and it is not of type 'list', return error
+            if (project_status!=None) and (type(project_status)!=list):
+                raise TypeError("'project_status' must be of type 'list'.")
+            #If project_status is specified as a list and any item in project_status is not a string, return error
+            elif (type(project_status)==list) and (any(type(item)!=str for item in project_status)):
+                raise TypeError("Every item in 'project_status' must be of type 'str'.")
+            else:
+                #If project_status is specified correctly as a list, convert to title, else leave as None
+                #NOTE FOR DEVELOPER: CHECK THAT CASING STYLE USED MATCHES THAT IN THE RAW DATA FROM POWERBI
+                project_status = [item.title() for item in project_status] if project_status!=None else project_status
+                
+            #Get the list of possible options for project status
+            proj_stat_options = self._index.values('Project Status Name')
+            #Remove any nan from this list, and record it in the nan_removed variables
+            nan_removed = False
+            if np.nan in proj_stat_options:
+                proj_stat_options.remove(np.nan)
+                nan_removed=True
+            #Then convert proj_stat_options to title case to match project_status
+            proj_stat_options = [item.title() for item in proj_stat_options]
+            
+            #If project_status is specified by user and it is not among acceptable options, return error
+            if (project_status!=None) and set(project_status).isdisjoint(set(proj_stat_options)):
+                raise ValueError("Unrecognized project_status input. Acceptable values are:" + "\n" +
+                        '"Active", "Canceled", "Closed", "Dropped", "Draft", "Legacy Dropped", "Legacy", and "Pipeline".')
+            
+            #If project_status is not specified by user, set product_type to all acceptable options
+            if project_status==None:
+                #If nan was removed, put them back
+                if nan_removed:
+                    proj_stat_options.append(np.nan)
+                proj_status = proj_stat_options           
+            #Finally, if project_status is specified correctly by user, set proj_status to the specified value in project_status
+            else:
+                proj_status = project_status
+                
+            #--------------------------------------------#
+            #If include_AF is not of type 'bool', return error
+            if type(include_AF)!=bool:
+                raise TypeError("'include_AF' must be of type 'bool'.")
+            #If include_AF is True, set add_fin_choice to all available values of the Additional Financing Flag
+            elif include_AF==True:
+                add_fin_choice=self._index.values('Additional Financing Flag')
+            #If include_AF is False, exclude add_fin_choice value from the Additional Financing Flag
+            else:
+                add_fin_choice=self._index.values('Additional Financing Flag')
+                #NOTE FOR DEVELOPER: CONFIRM THAT 'Y' IS THE VALUE FOR ADDITIONAL FINANCING FLAG
+                add_fin_choice.remove('Y')
+            
+            #--------------------------------------------#
+            #If show_all is not of type 'bool', return error
+            if type(show_all)!=bool:
+                raise TypeError("show_all must be of type 'bool'.")
+                
+            #If show_meta is not of type 'bool', return error
+            if type(show_meta)!=bool:
+                raise TypeError("show_meta must be of type 'bool'.")
+            
+            #If the auxiliary arguments are used, keep only the rows approved from start_FY to stop_FY or with missing approval FY,
+            #taken from the FY partitions of the index, so that FY-bounded queries do not scan the rows of other years
+            base_rows = None if aux_args else self._index.fy_positions(start_FY, stop_FY)
+            #If portfolio is specified, keep only the rows of its projects, materialized by define_portfolio, without evaluating its filters again
+            if portfolio!=None:
+                portfolio_rows = self._index.portfolio_rows(portfolio)
+                base_rows = portfolio_rows if base_rows is None else np.intersect1d(base_rows, portfolio_rows, assume_unique=True)
+            if base_rows is not None:
+                temp_data = temp_data.take(base_rows)
+            
+            #IDENTIFY PROJECTS MATCHING THE TARGET_THEMES AND Min_PCT ARGUMENTS SPECIFIED
+            #--------------------------------------------#
+            #Step 1: get the rows with sector codes that match any of those in theme_codes
+            matching_theme_filter = temp_data['Theme Code'].isin(theme_codes)
+
+            #filter temp data to extract these matching sector codes only
+            matching_theme_df = temp_data.loc[matching_theme_filter,:].copy()
+            
+            #Step 2: Extract PIDs where at least one sector code match has a theme percentage >= the min_pct value
+            #Pivot the data so that each pid occupy a single row only
+            matching_theme_pivoted_df = matching_theme_df.pivot(index='Project Id', 
+                                                                columns='Theme Code', 
+                                                                values='Theme Percentage')
+            
+            #compute a min_pct_exceeded column that returns True if at least on theme code has percentage >= min_pct
+            matching_theme_pivoted_df['min_pct_exceeded'] = (matching_theme_pivoted_df>=min_pct).any(axis=1,skipna=True)
+            
+            #Reset index
+            matching_theme_pivoted_df.reset_index(inplace=True)
+            
+            #Extract PIDs where min_pct_exceeded column is True
+            pids_with_theme_above_min_pct = list(matching_theme_pivoted_df.loc[matching_theme_pivoted_df['min_pct_exceeded'],'Project Id'])
+            
+            #--------------------------------------------#
+            #Specify the output rows depending on the values of the auxiliary arguments
+            if aux_args:
+                output_rows = temp_data['Project Id'].isin(pids_with_theme_above_min_pct)
+            else:
+                output_rows = ((temp_data['Project Id'].isin(pids_with_theme_above_min_pct)) &            
+                               (temp_data['Product Line Type'].isin(prod_type)) &
+                               (temp_data['Project Status Name'].isin(proj_status)) &
+                               (temp_data['Project Approval FY'].isin(timeline)) & 
+                               (temp_data['Additional Financing Flag'].isin(add_fin_choice)))
+            
+            #--------------------------------------------#
+            #Specify the output columns depending on the value of show_meta
+            #In lazy mode, read the metadata columns not yet loaded
+            if show_meta:
+                temp_data = self._full_data() if base_rows is None else self._full_data().take(base_rows)
+            all_cols = list(temp_data.columns)
+            sel_cols = ['Project Id', 'Theme Code', 'Theme Name', 'Theme Percentage', 
+                        'Project Approval FY', 'Project Status Name', 'Product Line Type', 
+                        'Additional Financing Flag', 'Lead GP/Global Themes']
+            
+            #Output columns is all columns if show_meta is true, else show sel_cols
+            output_cols = all_cols if show_meta else sel_cols
+            
+            #--------------------------------------------#
+            #Filter the data based on output_rows and output_cols, and reset index
+            output_df = temp_data.loc[output_rows,output_cols]
+            output_df.reset_index(drop=True,inplace=True)
+            
+            #If user only wants to see the specified theme codes rather than all theme codes the matching projects are mapped to
+            if show_all==False:
+                #filter the data to show only the selected theme codes at cut-off
+                output_df = output_df.loc[output_df['Theme Code'].isin(theme_codes) & 
+                                           (output_df['Theme Percentage']>=min_pct), :].copy()
+                output_df.reset_index(drop=True,inplace=True)
+            
+            #--------------------------------------------#
+            #Check if output df is empty and alert user accordingly
+            if output_df.empty:
+                print("No projects meet the specified criteria.")
+            else: 
+                no_of_unique = output_df['Project Id'].nunique()
+                print(f"{no_of_unique} unique projects meet the specified criteria..") 
+                return output_df
+    ################################################
+
+    def get_themes(self, pid_list, theme_level=None, show_meta=False, workers=None, portfolio=None):
+                
+        """
+        Description
+        ----------
+        Returns theme codes that the specified projects are mapped to.
+        Supports variable assignment.
+        Data must already be loaded into the Themes object.
+        
+        Parameters
+        ----------
+        pid_list : list, tuple, set, array, Series or other iterable of str
+            The ID numbers of projects for which theme codes are to be returned. 
+        theme_level : list or None, default None
+            If list, returns only the theme codes matching the specified level(s).
+            Acceptable values are:
+                1: for the highest theme level,
+                2: for middle theme level,
+                3: for lowest theme level, or any combination of these. 
+            If None, returns all eligible themes, regardless of theme level.
+        show_meta : bool, default False
+            If True, returns additional project-level meta data.
+        workers : int or None, default None
+            If int, looks up the rows of the projects in a pool of that many processes, which pays off for very long pid_list.
+            If None, looks them up in the calling process.
+        portfolio : str or None, default None
+            If str, only the projects in pid_list that are in the portfolio of that name, defined with define_portfolio, are returned.
+        
+        Returns
+        ----------
+        DataFrame object, or, if data was loaded with load_data(out_of_core=True), an iterator of DataFrame objects, one per partition with data
+        """
+        
+        #If data is held on disk, run the query on the partitions holding the PIDs, one at a time, streaming the outputs
+        if self._partitions!=None:
+            #If portfolio is specified, return error, as portfolios are defined on data held in memory
+            if portfolio!=None:
+                raise ValueError("'portfolio' is not available for data loaded with out_of_core=True.")
+            pids = _normalize_pids(pid_list)
+            return self._stream(lambda part, part_pids: part.__get_themes(part_pids, theme_level, show_meta, workers), pids,
+                                 found=f"Data found for {{}} out of {len(pids)} requested projects.", none="No data found for specified PID(s).")
+        
+        #Run the query, and record it for save_last and plot_last
+        output_df = self.__get_themes(pid_list, theme_level, show_meta, workers, portfolio)
+        self._remember("get_themes", output_df)
+        return output_df
+    ################################################
+    
+    def __get_themes(self, pid_list, theme_level=None, show_meta=False, workers=None, portfolio=None):
+        #Stateless core of get_themes: reads the loaded data and returns the output without recording it,
+        #so it can be called from several threads at once
+        
+        #if data is not loaded to the object, alert user
+        if self._dataloaded==False:
+            print ("Data not yet loaded.")
+
+        #Otherwise, begin data extraction sequence
+        else:
+            
+            #USER INPUT VALIDATION
+            #Convert pid_list to an array of upper-case PIDs, returning error if it is not a collection of strings
+            pids = _normalize_pids(pid_list)
+            #If workers is specified and it is not a positive int, return error
+            if (workers!=None) and (type(workers)!=int or workers<1):
+                raise ValueError("'workers' must be a positive 'int' or None.")
+            #If portfolio is specified, keep only the PIDs in the portfolio
+            if portfolio!=None:
+                pids = self._index.portfolio_pids(portfolio, pids)
+                
+            #--------------------------------------------#
+            #Extract the rows of the PIDs at the specified theme levels
+            output_df = self.__theme_rows(pids, theme_level, show_meta, workers)
+            
+            #--------------------------------------------#
+            #Check if output df is empty and alert user accordingly
+            if output_df.empty:
+                print("No theme codes found.")
+            else:
+                no_of_unique = output_df['Project Id'].nunique()
+                print(f"Data found for {no_of_unique} out of {len(pids)} requested projects.")
+                return output_df 
+    ################################################
+    
+    def __theme_rows(self, pids, theme_level=None, show_meta=False, workers=None):
+        #Return the rows of the normalized pids, as get_themes does, without alerting user
+        import numpy as np
+        
+        #create copy of internal data
+        temp_data = self._data
+        
+        #--------------------------------------------#
+        #Create a list of all available values for Product Line Type
+        theme_level_options = [1,2,3]
+         
+        #If theme_level is specified by user and it is not of type 'list', return error
+        if (theme_level!=None) and (type(theme_level)!=list):
+             raise TypeError("'theme_level' must be of type list'.")
+        #If theme_level is specified by user and it is not among acceptable options, return error
+        elif (theme_level!=None) and set(theme_level).isdisjoint(set(theme_level_options)):
+             raise ValueError("Unrecognized theme_level input. Acceptable values are: 1, 2, and 3.")  
+        #If theme_level is not specified by user, set product_type to all acceptable options
+        elif theme_level==None:
+             level = theme_level_options 
+        #Finally, if theme_level is specified correctly by user, set product_type to the corresponding value in prod_type_options
+        else:
+             level = theme_level
+                
+        #--------------------------------------------#
+        #Identify the rows in temp_data that matches the PIDs, in a process pool if workers is specified
+        #Long PID lists often repeat PIDs; dropping repeats first keeps isin fast
+        if workers==None:
+            pid_rows = temp_data['Project Id'].isin(np.unique(pids))
+        else:
+            pid_rows = temp_data.index.isin(temp_data.index[_fan_out(self._index, "rows", pids, workers)])
+        output_rows = (pid_rows & 
+                       temp_data['Theme Level'].isin(level))
+        
+        #--------------------------------------------#
+        #Specify the output columns depending on the value of show_meta
+        #In lazy mode, read the metadata columns not yet loaded
+        if show_meta:
+            temp_data = self._full_data()
+        all_cols = list(temp_data.columns)
+        sel_cols = ['Project Id', 'Theme Code', 'Theme Name', 'Theme Percentage']
+        
+        #Show all columns if show_meta is true, else show sel_cols
+        output_cols = all_cols if show_meta else sel_cols
+    
+        #--------------------------------------------#
+        #Filter the data based on output_rows and output_cols
+        output_df = temp_data.loc[output_rows,output_cols].copy()
+        output_df.reset_index(drop=True,inplace=True)
+        return output_df
+    ################################################
+    
+    def iter_chunks(self, pid_list, chunk_size=10000, theme_level=None, show_meta=False):
+        """
+        Description
+        ----------
+        Returns theme codes that the specified projects are mapped to, as get_themes does, in batches of chunk_size PIDs.
+        PIDs are read from pid_list only as each batch is needed, so very long lists (e.g. a generator reading a file) can be written out batch by batch
+        without holding the whole output in memory.
+        Does not record its output for save_last and plot_last.
+        Data must already be loaded into the Themes object.
+        
+        Parameters
+        ----------
+        pid_list : list, tuple, set, array, Series or other iterable of str
+            The ID numbers of projects for which theme codes are to be returned.
+        chunk_size : int, default 10000
+            Number of PIDs per batch.
+        theme_level : list or None, default None
+            If list, returns only the theme codes matching the specified level(s), as in get_themes.
+        show_meta : bool, default False
+            If True, returns additional project-level meta data.
+        
+        Returns
+        ----------
+        generator of DataFrame objects, one per batch with data
+        """
+        
+        yield from self._iter_chunks(pid_list, chunk_size, lambda pids: self.__theme_rows(pids, theme_level, show_meta))
+    ################################################
+        
+    def save_last(self, save_name=None):
+        
+        """
+        Description
+        ----------
+        Exports the output from the most recent call of a get_projects or get_themes command.
+        Output is saved in .xlsx format.
+        
+        Parameters
+        ----------
+        save_name : str or None, default None
+            Name exported data should be saved with.
+            If None, exported data is saved with name "Themes_extract".  
+            Overwrites any pre-existing file of the same name in the save folder
+        
+        Returns
+        ----------
+        None
+        """
+        
+        #Record command in the last_command attribute
+        self._last_command = "save_last"
+        
+        #If there is no last output, alert user
+        if self._last_output_exist == False:
+            print("No output to save.")
+        #If there is last output, save it
+        else:
+            self._save_output(self._last_output, save_name)
+    ################################################
+    
+    def _session_queries(self):
+        #Return the query methods that a session exposes, by name
+        return {"get_projects":self._get_projects,
+                "get_themes":self.__get_themes}
+    ################################################
+    
+    def _save_output(self, output_df, save_name=None):
+        #Save output_df in .xlsx format; shared by save_last and Session.save_last
+        try:
+            #Check if save_name is specified
+            if save_name==None:
+                save_name = "Themes_extract.xlsx"
+            else:
+                #If specified save_name is not a str, return error
+                if type(save_name)!=str:
+                    raise TypeError("'save_name' must be of type 'str'.")
+                #Add fill extension to the save_name
+                save_name = save_name + ".xlsx"
+            #Save it to save_name
+            output_df.to_excel(save_name,index=False)
+            print("Output saved.")
+        except PermissionError:
+            print("ERROR! Save was unsuccessful. A file with the same name is currently open.")
+    ################################################           
+            
+    def plot_last(self, plot_by="themes", save_name=None):
+        
+        """
+        Description
+        ----------
+        Plots the output from the most recent call of a get_projects or get_sectors command.
+        Output can be saved in .png format.
+        
+        Parameters
+        ----------
+        plot_by : str, default "themes"
+            The grouping variable over which project counts will be plotted. 
+            Default value is "sectors", but other acceptable values are "GP", "FY", "Status", "region" and "Instrument".
+        save_name : str or None, default None
+            If str, plot created will be saved as a .png file with the string value as the file name.
+            Plot will be saved in the current working directory, and will overwrite any pre-existing file of the same name in the save folder.
+            If None, plot created will not be saved locally.
+        
+        Returns
+        ----------
+        None
+        """
+        
+        #If command not preceeded by get_projects or get_sectors, alert user
+        if ((self._last_command!= "get_projects") and 
+              (self._last_command!= "get_themes") and
+              (self._last_command!="plot_last")):
+            print("Command must be preceded by 'get_projects' or 'get_sectors'.")
+            
+        #If the previous command did not return a valid output, alert user
+        elif self._last_output_exist == False:
+            print("No output to plot.")
+        
+        #Else, plot the last output and record command in the last_command attribute
+        else:
+            self._plot_output(self._last_output, plot_by, save_name)
+            self._last_command = "plot_last"
+    ################################################
+    
+    def _plot_data(self, output_df, plot_by):
+        #Return the project counts of output_df by plot_by, sorted for plotting, and the plotted variable; shared by plot_last and render_charts
+        #Convert the plot_by input to variable in the output_df data
+        plot_by_dict = {"themes":"Theme Name",
+                       "gp":"Lead GP/Global Themes",
+                       "fy":"Project Approval FY",
+                       "region":"Region Name",
+                       "instrument":"Lending Instrument Long Name",
+                       "status":"Project Status Name"}
+
+        #Convert plot_by input to lower. If operation fails, report that it is not one of the acceptable options.  
+        try:
+            plot_by_var = plot_by_dict[plot_by.lower()]
+        except:
+            raise ValueError("'plot_by' value is unrecognized. Acceptable values are 'themes', 'GP', 'FY', STatus', 'Region', and 'Instrument'.")
+
+        if plot_by_var not in (output_df.columns):
+            raise KeyError("'plot_by' value is missing in output from previous command. Consider setting the 'show_meta' argument in previous command to True.")
+
+        #Count the number of projects missing data for the plot_by_input
+        missing_df = output_df[output_df[plot_by_var].isna()].copy()
+        missing_count = missing_df["Project Id"].nunique()
+
+        #If missing_FY_count > 0, notify user of of the impending exclusion
+        if missing_count>0:
+            print(f"WARNING! {missing_count} project(s) with missing values for {plot_by_var} got excluded from the plot.")
+
+        #Create pivot table of project count by plot_by_var
+        output_df=output_df.loc[output_df['Theme Level']==3].copy()
+        plot_series = output_df.groupby(plot_by_var)["Project Id"].nunique()
+
+        #Reset the index to transform plot series to dataframe
+        plot_df = plot_series.reset_index()
+
+        #Sort data accordingly
+        if plot_by_var == "Project Approval FY":
+            plot_df.sort_values(plot_by_var, ascending=False, inplace=True)
+        else:
+            plot_df.sort_values("Project Id", ascending=True, inplace=True)
+
+        return plot_df, plot_by_var
+    ################################################
+
+    def _plot_size(self, n_bars):
+        #Return the figure size of a plot of n_bars bars, or None for the default size
+        if n_bars in range(20,41):
+            return (7,7)
+        elif n_bars in range(40,61):
+            return (10,10)
+        elif n_bars>60:
+            return (15,15)
+        return None
+    ################################################
+    ################################################
+    ################################################
+
+def _draw_bar_chart(ax, plot_df, plot_by_var):
+    #Draw the horizontal bar chart of project counts of plot_last on ax
+    #Create horizontal bar chart, using a container to save the chart
+    fig_con = ax.barh(plot_df[plot_by_var],plot_df["Project Id"])
+
+    #Add data label
+    ax.bar_label(fig_con)
+
+    # make the x ticks integers, not floats
+    ax.set_xticks([int(each) for each in ax.get_xticks()])
+
+    if plot_by_var == "Project Approval FY":
+        ax.invert_yaxis()
+
+    #Add title to X-Axis
+    ax.set_xlabel("Project count")
+
+    #Add chart title
+    ax.set_title(f"Project count, by {plot_by_var}")
+################################################
+
+def _render_chart(plot_df, plot_by_var, figsize, path):
+    #Draw a plot_last bar chart on a figure of its own, outside pyplot and its global state, and save it to path; run by render_charts,
+    #possibly in a pool worker process
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    _draw_bar_chart(fig.subplots(), plot_df, plot_by_var)
+    fig.savefig(path, bbox_inches='tight')
+    return path
+################################################
+
+def _theme_parents(data, spec):
+    #Return, for each row of theme data, the position of the row of its parent theme in the same project, or -1 if it has none.
+    #The parent of a theme code is the closest code obtained by dropping its last digits that is mapped at a lower theme level
+    import numpy as np
+    import pandas as pd
+
+    code_col = spec["code"]
+    mapped = data[code_col].notna().to_numpy()
+    codes = data[code_col].to_numpy()[mapped].astype(np.int64)
+    code_level = pd.Series(data[spec["level"]].to_numpy()[mapped], index=codes).groupby(level=0).min()
+
+    #Find the parent code of each code of the taxonomy
+    parent_of = {}
+    for code, level in code_level.items():
+        parent = code//10
+        while (parent>0) and not (code_level.get(parent, level)<level):
+            parent //= 10
+        parent_of[code] = parent if parent>0 else -1
+
+    #Link each row to the first row of its parent code in the same project
+    rows = pd.DataFrame({'Project Id':data['Project Id'].to_numpy()[mapped], 'code':codes, 'row':np.flatnonzero(mapped)})
+    rows['parent'] = rows['code'].map(parent_of)
+    first_rows = rows.drop_duplicates(['Project Id', 'code'])[['Project Id', 'code', 'row']]
+    linked = rows.merge(first_rows, left_on=['Project Id', 'parent'], right_on=['Project Id', 'code'], how="left", suffixes=("", "_parent"))
+    parents = np.full(len(data), -1, dtype=np.int64)
+    parents[linked['row'].to_numpy()] = linked['row_parent'].fillna(-1).to_numpy(dtype=np.int64)
+    return parents
+################################################
+
+def _quality_report(data, spec, tolerance=0.5):
+    #Return one row per project and failed check of the merged data: percentages not adding up (within tolerance),
+    #codes repeated in several rows, metadata missing after the merge, and projects with metadata but no code rows
+    import numpy as np
+    import pandas as pd
+
+    code_col, pct_col = spec["code"], spec["pct"]
+    mapped = data[code_col].notna()
+    checks = []
+
+    #Sector percentages of each project that do not sum to 100
+    if spec["level"]==None:
+        pct_sums = data.loc[mapped, pct_col].groupby(data.loc[mapped, 'Project Id'], sort=False).sum()
+        bad_sums = pct_sums[(pct_sums-100).abs()>tolerance].reset_index()
+        checks.append(pd.DataFrame({'Project Id':bad_sums['Project Id'],
+                                    'Check':"Percentage sum",
+                                    'Detail':f"{pct_col} sums to " + bad_sums[pct_col].round(2).astype(str)}))
+
+    #Theme percentages are not expected to sum to 100 at each level: the taxonomy splits the percentage of a theme among
+    #the themes under it, so the percentages of the themes under each parent theme of a project must sum to the parent's
+    else:
+        parents = _theme_parents(data, spec)
+        child = parents>=0
+        pct = data[pct_col].to_numpy(dtype=float)
+        pct_sums = pd.Series(pct[child]).groupby(parents[child]).sum()
+        parent_rows = pct_sums.index.to_numpy(dtype=np.int64)
+        parent_pct = pd.Series(pct[parent_rows])
+        bad = ((pct_sums.reset_index(drop=True)-parent_pct).abs()>tolerance).to_numpy()
+        bad_rows = parent_rows[bad]
+        checks.append(pd.DataFrame({'Project Id':data['Project Id'].to_numpy()[bad_rows],
+                                    'Check':"Percentage sum",
+                                    'Detail':f"{pct_col} of the themes under {code_col} " +
+                                             data[code_col].to_numpy()[bad_rows].astype(np.int64).astype(str) + " sums to " +
+                                             pct_sums.to_numpy()[bad].round(2).astype(str) + ", not " + parent_pct.to_numpy()[bad].round(2).astype(str)}))
+
+    #Codes that a project is mapped to in more than one row
+    repeated = mapped & data.duplicated(['Project Id', code_col], keep=False)
+    repeats = data.loc[repeated].groupby(['Project Id', code_col], sort=False).size().reset_index(name="n")
+    checks.append(pd.DataFrame({'Project Id':repeats['Project Id'],
+                                'Check':"Repeated code",
+                                'Detail':f"{code_col} " + repeats[code_col].astype(spec["code_type"]).astype(str) + " appears in " + repeats["n"].astype(str) + " rows"}))
+
+    #Projects whose metadata is missing, i.e. that appear in the codes sheet but not in the metadata sheet
+    meta_cols = [x for x in _CORE_META_COLS[1:] if x in data.columns]
+    no_meta = pd.unique(data.loc[data[meta_cols].isna().all(axis=1).to_numpy(), 'Project Id'])
+    checks.append(pd.DataFrame({'Project Id':no_meta,
+                                'Check':"Missing metadata",
+                                'Detail':"Project not found in the metadata sheet"}))
+
+    #Projects with metadata but no code rows, i.e. that appear in the metadata sheet but not in the codes sheet
+    has_codes = mapped.groupby(data['Project Id'], sort=False).any()
+    no_codes = np.setdiff1d(has_codes.index[~has_codes.to_numpy()], no_meta)
+    checks.append(pd.DataFrame({'Project Id':no_codes,
+                                'Check':"No code rows",
+                                'Detail':f"Project not found in the {spec['sheet']} sheet"}))
+
+    report = pd.concat(checks, ignore_index=True)
+    return report.sort_values(['Project Id', 'Check'], kind="stable").reset_index(drop=True)
+################################################
+
+def _apply_quality(data, report, spec, quality=None):
+    #Return data with the projects flagged in report excluded ("exclude") or repaired ("repair"), or unchanged (None)
+    import numpy as np
+
+    if (quality==None) or report.empty:
+        return data
+    if quality=="exclude":
+        return data.loc[~data['Project Id'].isin(report['Project Id'].unique())].reset_index(drop=True)
+
+    #Repair: keep the first of repeated code rows, then rescale the sector percentages of each project to sum to 100,
+    #or the percentages of the themes under each parent theme to sum to the parent's, from the top theme level down
+    import pandas as pd
+
+    code_col, pct_col = spec["code"], spec["pct"]
+    mapped = data[code_col].notna()
+    data = data.loc[~(mapped & data.duplicated(['Project Id', code_col], keep="first"))].reset_index(drop=True)
+    flagged = data['Project Id'].isin(report.loc[report['Check']=="Percentage sum", 'Project Id'].unique()) & data[code_col].notna()
+    if spec["level"]==None:
+        pct_sums = data.loc[flagged].groupby('Project Id', sort=False)[pct_col].transform("sum")
+        data.loc[flagged, pct_col] = np.where(pct_sums>0, data.loc[flagged, pct_col]*100/pct_sums, data.loc[flagged, pct_col])
+    else:
+        parents = _theme_parents(data, spec)
+        pct = data[pct_col].to_numpy(dtype=float).copy()
+        levels = data[spec["level"]].to_numpy(dtype=float)
+        flagged_rows = flagged.to_numpy() & (parents>=0)
+        for level in np.unique(levels[flagged_rows]):
+            rows = np.flatnonzero(flagged_rows & (levels==level))
+            pct_sums = pd.Series(pct[rows]).groupby(parents[rows]).transform("sum").to_numpy()
+            pct[rows] = np.where(pct_sums>0, pct[rows]*pct[parents[rows]]/pct_sums, pct[rows])
+        data[pct_col] = pct
+    return data
+################################################
+
+def _normalize_pids(pid_list):
+    #Return pid_list, a list, tuple, set, array, Series or other iterable of PIDs, as an array of upper-case strings
+    import numpy as np
+    import pandas as pd
+
+    #If pid_list is a single string, a mapping or not iterable, return error
+    if isinstance(pid_list, (str, bytes, dict)) or not hasattr(pid_list, "__iter__"):
+        raise TypeError("'pid_list' must be a list, tuple, set, array, Series or other iterable of 'str'.")
+    if isinstance(pid_list, (pd.Series, pd.Index)):
+        pids = pid_list.to_numpy()
+    elif isinstance(pid_list, np.ndarray):
+        pids = pid_list.ravel()
+    else:
+        pids = np.array(list(pid_list), dtype=object)
+
+    #If each pid in pids is not a string, return error
+    if pd.api.types.infer_dtype(pids, skipna=False) not in ["string", "empty"]:
+        raise TypeError("Every item in 'pid_list' must be of type 'str'.")
+    return np.char.upper(pids.astype(str))
+################################################
+
+def _pid_chunks(pid_list, chunk_size):
+    #Yield pid_list in normalized chunks of chunk_size PIDs, reading iterators only as each chunk is needed
+    import itertools
+    import numpy as np
+    import pandas as pd
+
+    #If chunk_size is not a positive int, return error
+    if type(chunk_size)!=int or chunk_size<1:
+        raise ValueError("'chunk_size' must be a positive 'int'.")
+
+    #Arrays, Series and sequences are normalized at once and sliced; other iterables are read chunk by chunk
+    if isinstance(pid_list, (list, tuple, np.ndarray, pd.Series, pd.Index)):
+        pids = _normalize_pids(pid_list)
+        for start in range(0, len(pids), chunk_size):
+            yield pids[start:start+chunk_size]
+    else:
+        #If pid_list is a single string, a mapping or not iterable, return error
+        if isinstance(pid_list, (str, bytes, dict)) or not hasattr(pid_list, "__iter__"):
+            raise TypeError("'pid_list' must be a list, tuple, set, array, Series or other iterable of 'str'.")
+        pid_iter = iter(pid_list)
+        while True:
+            chunk = list(itertools.islice(pid_iter, chunk_size))
+            if not chunk:
+                break
+            yield _normalize_pids(chunk)
+################################################
+
+def _code_list(code_list, spec, name):
+    #Check a list of codes passed as the argument name, and return it with sector codes in upper case; shared by get_projects and ProjectQuery.codes
+    code_type = spec["code_type"]
+
+    #If code_list is not a list, return error
+    if type(code_list)!=list:
+        raise TypeError(f"'{name}' must be of type 'list'.")
+    #If any item in code_list is not of the expected type, return error
+    elif any(type(item)!=code_type for item in code_list):
+        raise TypeError(f"All items in '{name}' must be of type '{code_type.__name__}'.")
+
+    #Sector codes are matched in upper case
+    if code_type==str:
+        code_list = [item.upper() for item in code_list]
+        #If any element in code_list is a major sector code (i.e. end with 'X'), warn user
+        if any(item.endswith('X') for item in code_list):
+            print(f"WARNING! One or more items in '{name}' is not of the accepted sector hierarchy.")
+    return code_list
+################################################
+################################################
+################################################
+
+class ProjectQuery():
+    """
+    Description
+    ----------
+    Lazy, composable query over the data loaded into a Sectors or Themes object.
+    Created by the query method of a Sectors or Themes object rather than directly.
+    Each filter method returns a new ProjectQuery, so a partially built query can be reused as the base of several others.
+    Filters are only evaluated when collect, count or pids is called, and are fused into a single row mask:
+    the code and min_pct filters select candidate rows first, project-level filters are then evaluated on those candidate rows only,
+    and only the columns needed by the filters and the requested output are read.
+    count and pids evaluate the project-level filters on the project summary table instead, one row per project.
+    """
+
+    #Initialize the object
+    #cache: the _ColumnCache of data loaded with load_data(lazy=True), from which columns that were not loaded are read
+    def __init__(self, data, spec, index=None, cache=None):
+        self.__data = data
+        self.__spec = spec
+        self.__index = index
+        self.__cache = cache
+        self.__codes = None
+        self.__min_pct = 1
+        self.__start_FY = None
+        self.__stop_FY = None
+        self.__product_type = None
+        self.__project_status = None
+        self.__include_AF = True
+        self.__show_all = False
+        self.__columns = None
+    ################################################
+
+    def __str__(self):
+        """
+        Description
+        -------
+        String representation of a ProjectQuery object.
+        """
+        return ("Object class: ProjectQuery. " +
+                f"Codes: {self.__codes}. " +
+                f"Min pct: {self.__min_pct}. " +
+                f"FY: {self.__start_FY}-{self.__stop_FY}. " +
+                f"Product type: {self.__product_type}. " +
+                f"Project status: {self.__project_status}. " +
+                f"Include AF: {self.__include_AF}.")
+    ################################################
+
+    def __updated(self, **changes):
+        #Return a copy of the query with the specified private attributes replaced
+        import copy
+        new_query = copy.copy(self)
+        for name,value in changes.items():
+            setattr(new_query, "_ProjectQuery__"+name, value)
+        return new_query
+    ################################################
+
+    def __options(self, col):
+        #Return the values of a project-level column present in the data, other than missing values
+        import pandas as pd
+        options = self.__index.values(col) if self.__index!=None else list(self.__data[col].unique())
+        return [item for item in options if not pd.isna(item)]
+    ################################################
+
+    def codes(self, code_list):
+        """
+        Description
+        ----------
+        Restricts the query to projects mapped to one or more codes in code_list.
+        Sector codes must be of type 'str' and theme codes of type 'int'.
+
+        Parameters
+        ----------
+        code_list : list
+            Returned projects must be mapped to one or more codes in code_list.
+
+        Returns
+        ----------
+        ProjectQuery object
+        """
+
+        #Check code_list as get_projects does, converting sector codes to upper case and warning about major sector codes
+        code_list = _code_list(code_list, self.__spec, "code_list")
+        return self.__updated(codes=code_list)
+    ################################################
+
+    def min_pct(self, min_pct):
+        """
+        Description
+        ----------
+        Sets the minimum percentage of a project that at least one matching code must account for.
+        Has no effect unless codes has also been called.
+
+        Parameters
+        ----------
+        min_pct : int
+
+        Returns
+        ----------
+        ProjectQuery object
+        """
+
+        #If min_pct is not an int, return error
+        if type(min_pct)!=int:
+            raise TypeError("'min_pct' must be of type 'int'.")
+        #If min_pct is <0 or >100, warn user
+        elif min_pct<0 or min_pct>100:
+            print("WARNING! 'min_pct' is outside expected range of 0 to 100.")
+        return self.__updated(min_pct=min_pct)
+    ################################################
+
+    def fy(self, start_FY=None, stop_FY=None):
+        """
+        Description
+        ----------
+        Restricts the query to projects approved between start_FY and stop_FY, and projects with missing approval FY data.
+
+        Parameters
+        ----------
+        start_FY : int or None, default None
+            If None, no lower bound is applied.
+        stop_FY : int or None, default None
+            If None, no upper bound is applied.
+
+        Returns
+        ----------
+        ProjectQuery object
+        """
+
+        #If start_FY or stop_FY is specified by user and it is not of type 'int', return error
+        if (start_FY!=None) and (type(start_FY)!=int):
+            raise TypeError("'start_FY' must be of type 'int'.")
+        if (stop_FY!=None) and (type(stop_FY)!=int):
+            raise TypeError("'stop_FY' must be of type 'int'.")
+
+        #If stop_FY precedes start_FY, return error
+        if (start_FY!=None) and (stop_FY!=None) and (stop_FY < start_FY):
+            raise ValueError("'start_FY' and 'stop_FY' arguments are not in chronological order.")
+        return self.__updated(start_FY=start_FY, stop_FY=stop_FY)
+    ################################################
+
+    def product(self, product_type):
+        """
+        Description
+        ----------
+        Restricts the query to projects whose product type matches any of the values in product_type.
+        Acceptable values are "L", "A" and "S".
+
+        Parameters
+        ----------
+        product_type : list
+
+        Returns
+        ----------
+        ProjectQuery object
+        """
+
+        #If product_type is not a list of strings, return error
+        if type(product_type)!=list:
+            raise TypeError("'product_type' must be of type 'list'.")
+        elif any(type(item)!=str for item in product_type):
+            raise TypeError("All values in 'product_type' must be of type 'str'.")
+
+        #If none of the values in product_type is among acceptable options, return error, as get_projects does
+        product_type = [item.upper() for item in product_type]
+        if set(product_type).isdisjoint(item.upper() for item in self.__options('Product Line Type')):
+            raise ValueError("Unrecognized product_type input. Acceptable values are:" + "\n" +
+                    "'L', for lending products," + "\n" +
+                    "'A', for AAA products, and" + "\n" +
+                    "'S', for standard products.")
+        return self.__updated(product_type=product_type)
+    ################################################
+
+    def status(self, project_status):
+        """
+        Description
+        ----------
+        Restricts the query to projects whose completion status matches any of the values in project_status.
+        Acceptable values are: "Active", "Canceled", "Closed", "Dropped", "Draft", "Legacy Dropped", "Legacy", and "Pipeline".
+
+        Parameters
+        ----------
+        project_status : list
+
+        Returns
+        ----------
+        ProjectQuery object
+        """
+
+        #If project_status is not a list of strings, return error
+        if type(project_status)!=list:
+            raise TypeError("'project_status' must be of type 'list'.")
+        elif any(type(item)!=str for item in project_status):
+            raise TypeError("All values in 'project_status' must be of type 'str'.")
+
+        #If none of the values in project_status is among acceptable options, return error, as get_projects does
+        project_status = [item.title() for item in project_status]
+        if set(project_status).isdisjoint(item.title() for item in self.__options('Project Status Name')):
+            raise ValueError("Unrecognized project_status input. Acceptable values are:" + "\n" +
+                    '"Active", "Canceled", "Closed", "Dropped", "Draft", "Legacy Dropped", "Legacy", and "Pipeline".')
+        return self.__updated(project_status=project_status)
+    ################################################
+
+    def include_AF(self, include_AF):
+        """
+        Description
+        ----------
+        If include_AF is False, additional financing projects are excluded from the query.
+
+        Parameters
+        ----------
+        include_AF : bool
+
+        Returns
+        ----------
+        ProjectQuery object
+        """
+
+        #If include_AF is not of type 'bool', return error
+        if type(include_AF)!=bool:
+            raise TypeError("'include_AF' must be of type 'bool'.")
+        return self.__updated(include_AF=include_AF)
+    ################################################
+
+    def show_all(self, show_all):
+        """
+        Description
+        ----------
+        If show_all is True, collect returns all codes that matching projects are mapped to, rather than the matching codes only.
+
+        Parameters
+        ----------
+        show_all : bool
+
+        Returns
+        ----------
+        ProjectQuery object
+        """
+
+        #If show_all is not of type 'bool', return error
+        if type(show_all)!=bool:
+            raise TypeError("'show_all' must be of type 'bool'.")
+        return self.__updated(show_all=show_all)
+    ################################################
+
+    def columns(self, column_list):
+        """
+        Description
+        ----------
+        Sets the columns returned by collect.
+        If not called, collect returns the same columns as get_projects with show_meta=False.
+
+        Parameters
+        ----------
+        column_list : list or "all"
+            If "all", every column of the data is returned, including metadata columns not loaded by load_data(lazy=True).
+
+        Returns
+        ----------
+        ProjectQuery object
+        """
+
+        #Columns not loaded by load_data(lazy=True) are read from the column cache by collect
+        all_columns = list(self.__data.columns) if self.__cache==None else self.__cache.all_columns
+        if column_list=="all":
+            column_list = all_columns
+        #If column_list is not a list, return error
+        elif type(column_list)!=list:
+            raise TypeError("'column_list' must be of type 'list' or 'all'.")
+
+        #If any column in column_list is not in the data, return error
+        missing_cols = [col for col in column_list if col not in all_columns]
+        if missing_cols:
+            raise KeyError(f"Columns not found in data: {missing_cols}.")
+        return self.__updated(columns=column_list)
+    ################################################
+
+    def __matching_rows(self):
+        #Evaluate all filters as one mask and return the positions of the rows of matching projects
+        import numpy as np
+
+        data = self.__data
+        pct_col = self.__spec["pct"]
+
+        #Step 1: candidate rows are the rows mapped to the specified codes at or above min_pct
+        if self.__codes!=None:
+            code_mask = (data[self.__spec["code"]].isin(self.__codes).to_numpy() &
+                         (data[pct_col].to_numpy()>=self.__min_pct))
+            rows = np.flatnonzero(code_mask)
+        else:
+            rows = np.arange(len(data))
+
+        #Step 2: project-level filters are only evaluated on the candidate rows
+        return rows[self.__filter_mask(data, rows)]
+    ################################################
+
+    def __filter_mask(self, table, rows):
+        #Evaluate the project-level filters on the specified rows of table, either the loaded data or the project summary table
+        import numpy as np
+
+        mask = np.ones(len(rows), dtype=bool)
+        if (self.__start_FY!=None) or (self.__stop_FY!=None):
+            fy = table['Project Approval FY'].to_numpy(dtype=float)[rows]
+            fy_mask = np.ones(len(rows), dtype=bool)
+            if self.__start_FY!=None:
+                fy_mask &= (fy>=self.__start_FY)
+            if self.__stop_FY!=None:
+                fy_mask &= (fy<=self.__stop_FY)
+            #Projects with missing approval FY data are retained, as in get_projects
+            mask &= fy_mask | np.isnan(fy)
+        if self.__product_type!=None:
+            mask &= table['Product Line Type'].take(rows).isin(self.__product_type).to_numpy()
+        if self.__project_status!=None:
+            mask &= table['Project Status Name'].take(rows).isin(self.__project_status).to_numpy()
+        if self.__include_AF==False:
+            mask &= (table['Additional Financing Flag'].take(rows)!='Y').to_numpy()
+        return mask
+    ################################################
+
+    def __matching_projects(self):
+        #Evaluate all filters on the project summary table and return the matching projects' positions in PID order,
+        #ordered by their first matching row in the data
+        import numpy as np
+
+        index = self.__index
+
+        #Step 1: candidate projects are those mapped to the specified codes at or above min_pct
+        if self.__codes!=None:
+            positions = [index.code_position[code] for code in self.__codes if code in index.code_position]
+            rows = np.sort(np.concatenate([index.rows_of(i) for i in positions] + [np.zeros(0, dtype=int)]))
+            rows = rows[index.row_pct[rows]>=self.__min_pct]
+            projects, first = np.unique(index.row_pid[rows], return_index=True)
+            first_rows = rows[first]
+        else:
+            projects = np.arange(index.n_projects)
+            first_rows = index.project_first_row
+
+        #Step 2: project-level filters are evaluated once per candidate project
+        mask = self.__filter_mask(index.summary, projects)
+        projects, first_rows = projects[mask], first_rows[mask]
+        return projects[np.argsort(first_rows, kind="stable")]
+    ################################################
+
+    def pids(self):
+        """
+        Description
+        ----------
+        Returns the IDs of the projects matching the query.
+        Only the columns used by the filters are read.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        list
+        """
+
+        import pandas as pd
+
+        #Evaluate project-level filters on the project summary table when one is available
+        if self.__index!=None:
+            return self.__index.pids[self.__matching_projects()].tolist()
+
+        rows = self.__matching_rows()
+        return list(pd.unique(self.__data['Project Id'].to_numpy()[rows]))
+    ################################################
+
+    def count(self):
+        """
+        Description
+        ----------
+        Returns the number of unique projects matching the query.
+        Only the columns used by the filters are read.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        int
+        """
+
+        if self.__index!=None:
+            return len(self.__matching_projects())
+        return len(self.pids())
+    ################################################
+
+    def collect(self):
+        """
+        Description
+        ----------
+        Evaluates the query and returns the matching rows.
+        Only the output columns of the matching rows are materialized.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        DataFrame object
+        """
+
+        import numpy as np
+
+        data = self.__data
+        rows = self.__matching_rows()
+
+        #If user wants all codes of the matching projects, widen the selection to every row of those projects
+        if self.__show_all and (self.__codes!=None):
+            matching_pids = data['Project Id'].to_numpy()[rows]
+            rows = np.flatnonzero(data['Project Id'].isin(matching_pids).to_numpy())
+
+        #Materialize only the output columns of the selected rows
+        output_cols = self.__columns if self.__columns!=None else self.__spec["project_cols"]
+        loaded_cols = [col for col in output_cols if col in data.columns]
+        output_df = data.iloc[rows, data.columns.get_indexer(loaded_cols)]
+        output_df = output_df.reset_index(drop=True)
+        #Read the output columns that were not loaded from the column cache
+        if len(loaded_cols)<len(output_cols):
+            for col in output_cols:
+                if col not in loaded_cols:
+                    output_df[col] = self.__cache.column(col)[rows]
+            output_df = output_df[output_cols]
+        return output_df
+
+    ################################################
+    ################################################
+    ################################################
+
+class _CodeIndex():
+    """
+    Description
+    ----------
+    Dense numbering of the projects and codes in the data loaded into a Sectors or Themes object, built once at load time.
+    Holds, for each code, a bitmap of the projects mapped to it, packed eight projects to a byte.
+    """
+
+    #Initialize the object
+    def __init__(self, data, spec):
+        import numpy as np
+        import pandas as pd
+
+        self.data = data
+        self.spec = spec
+
+        #number projects densely, in sorted PID order
+        self.row_pid, self.pids = pd.factorize(data['Project Id'], sort=True)
+        self.pids = np.asarray(self.pids, dtype=str)
+        self.n_projects = len(self.pids)
+
+        #number codes densely; rows with no code are numbered -1
+        self.row_code, self.codes = pd.factorize(data[spec["code"]], sort=True)
+        self.codes = np.asarray(self.codes).astype(spec["code_type"])
+        self.row_pct = data[spec["pct"]].to_numpy(dtype=float)
+
+        #group row positions by code, so the rows of code i are code_rows[code_offsets[i]:code_offsets[i+1]]
+        self.code_rows = np.argsort(self.row_code, kind="stable")
+        self.code_offsets = np.searchsorted(self.row_code[self.code_rows], np.arange(len(self.codes)+1))
+        self.code_position = {code:i for i,code in enumerate(self.codes.tolist())}
+
+        #build one packed project bitmap per code
+        self.bitmaps = {}
+        for i,code in enumerate(self.codes.tolist()):
+            self.bitmaps[code] = self.bitmap(self.rows_of(i))
+
+        #bitmap with every project set, used to clear padding bits after a negation
+        self.all_bits = np.packbits(np.ones(self.n_projects, dtype=bool))
+
+        #group row positions by approval FY, so the rows approved in fy_values[i] are fy_rows[fy_offsets[i]:fy_offsets[i+1]],
+        #and the rows with missing approval FY, kept in their own partition, are fy_rows[fy_offsets[-1]:]
+        row_fy = pd.to_numeric(data['Project Approval FY'], errors="coerce").to_numpy(dtype=float)
+        self.fy_rows = np.argsort(row_fy, kind="stable")
+        n_dated = int(np.count_nonzero(~np.isnan(row_fy)))
+        self.fy_values, fy_starts = np.unique(row_fy[self.fy_rows[:n_dated]], return_index=True)
+        self.fy_offsets = np.append(fy_starts, n_dated)
+
+        self.column_values = {}
+        self.alignments = {}
+        self.project_columns = {}
+        self.csr = None
+        self.names = None
+        self.pool_dir = None
+        self.pool_names = None
+        self.row_name = None
+
+        #set by load_data(lazy=True) to read the metadata columns that were not loaded
+        self.column_cache = None
+
+        #one entry per project and code, in PID then code order: entry_rows are the positions of the mapped rows, row_entry the entry of each,
+        #and entry_pct the sum of the percentages of the rows of each entry
+        self.entry_rows = np.flatnonzero(self.row_code>=0)
+        n_codes = len(self.codes)
+        keys, self.row_entry = np.unique(self.row_pid[self.entry_rows].astype(np.int64)*n_codes+self.row_code[self.entry_rows], return_inverse=True)
+        self.entry_pct = np.bincount(self.row_entry, weights=np.nan_to_num(self.row_pct[self.entry_rows]), minlength=len(keys))
+        self.entry_pid, self.entry_code = keys//max(n_codes,1), keys%max(n_codes,1)
+        self.aggregates = {}
+        self.strata_cache = {}
+
+        #named portfolios, each a packed bitmap of projects, and the row positions and code indexes of each, built on first use
+        self.portfolios = {}
+        self.portfolio_cache = {}
+
+        #one row per project, for project-level filters and counts
+        self.project_first_row = np.unique(self.row_pid, return_index=True)[1]
+        self.summary = self.build_summary()
+
+        #structures built on first use are built under a lock, so that concurrent queries build them only once
+        import threading
+        self.lock = threading.RLock()
+    ################################################
+
+    def __getstate__(self):
+        #Return the state of the index for pickling, without the data, which the owning Sectors or Themes object stores and passes back to attach,
+        #the project summary, which attach rebuilds from the data, or structures that are cheap to build again on first use
+        state = self.__dict__.copy()
+        for key in ["data", "summary", "lock", "column_values", "aggregates", "strata_cache", "portfolio_cache", "alignments", "project_columns", "pool_dir", "pool_names", "row_name"]:
+            del state[key]
+        return state
+    ################################################
+
+    def __setstate__(self, state):
+        #Restore the state of the index when unpickling; it holds no data until attach is called
+        import threading
+        self.__dict__.update(state)
+        self.data = None
+        self.summary = None
+        self.column_values = {}
+        self.aggregates = {}
+        self.strata_cache = {}
+        self.portfolio_cache = {}
+        self.alignments = {}
+        self.project_columns = {}
+        self.pool_dir = None
+        self.pool_names = None
+        self.row_name = None
+        self.lock = threading.RLock()
+    ################################################
+
+    def attach(self, data):
+        #Set the data the index was built on, once restored, and rebuild the project summary from it
+        self.data = data
+        self.summary = self.build_summary()
+    ################################################
+
+    def build_summary(self):
+        #Return the project summary table: one row per project in PID order, with its main code, number of codes, largest percentage,
+        #list of codes and the metadata used by query filters
+        import numpy as np
+        import pandas as pd
+
+        spec = self.spec
+        entry_pid, entry_code, entry_pct = self.entry_pid, self.entry_code, self.entry_pct
+        offsets = np.searchsorted(entry_pid, np.arange(self.n_projects+1))
+        n_entries = np.diff(offsets)
+
+        #the main code is the code with the largest percentage, and is missing if several codes share it
+        max_pct = np.full(self.n_projects, np.nan)
+        has_codes = n_entries>0
+        max_pct[has_codes] = np.maximum.reduceat(entry_pct, offsets[:-1][has_codes])
+        at_max = entry_pct==max_pct[entry_pid]
+        single_max = at_max & (np.bincount(entry_pid[at_max], minlength=self.n_projects)[entry_pid]==1)
+        main_code = np.full(self.n_projects, None, dtype=object)
+        main_code[entry_pid[single_max]] = self.codes[entry_code[single_max]]
+
+        summary = pd.DataFrame({'Project Id':self.pids,
+                                "Main "+spec["code"]:main_code,
+                                spec["kind"].title()+" Count":n_entries,
+                                "Max "+spec["pct"]:max_pct,
+                                spec["code"]+"s":[x.tolist() for x in np.split(self.codes[entry_code], offsets[1:-1])]})
+        for col in _CORE_META_COLS[1:]:
+            if col in self.data.columns:
+                summary[col] = self.data[col].take(self.project_first_row).to_numpy()
+        return summary
+    ################################################
+
+    def fy_bounds(self):
+        #Return the first and last approval FY in the data, or 0 for both if no row has an approval FY
+        if len(self.fy_values)==0:
+            return 0, 0
+        return int(self.fy_values[0]), int(self.fy_values[-1])
+    ################################################
+
+    def fy_positions(self, start_FY, stop_FY):
+        #Return the positions, in data order, of the rows approved from start_FY to stop_FY and of the rows with missing approval FY,
+        #read from the FY partitions only; returns None if the range covers every approval FY in the data
+        import numpy as np
+
+        first = np.searchsorted(self.fy_values, start_FY, side="left")
+        last = np.searchsorted(self.fy_values, stop_FY, side="right")
+        if (first==0) and (last==len(self.fy_values)):
+            return None
+        rows = np.concatenate([self.fy_rows[self.fy_offsets[first]:self.fy_offsets[last]], self.fy_rows[self.fy_offsets[-1]:]])
+        rows.sort()
+        return rows
+    ################################################
+
+    def values(self, col):
+        #Return the list of unique values of a column of the data, in order of appearance, computing it on first use
+        with self.lock:
+            if col not in self.column_values:
+                self.column_values[col] = list(self.data[col].unique())
+        return list(self.column_values[col])
+    ################################################
+
+    def aggregate(self, keys, measure):
+        #Return the specified measure summed over the project and code entries for each combination of the keys, sorted by the keys,
+        #computing it on first use. Keys are the code or project-level columns; entries with a missing key value are left out
+        import numpy as np
+        import pandas as pd
+
+        with self.lock:
+            if (tuple(keys), measure) not in self.aggregates:
+                spec = self.spec
+                entries_df = pd.DataFrame({key:(self.codes[self.entry_code] if key==spec["code"] else self.project_column(key)[self.entry_pid])
+                                           for key in keys})
+                if measure=="projects":
+                    entries_df["value"] = 1
+                elif measure=="pct_weighted":
+                    entries_df["value"] = self.entry_pct / 100
+                else:
+                    commitment = self.data[spec["commitment"]].to_numpy(dtype=float)[self.entry_rows]
+                    entries_df["value"] = np.bincount(self.row_entry, weights=np.nan_to_num(commitment), minlength=len(self.entry_pid))
+                entries_df = entries_df.dropna(subset=keys)
+                if "Project Approval FY" in keys:
+                    entries_df["Project Approval FY"] = entries_df["Project Approval FY"].astype(int)
+                self.aggregates[(tuple(keys), measure)] = entries_df.groupby(keys, sort=True)["value"].sum()
+        return self.aggregates[(tuple(keys), measure)]
+    ################################################
+
+    def strata(self, keys):
+        #Return the stratum of each project in PID order for the combination of the keys, which are project summary or project-level columns,
+        #and the key values of each stratum; missing values make up strata of their own. Computed on first use
+        import numpy as np
+        import pandas as pd
+
+        with self.lock:
+            if tuple(keys) not in self.strata_cache:
+                if not keys:
+                    self.strata_cache[()] = (np.zeros(self.n_projects, dtype=np.int64), pd.DataFrame(index=[0]))
+                else:
+                    table = pd.DataFrame({key:(self.summary[key].to_numpy() if key in self.summary.columns else self.project_column(key))
+                                          for key in keys})
+                    grouped = table.groupby(keys, dropna=False, sort=True)
+                    self.strata_cache[tuple(keys)] = (grouped.ngroup().to_numpy(), grouped.size().index.to_frame(index=False))
+        return self.strata_cache[tuple(keys)]
+    ################################################
+
+    def define_portfolio(self, name, pids):
+        #Store the packed bitmap of the projects with the specified PIDs as the named portfolio, replacing any portfolio of that name
+        import numpy as np
+
+        bits = np.zeros(self.n_projects, dtype=bool)
+        bits[np.searchsorted(self.pids, np.asarray(pids, dtype=str))] = True
+        with self.lock:
+            self.portfolios[name] = np.packbits(bits)
+            self.portfolio_cache.pop(("rows", name), None)
+            self.portfolio_cache.pop(("index", name), None)
+    ################################################
+
+    def portfolio(self, name):
+        #Return the projects in the named portfolio, as a boolean array in PID order
+        import numpy as np
+
+        #If name is not a string, return error
+        if type(name)!=str:
+            raise TypeError("'portfolio' must be of type 'str' or None.")
+        #If no portfolio of that name is defined, return error
+        if name not in self.portfolios:
+            raise ValueError(f"Portfolio '{name}' is not defined. Defined portfolios are: {list(self.portfolios)}.")
+        return np.unpackbits(self.portfolios[name], count=self.n_projects).astype(bool)
+    ################################################
+
+    def portfolio_pids(self, name, pids):
+        #Return the normalized pids that are in the named portfolio
+        import numpy as np
+
+        in_portfolio = self.portfolio(name)
+        if self.n_projects==0:
+            return pids[:0]
+        position = np.minimum(np.searchsorted(self.pids, pids), self.n_projects-1)
+        return pids[(self.pids[position]==pids) & in_portfolio[position]]
+    ################################################
+
+    def portfolio_rows(self, name):
+        #Return the positions of the rows of the projects in the named portfolio, computed on first use
+        import numpy as np
+
+        in_portfolio = self.portfolio(name)
+        with self.lock:
+            if ("rows", name) not in self.portfolio_cache:
+                self.portfolio_cache[("rows", name)] = np.flatnonzero(in_portfolio[self.row_pid] & (self.row_pid>=0))
+        return self.portfolio_cache[("rows", name)]
+    ################################################
+
+    def portfolio_index(self, name):
+        #Return the code index of the rows of the projects in the named portfolio, built on first use, for aggregations restricted to it.
+        #In lazy mode, the metadata columns not loaded are read for the portfolio rows, as the index holds no column cache
+        rows = self.portfolio_rows(name)
+        with self.lock:
+            if ("index", name) not in self.portfolio_cache:
+                data = self.data if self.column_cache==None else self.column_cache.attach(self.data)
+                self.portfolio_cache[("index", name)] = _CodeIndex(data.take(rows).reset_index(drop=True), self.spec)
+        return self.portfolio_cache[("index", name)]
+    ################################################
+
+    def name_codes(self):
+        #Return the number of the code name of each row, falling back on the code where the name is missing, and the names,
+        #numbered on first use; rows with neither are numbered -1
+        import pandas as pd
+
+        with self.lock:
+            if self.row_name is None:
+                names = self.data[self.spec["name"]].where(self.data[self.spec["name"]].notnull(), self.data[self.spec["code"]])
+                self.row_name, self.pool_names = pd.factorize(names)
+        return self.row_name, self.pool_names
+    ################################################
+
+    def matrix(self):
+        #Return the projects x codes CSR matrix of percentages, building it on first use
+        import numpy as np
+        from scipy import sparse
+
+        with self.lock:
+            if self.csr is None:
+                mapped = self.row_code>=0
+                pct = np.nan_to_num(self.row_pct[mapped])
+                csr = sparse.csr_matrix((pct, (self.row_pid[mapped], self.row_code[mapped])),
+                                        shape=(self.n_projects, len(self.codes)))
+                csr.sum_duplicates()
+                self.csr = csr
+        return self.csr
+    ################################################
+
+    def name_index(self):
+        #Return the search index over the codes and names of the data, building it on first use
+        import numpy as np
+        import pandas as pd
+
+        with self.lock:
+            if self.names is None:
+                spec = self.spec
+
+                #one entry per code, with the name and hierarchy columns of its first row
+                first_rows = self.code_rows[self.code_offsets[:-1]]
+                vocabulary = pd.DataFrame({spec["code"]:self.codes})
+                for col in [spec["name"]]+spec["hierarchy"]:
+                    if col in self.data.columns:
+                        vocabulary[col] = self.data[col].to_numpy()[first_rows]
+
+                #number of projects mapped to each code
+                mapped = self.row_code>=0
+                pairs = np.unique(self.row_pid[mapped].astype(np.int64)*len(self.codes)+self.row_code[mapped])
+                vocabulary['Projects'] = np.bincount(pairs%max(len(self.codes),1), minlength=len(self.codes))
+                self.names = _NameIndex(vocabulary, [spec["code"], spec["name"]])
+        return self.names
+    ################################################
+
+    def incidence(self):
+        #Return the projects x codes matrix with a 1 wherever a project is mapped to a code
+        incidence = self.matrix().copy()
+        incidence.data[:] = 1
+        return incidence
+    ################################################
+
+    def project_column(self, col):
+        #Return the values of a project-level column, one per project in PID order
+        import numpy as np
+
+        with self.lock:
+            if col not in self.project_columns:
+                values = np.empty(self.n_projects, dtype=object)
+                if col not in self.data.columns:
+                    values[self.row_pid] = self.column_cache.column(col)
+                else:
+                    values[self.row_pid] = self.data[col].to_numpy()
+                self.project_columns[col] = values
+        return self.project_columns[col]
+    ################################################
+
+    def has_column(self, col):
+        #Return True if col is a column of the data, whether loaded or left to the column cache by load_data(lazy=True)
+        return (col in self.data.columns) or ((self.column_cache!=None) and (col in self.column_cache.lazy_columns))
+    ################################################
+
+    def rows_of(self, code_position):
+        #Return the positions of the rows mapped to the code at code_position
+        return self.code_rows[self.code_offsets[code_position]:self.code_offsets[code_position+1]]
+    ################################################
+
+    def bitmap(self, rows):
+        #Return the packed bitmap of the projects that the specified rows belong to
+        import numpy as np
+        bits = np.zeros(self.n_projects, dtype=bool)
+        bits[self.row_pid[rows]] = True
+        return np.packbits(bits)
+    ################################################
+
+    def code_bitmap(self, code, min_pct=None):
+        #Return the packed bitmap of the projects mapped to code, at or above min_pct if specified
+        import numpy as np
+
+        #If code is not in the data, warn user and return an empty bitmap
+        if code not in self.code_position:
+            print(f"WARNING! Code {code} not found in the loaded data.")
+            return np.zeros_like(self.all_bits)
+        if min_pct==None:
+            return self.bitmaps[code]
+        rows = self.rows_of(self.code_position[code])
+        return self.bitmap(rows[self.row_pct[rows]>=min_pct])
+    ################################################
+
+    def aligned_to(self, indexes):
+        #Return the union of the project IDs of the specified indexes, and the position of each index's projects in that union
+        import numpy as np
+
+        key = tuple(id(index) for index in indexes)
+        with self.lock:
+            cached = self.alignments.get(key)
+            if cached!=None and all(a is b for a,b in zip(cached[0], indexes)):
+                return cached[1], cached[2]
+            universe = indexes[0].pids
+            for index in indexes[1:]:
+                universe = np.union1d(universe, index.pids)
+            positions = [np.searchsorted(universe, index.pids) for index in indexes]
+            self.alignments[key] = (indexes, universe, positions)
+        return universe, positions
+    ################################################
+    ################################################
+    ################################################
+
+class _NameIndex():
+    """
+    Description
+    ----------
+    Trigram index over a small vocabulary of codes and names, built once and then searched on every call of search_codes.
+    """
+
+    #Initialize the object
+    def __init__(self, vocabulary, text_cols):
+        import numpy as np
+
+        self.vocabulary = vocabulary.reset_index(drop=True)
+        self.texts = [" ".join(_search_tokens(" ".join(str(row[col]) for col in text_cols if row[col]==row[col])))
+                      for _,row in self.vocabulary.iterrows()]
+        self.codes = [str(x).lower() for x in self.vocabulary[text_cols[0]]]
+
+        #postings: the entries that contain each trigram
+        self.n_trigrams = np.zeros(len(self.texts), dtype=int)
+        postings = {}
+        for i,text in enumerate(self.texts):
+            trigrams = _trigrams(text)
+            self.n_trigrams[i] = len(trigrams)
+            for trigram in trigrams:
+                postings.setdefault(trigram, []).append(i)
+        self.postings = {trigram:np.array(entries) for trigram,entries in postings.items()}
+    ################################################
+
+    def search(self, text, limit=20, min_score=0.2):
+        #Return the entries most similar to text, best first, with their score
+        import numpy as np
+
+        query = " ".join(_search_tokens(text))
+        trigrams = _trigrams(query)
+        if not trigrams:
+            return self.vocabulary.iloc[:0].assign(Score=np.zeros(0))
+
+        #Jaccard similarity of the trigram sets, counting shared trigrams through the postings
+        shared = np.zeros(len(self.texts))
+        for trigram in trigrams:
+            entries = self.postings.get(trigram)
+            if entries is not None:
+                shared[entries] += 1
+        score = shared/(len(trigrams)+self.n_trigrams-shared)
+
+        #Entries containing the query at the start of a word, or whose code is the query, rank first
+        score += np.array([(" "+query) in (" "+x) for x in self.texts], dtype=float)
+        score += 2*np.array([query==x for x in self.codes], dtype=float)
+
+        matches = np.flatnonzero(score>=min_score)
+        order = np.lexsort((-self.vocabulary['Projects'].to_numpy()[matches], -score[matches]))
+        output_df = self.vocabulary.iloc[matches[order][:limit]].copy()
+        output_df['Score'] = np.round(score[matches[order][:limit]], 3)
+        return output_df.reset_index(drop=True)
+################################################
+
+def _search_tokens(text):
+    #Return the lower-case words of text, splitting on anything other than letters and digits
+    import re
+    return re.findall(r"[a-z0-9]+", str(text).lower())
+################################################
+
+def _trigrams(text):
+    #Return the set of trigrams of the words of text, each word padded so that word starts and ends count
+    trigrams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        trigrams.update(padded[i:i+3] for i in range(len(padded)-2))
+    return trigrams
+################################################
+################################################
+################################################
+
+class CodeExpr():
+    """
+    Description
+    ----------
+    Boolean expression over sector and theme codes, created by the has_code method of a Sectors or Themes object.
+    Combine expressions with & (and), | (or), ^ (xor), - (and not) and ~ (not), then call pids or count to evaluate.
+    Expressions from a single object are evaluated directly on its packed project bitmaps.
+    Expressions mixing Sectors and Themes objects are evaluated over the union of their projects.
+    """
+
+    #Initialize the object
+    def __init__(self, op, operands=(), index=None, code=None, min_pct=None):
+        self.__op = op
+        self.__operands = operands
+        self.__index = index
+        self.__code = code
+        self.__min_pct = min_pct
+    ################################################
+
+    def __str__(self):
+        """
+        Description
+        -------
+        String representation of a CodeExpr object.
+        """
+        if self.__op=="code":
+            pct = f">={self.__min_pct}" if self.__min_pct!=None else ""
+            return f"{self.__index.spec['kind']}:{self.__code}{pct}"
+        if self.__op=="not":
+            return f"~{self.__operands[0]}"
+        symbols = {"and":" & ", "or":" | ", "xor":" ^ ", "andnot":" - "}
+        return "(" + symbols[self.__op].join(str(operand) for operand in self.__operands) + ")"
+    ################################################
+
+    def __combine(self, op, other):
+        #If other is not a CodeExpr, return error
+        if not isinstance(other, CodeExpr):
+            raise TypeError("Code expressions can only be combined with other code expressions.")
+        return CodeExpr(op, operands=(self, other))
+
+    def __and__(self, other):
+        return self.__combine("and", other)
+
+    def __or__(self, other):
+        return self.__combine("or", other)
+
+    def __xor__(self, other):
+        return self.__combine("xor", other)
+
+    def __sub__(self, other):
+        return self.__combine("andnot", other)
+
+    def __invert__(self):
+        return CodeExpr("not", operands=(self,))
+    ################################################
+
+    def __indexes(self):
+        #Return the distinct indexes referenced by the expression, in order of first use
+        if self.__op=="code":
+            return [self.__index]
+        indexes = []
+        for operand in self.__operands:
+            for index in operand.__indexes():
+                if not any(index is seen for seen in indexes):
+                    indexes.append(index)
+        return indexes
+    ################################################
+
+    def __evaluate(self, layout, all_bits):
+        #Evaluate the expression to a packed bitmap over the project universe described by layout
+        import numpy as np
+
+        if self.__op=="code":
+            bits = self.__index.code_bitmap(self.__code, self.__min_pct)
+            universe_size, positions = layout
+            #If the expression spans several indexes, move the bitmap onto the union of their projects
+            if positions!=None:
+                aligned = np.zeros(universe_size, dtype=bool)
+                index_pos = next(pos for index,pos in positions if index is self.__index)
+                aligned[index_pos] = np.unpackbits(bits, count=self.__index.n_projects).astype(bool)
+                bits = np.packbits(aligned)
+            return bits
+        if self.__op=="not":
+            return np.bitwise_and(np.invert(self.__operands[0].__evaluate(layout, all_bits)), all_bits)
+        left = self.__operands[0].__evaluate(layout, all_bits)
+        right = self.__operands[1].__evaluate(layout, all_bits)
+        if self.__op=="and":
+            return np.bitwise_and(left, right)
+        elif self.__op=="or":
+            return np.bitwise_or(left, right)
+        elif self.__op=="xor":
+            return np.bitwise_xor(left, right)
+        else:
+            return np.bitwise_and(left, np.invert(right))
+    ################################################
+
+    def __result(self):
+        #Evaluate the expression and return the matching project bitmap (unpacked) and the project IDs it is numbered over
+        import numpy as np
+
+        indexes = self.__indexes()
+        if len(indexes)==1:
+            universe = indexes[0].pids
+            layout = (len(universe), None)
+            all_bits = indexes[0].all_bits
+        else:
+            universe, positions = indexes[0].aligned_to(indexes)
+            layout = (len(universe), list(zip(indexes, positions)))
+            all_bits = np.packbits(np.ones(len(universe), dtype=bool))
+        bits = self.__evaluate(layout, all_bits)
+        return np.unpackbits(bits, count=len(universe)).astype(bool), universe
+    ################################################
+
+    def pids(self):
+        """
+        Description
+        ----------
+        Evaluates the expression and returns the IDs of the matching projects, in sorted order.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        list
+        """
+
+        matches, universe = self.__result()
+        return list(universe[matches])
+    ################################################
+
+    def count(self):
+        """
+        Description
+        ----------
+        Evaluates the expression and returns the number of matching projects.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        int
+        """
+
+        matches, universe = self.__result()
+        return int(matches.sum())
+    ################################################
+    ################################################
+    ################################################
+
+def _index_of(obj):
+    #Return the code index of a loaded Sectors or Themes object
+    return obj._index
+################################################
+
+def _code_labels(known, spec, codes):
+    #Return the codes in the codes list that are among the known codes, in the order of the list, warning user about the others
+    #If codes is not a list, return error
+    if type(codes)!=list:
+        raise TypeError("'codes' must be of type 'list' or None.")
+    if spec["code_type"]==str:
+        codes = [item.upper() for item in codes]
+    missing = [code for code in codes if code not in known]
+    if missing:
+        print(f"WARNING! Codes {missing} not found in the loaded data.")
+    return [code for code in codes if code in known]
+################################################
+
+def _cooccurrence(indexes, spec, codes=None, by_FY=False):
+    #Count the projects mapped to each pair of codes, as a product of the sparse project x code incidence matrix of each index,
+    #adding up the counts of indexes over different projects, e.g. the partitions of data loaded with load_data(out_of_core=True).
+    #spec is that of the data, so that an empty list of indexes, e.g. when every partition is pruned, gives an empty output
+    import numpy as np
+    import pandas as pd
+    from scipy import sparse
+
+    #If by_FY is not of type 'bool', return error
+    if type(by_FY)!=bool:
+        raise TypeError("'by_FY' must be of type 'bool'.")
+    #If codes is specified and it is not a list, return error
+    if (codes!=None) and (type(codes)!=list):
+        raise TypeError("'codes' must be of type 'list' or None.")
+
+    output_df = None
+    known = set()
+    for index in indexes:
+        known.update(index.codes.tolist())
+
+        #Keep the requested codes held by the index; those it does not hold may be held by other indexes
+        if codes==None:
+            positions = np.arange(len(index.codes))
+        else:
+            requested = [item.upper() for item in codes] if spec["code_type"]==str else codes
+            positions = np.array([index.code_position[code] for code in requested if code in index.code_position], dtype=int)
+        labels = index.codes[positions]
+        incidence = index.incidence()[:, positions].tocsr()
+
+        if by_FY==False:
+            counts = (incidence.T @ incidence).toarray().astype(int)
+            counts_df = pd.DataFrame(counts, index=labels, columns=labels)
+            output_df = counts_df if output_df is None else output_df.add(counts_df, fill_value=0)
+            continue
+
+        #Spread each project's codes over one block of columns per FY, so that a single product counts every FY at once
+        fy = pd.to_numeric(pd.Series(index.project_column('Project Approval FY')), errors="coerce").to_numpy()
+        fy_codes, fy_values = pd.factorize(fy, sort=True)
+        #Approval FYs are int, as in the output of trend and top_k; missing FYs are not among the factorized values
+        fy_values = fy_values.astype(int)
+        n_codes = len(positions)
+        coo = incidence.tocoo()
+        rows_fy = fy_codes[coo.row]
+        keep = rows_fy>=0
+        by_fy = sparse.csr_matrix((coo.data[keep], (coo.row[keep], rows_fy[keep]*n_codes + coo.col[keep])),
+                                  shape=(incidence.shape[0], len(fy_values)*n_codes))
+        counts = (by_fy.T @ incidence).tocoo()
+
+        counts_df = pd.DataFrame({"Project Approval FY":fy_values[counts.row // n_codes],
+                                  "Code A":labels[counts.row % n_codes],
+                                  "Code B":labels[counts.col],
+                                  "Projects":counts.data.astype(int)})
+        output_df = counts_df if output_df is None else pd.concat([output_df, counts_df], ignore_index=True)
+
+    #Warn user about the requested codes held by no index, and put the codes in the requested order
+    labels = sorted(known) if codes==None else _code_labels(known, spec, codes)
+    if by_FY==False:
+        output_df = pd.DataFrame(dtype=int) if output_df is None else output_df
+        return output_df.reindex(index=labels, columns=labels, fill_value=0).astype(int)
+
+    if output_df is None:
+        return pd.DataFrame({"Project Approval FY":np.zeros(0, dtype=int), "Code A":np.zeros(0, dtype=object),
+                             "Code B":np.zeros(0, dtype=object), "Projects":np.zeros(0, dtype=int)})
+    output_df = output_df.groupby(["Project Approval FY", "Code A", "Code B"], as_index=False, sort=True)["Projects"].sum()
+    output_df.reset_index(drop=True, inplace=True)
+    return output_df
+################################################
+
+def _trend(indexes, spec, by="FY", codes="all", measure="projects", window=None, share=False):
+    #Compute a code x grouping variable matrix of the specified measure in one groupby over the mapped rows of each index,
+    #adding up the matrices of indexes over different projects, e.g. the partitions of data loaded with load_data(out_of_core=True)
+    import numpy as np
+    import pandas as pd
+
+    #Convert the by input to a variable in the data
+    try:
+        by_var = _GROUP_VARS[by.lower()]
+    except (KeyError, AttributeError):
+        raise ValueError("'by' value is unrecognized. Acceptable values are 'FY', 'GP', 'Status', 'Region', and 'Instrument'.")
+
+    #If measure is not one of the acceptable options, return error
+    if measure not in ("projects", "commitment", "pct_weighted"):
+        raise ValueError("Unrecognized measure input. Acceptable values are 'projects', 'commitment' and 'pct_weighted'.")
+    #If window is specified and it is not a positive int, return error
+    if (window!=None) and (type(window)!=int or window<1):
+        raise ValueError("'window' must be a positive 'int' or None.")
+    #If window is specified and by is not FY, return error
+    if (window!=None) and (by_var!="Project Approval FY"):
+        raise ValueError("'window' is only available for by='FY'.")
+    #If share is not of type 'bool', return error
+    if type(share)!=bool:
+        raise TypeError("'share' must be of type 'bool'.")
+
+    matrix, totals = None, None
+    known = set()
+    for index in indexes:
+        if (measure=="commitment") and (spec["commitment"]==None):
+            raise ValueError(f"The 'commitment' measure is not available for {spec['kind']} data.")
+        known.update(index.codes.tolist())
+
+        #Select the rows mapped to a code, with their code, project, grouping value and measure
+        data = index.data
+        mapped = np.flatnonzero(index.row_code>=0)
+        rows_df = pd.DataFrame({"code":index.row_code[mapped],
+                                "pid":index.row_pid[mapped],
+                                "by":data[by_var].to_numpy()[mapped]})
+        if measure=="commitment":
+            rows_df["value"] = data[spec["commitment"]].to_numpy(dtype=float)[mapped]
+        elif measure=="pct_weighted":
+            rows_df["value"] = index.row_pct[mapped] / 100
+        rows_df = rows_df.dropna(subset=["by"])
+        if by_var=="Project Approval FY":
+            rows_df["by"] = rows_df["by"].astype(int)
+
+        #Aggregate every code and grouping value at once, and label the rows with the codes
+        grouped = rows_df.groupby(["code", "by"])
+        if measure=="projects":
+            index_matrix = grouped["pid"].nunique().unstack(fill_value=0)
+        else:
+            index_matrix = grouped["value"].sum().unstack(fill_value=0)
+        index_matrix.index = index.codes[index_matrix.index.to_numpy()]
+        matrix = index_matrix if matrix is None else matrix.add(index_matrix, fill_value=0)
+
+        #Count the projects of each column, which add up over indexes as they hold different projects
+        if share and (measure=="projects"):
+            index_totals = rows_df.groupby("by")["pid"].nunique()
+            totals = index_totals if totals is None else totals.add(index_totals, fill_value=0)
+
+    #With no index, e.g. when every partition is pruned, the matrix is empty
+    if matrix is None:
+        matrix = pd.DataFrame(dtype=float)
+    if totals is None:
+        totals = pd.Series(dtype=float)
+    matrix = matrix.fillna(0).reindex(columns=sorted(matrix.columns))
+    if measure=="projects":
+        matrix = matrix.astype(int)
+
+    #Compute the portfolio total of each column before codes are subset
+    if share:
+        if measure!="projects":
+            totals = matrix.sum(axis=0)
+        matrix = matrix / totals.reindex(matrix.columns).replace(0, np.nan)
+
+    #Keep the requested codes only
+    matrix.index.name = spec["code"]
+    matrix.columns.name = by_var
+    if codes!="all":
+        labels = sorted(known) if codes==None else _code_labels(known, spec, codes)
+        matrix = matrix.reindex(labels, fill_value=0)
+
+    #Smooth over consecutive fiscal years if requested, filling in years without data so that the window spans calendar years
+    if window!=None:
+        if len(matrix.columns):
+            matrix = matrix.reindex(columns=range(matrix.columns.min(), matrix.columns.max()+1), fill_value=0)
+            matrix.columns.name = by_var
+        matrix = matrix.T.rolling(window, min_periods=1).mean().T
+    return matrix
+################################################
+
+def _top_k(indexes, spec, k=10, by="code", within=None, measure="projects"):
+    #Return the k values of by with the largest measure within each combination of the within variables, selecting them from the aggregate
+    #of each index by partial selection rather than by sorting each group, and adding up the aggregates of indexes over different projects
+    import numpy as np
+    import pandas as pd
+
+    #If k is not a positive int, return error
+    if (type(k)!=int) or (k<1):
+        raise ValueError("'k' must be a positive 'int'.")
+    #If within is specified and it is not a list, return error
+    if (within!=None) and (type(within)!=list):
+        raise TypeError("'within' must be of type 'list' or None.")
+    #If measure is not one of the acceptable options, return error
+    if measure not in ("projects", "commitment", "pct_weighted"):
+        raise ValueError("Unrecognized measure input. Acceptable values are 'projects', 'commitment' and 'pct_weighted'.")
+
+    if (measure=="commitment") and (spec["commitment"]==None):
+        raise ValueError(f"The 'commitment' measure is not available for {spec['kind']} data.")
+
+    #Convert by and within to variables in the data: "code", a grouping variable of trend, or a project-level column
+    keys, items = [], (within if within!=None else [])+[by]
+    for item in items:
+        if type(item)!=str:
+            raise TypeError("'by' and every item in 'within' must be of type 'str'.")
+        key = spec["code"] if item.lower()=="code" else _GROUP_VARS.get(item.lower(), item)
+        if key in keys:
+            raise ValueError(f"'{item}' is used more than once in 'by' and 'within'.")
+        keys.append(key)
+    #Measures are summed over project and code entries, so the code must be among the keys
+    if spec["code"] not in keys:
+        raise ValueError("'code' must be either 'by' or an item in 'within'.")
+    measure_col = {"projects":"Projects", "commitment":"Commitment", "pct_weighted":"Pct Weighted"}[measure]
+
+    aggregate, n_indexes = None, 0
+    for index in indexes:
+        for item,key in zip(items, keys):
+            if (key!=spec["code"]) and (not index.has_column(key)):
+                raise ValueError(f"'{item}' is not 'code', a grouping variable of trend ('FY', 'GP', 'Status', 'Region', 'Instrument'), " +
+                                 "or a column of the data.")
+
+        index_aggregate = index.aggregate(keys, measure)
+        aggregate = index_aggregate if aggregate is None else aggregate.add(index_aggregate, fill_value=0)
+        n_indexes += 1
+    #With no index, e.g. when every partition is pruned, there is nothing to rank
+    if aggregate is None:
+        return pd.DataFrame(columns=keys[:-1]+["Rank", keys[-1], measure_col])
+    if n_indexes>1:
+        aggregate = aggregate.sort_index()
+
+    #Find the rows of each group, which are consecutive as the aggregate is sorted by the within variables first
+    values = aggregate.to_numpy()
+    if len(keys)>1:
+        group_codes = pd.MultiIndex.from_arrays([aggregate.index.get_level_values(i) for i in range(len(keys)-1)]).factorize()[0]
+        offsets = np.flatnonzero(np.diff(group_codes))+1
+    else:
+        offsets = np.array([], dtype=int)
+    offsets = np.concatenate([[0], offsets, [len(values)]])
+
+    #Select the k largest values of each group with a partial selection, breaking ties at the k-th value in order of the by values
+    selected, ranks = [], []
+    for start, stop in zip(offsets[:-1], offsets[1:]):
+        group = values[start:stop]
+        if len(group)>k:
+            kth = -np.partition(-group, k-1)[k-1]
+            above = np.flatnonzero(group>kth)
+            keep = np.concatenate([above, np.flatnonzero(group==kth)[:k-len(above)]])
+        else:
+            keep = np.arange(len(group))
+        keep = keep[np.lexsort((keep, -group[keep]))]
+        selected.append(start+keep)
+        ranks.append(np.arange(1, len(keep)+1))
+    selected = np.concatenate(selected) if selected else np.array([], dtype=int)
+
+    output_df = aggregate.iloc[selected].reset_index()
+    output_df.insert(len(keys)-1, "Rank", np.concatenate(ranks) if ranks else np.array([], dtype=int))
+    output_df.rename(columns={"value":measure_col}, inplace=True)
+    if measure=="projects":
+        output_df["Projects"] = output_df["Projects"].astype(int)
+    return output_df
+################################################
+
+def _sample(index, n=None, frac=None, strata=None, seed=None, allocation="proportional", replace=False, pids=None):
+    #Draw a stratified sample of the projects of index, or of the specified PIDs, from the project summary table in one vectorized pass:
+    #projects are ordered by stratum and, within each stratum, by a random key, and the first projects of each stratum are kept
+    import numpy as np
+
+    #If neither or both of n and frac are specified, return error
+    if (n==None)==(frac==None):
+        raise ValueError("Exactly one of 'n' and 'frac' must be specified.")
+    #If n is specified and it is not a positive int, return error
+    if (n!=None) and (type(n)!=int or n<1):
+        raise ValueError("'n' must be a positive 'int'.")
+    #If frac is specified and it is not a positive number, return error
+    if (frac!=None) and (type(frac) not in (int, float) or frac<=0):
+        raise ValueError("'frac' must be a positive 'float'.")
+    #If frac is above 1 without replacement, return error
+    if (frac!=None) and (frac>1) and (replace==False):
+        raise ValueError("'frac' above 1 requires replace=True.")
+    #If strata is specified and it is not a list of strings, return error
+    if (strata!=None) and ((type(strata)!=list) or any(type(item)!=str for item in strata)):
+        raise TypeError("'strata' must be a list of 'str' or None.")
+    #If seed is specified and it is not an int, return error
+    if (seed!=None) and (type(seed)!=int):
+        raise TypeError("'seed' must be of type 'int' or None.")
+    #If allocation is not one of the acceptable options, return error
+    if allocation not in ("proportional", "fixed"):
+        raise ValueError("Unrecognized allocation input. Acceptable values are 'proportional' and 'fixed'.")
+    #If allocation is fixed and n is not specified, return error
+    if (allocation=="fixed") and (n==None):
+        raise ValueError("allocation='fixed' requires 'n', the number of projects per stratum.")
+    #If replace is not of type 'bool', return error
+    if type(replace)!=bool:
+        raise TypeError("'replace' must be of type 'bool'.")
+
+    #Convert the strata to columns: "main" for the main code, a grouping variable of trend, or a project-level column
+    spec = index.spec
+    keys = []
+    for item in (strata if strata!=None else []):
+        key = "Main "+spec["code"] if item.lower()=="main" else _GROUP_VARS.get(item.lower(), item)
+        if (key not in index.summary.columns) and (not index.has_column(key)):
+            raise ValueError(f"'{item}' is not 'main', a grouping variable of trend ('FY', 'GP', 'Status', 'Region', 'Instrument'), " +
+                             "or a project-level column of the data.")
+        keys.append(key)
+
+    #The sampling frame is every project, or the specified PIDs found in the data
+    if pids==None:
+        frame = np.arange(index.n_projects)
+    else:
+        pids = np.asarray(pids, dtype=str)
+        position = np.minimum(np.searchsorted(index.pids, pids), max(index.n_projects-1, 0))
+        frame = np.unique(position[index.pids[position]==pids]) if index.n_projects else np.zeros(0, dtype=int)
+    stratum_of, labels = index.strata(keys)
+    stratum = stratum_of[frame]
+    population = np.bincount(stratum, minlength=len(labels))
+
+    #Allocate the sample to the strata
+    if allocation=="fixed":
+        size = np.full(len(population), n)
+    elif frac!=None:
+        size = np.round(frac*population).astype(int)
+    else:
+        #If more projects are requested than there are in the frame without replacement, return error
+        if (replace==False) and (n>len(frame)):
+            raise ValueError(f"'n' is larger than the {len(frame)} projects to sample from.")
+        #n is split in proportion to the strata, giving the projects left over by rounding down to the largest remainders
+        exact = n*population/max(len(frame),1)
+        size = np.floor(exact).astype(int)
+        size[np.argsort(size-exact, kind="stable")[:n-size.sum()]] += 1
+    size[population==0] = 0
+    if replace==False:
+        if (allocation=="fixed") and (size>population).any():
+            print(f"WARNING! {int(np.count_nonzero(size>population))} strata hold fewer than {n} projects. All their projects are sampled.")
+        size = np.minimum(size, population)
+
+    #With replacement, draw positions within each stratum of the frame ordered by stratum.
+    #Otherwise, order the frame by stratum and, within each stratum, by a random key added to it, then keep the first projects of each stratum
+    rng = np.random.default_rng(seed)
+    starts = np.concatenate([[0], np.cumsum(population)[:-1]]).astype(int)
+    if replace:
+        order = np.argsort(stratum, kind="stable")
+        draws = np.repeat(np.arange(len(size)), size)
+        picks = order[starts[draws] + (rng.random(len(draws))*population[draws]).astype(int)]
+    else:
+        order = np.argsort(stratum + rng.random(len(frame)))
+        ordered = stratum[order]
+        picks = order[(np.arange(len(order))-starts[ordered])<size[ordered]]
+    projects = frame[picks]
+
+    #Return the project summary rows of the sample, with the strata and the sampling weight of each project
+    output_df = index.summary.iloc[projects].reset_index(drop=True)
+    for key in keys:
+        if key not in output_df.columns:
+            output_df[key] = index.project_column(key)[projects]
+    output_df["Weight"] = population[stratum[picks]] / size[stratum[picks]]
+    return output_df
+################################################
+
+def _filtered_query(query, filters):
+    #Apply filters given as get_projects keyword arguments (codes, min_pct, start_FY, stop_FY, product_type, project_status, include_AF) to a ProjectQuery
+    accepted = ["codes", "min_pct", "start_FY", "stop_FY", "product_type", "project_status", "include_AF"]
+    #If any filter is not among the accepted ones, return error
+    unknown = [key for key in filters if key not in accepted]
+    if unknown:
+        raise TypeError(f"Unrecognized filters: {unknown}. Acceptable filters are: {accepted}.")
+
+    if "codes" in filters:
+        query = query.codes(filters["codes"])
+    if "min_pct" in filters:
+        query = query.min_pct(filters["min_pct"])
+    if ("start_FY" in filters) or ("stop_FY" in filters):
+        query = query.fy(filters.get("start_FY"), filters.get("stop_FY"))
+    if "product_type" in filters:
+        query = query.product(filters["product_type"])
+    if "project_status" in filters:
+        query = query.status(filters["project_status"])
+    if "include_AF" in filters:
+        query = query.include_AF(filters["include_AF"])
+    return query
+################################################
+
+def _sweep_thresholds(thresholds):
+    #Return the thresholds of a sweep as a list of int, in the specified order
+    #If thresholds is not an iterable of int, return error
+    try:
+        thresholds = list(thresholds)
+    except TypeError:
+        raise TypeError("'thresholds' must be an iterable of 'int'.")
+    if any(type(item)!=int for item in thresholds):
+        raise TypeError("All items in 'thresholds' must be of type 'int'.")
+    if len(thresholds)==0:
+        raise ValueError("'thresholds' must hold at least one value.")
+    return thresholds
+################################################
+
+def _at_or_above(values, thresholds, groups=None, n_groups=1):
+    #Count the values at or above each threshold, separately for each group, from one sort of the thresholds:
+    #each value is binned by the number of thresholds it reaches, and the bins are added up from the top
+    import numpy as np
+
+    levels = np.unique(thresholds)
+    bins = np.searchsorted(levels, values, side="right")
+    groups = np.zeros(len(values), dtype=np.int64) if groups is None else groups
+    counts = np.bincount(groups*(len(levels)+1)+bins, minlength=n_groups*(len(levels)+1)).reshape(n_groups, len(levels)+1)
+    counts = np.cumsum(counts[:, ::-1], axis=1)[:, ::-1]
+    return counts[:, 1:][:, np.searchsorted(levels, thresholds)]
+################################################
+
+def _sweep_min_pct(indexes, spec, codes, thresholds=range(0,101,5)):
+    #Count the projects that get_projects returns for the codes at each min_pct threshold, from the largest percentage of a matching code
+    #in each project, adding up the counts of indexes over different projects
+    import numpy as np
+    import pandas as pd
+
+    #If codes is not a list, return error
+    if type(codes)!=list:
+        raise TypeError("'codes' must be of type 'list'.")
+    thresholds = _sweep_thresholds(thresholds)
+    #If any threshold is <0 or >100, warn user
+    if any((item<0) or (item>100) for item in thresholds):
+        print("WARNING! One or more 'thresholds' are outside expected range of 0 to 100.")
+
+    counts = np.zeros(len(thresholds), dtype=np.int64)
+    known = set()
+    for index in indexes:
+        known.update(index.codes.tolist())
+        requested = [item.upper() for item in codes] if spec["code_type"]==str else codes
+        positions = [index.code_position[code] for code in requested if code in index.code_position]
+        rows = np.concatenate([index.rows_of(i) for i in positions] + [np.zeros(0, dtype=int)])
+        rows = rows[~np.isnan(index.row_pct[rows])]
+
+        #Sort the matching rows by project and percentage once, so that the last row of each project holds its largest percentage
+        pid, pct = index.row_pid[rows], index.row_pct[rows]
+        order = np.lexsort((pct, pid))
+        pid, pct = pid[order], pct[order]
+        is_last = np.ones(len(pid), dtype=bool)
+        is_last[:-1] = pid[1:]!=pid[:-1]
+        counts += _at_or_above(pct[is_last], thresholds)[0]
+
+    #Warn user about the requested codes held by no index
+    _code_labels(known, spec, codes)
+    return pd.DataFrame({"Projects":counts}, index=pd.Index(thresholds, name="Threshold"))
+################################################
+
+def _sweep_main(indexes, thresholds=range(0,101,5), pids=None, assignments=False):
+    #Count the projects of each main code at each threshold of main_sector, or return the main code of each project at each threshold,
+    #from the range of thresholds over which each code of a project is its main code, adding up the counts of indexes over different projects
+    import numpy as np
+    import pandas as pd
+
+    #If assignments is not of type 'bool', return error
+    if type(assignments)!=bool:
+        raise TypeError("'assignments' must be of type 'bool'.")
+    thresholds = _sweep_thresholds(thresholds)
+    #If any threshold is not in range 0-100, return error
+    if any(item not in range(0,101) for item in thresholds):
+        raise ValueError("One or more 'thresholds' are outside expected range of 0 to 100.")
+    #If any threshold is 50 or less, warn user of potential result unreability
+    if min(thresholds)<51:
+        print("WARNING! 'thresholds' values of 50 or less may give rise to multiple main codes, but only one will be returned.")
+
+    levels = np.unique(thresholds)
+    outputs = []
+    for index in indexes:
+        spec = index.spec
+        row_name, names = index.name_codes()
+
+        #Select the rows of all projects, or of the requested projects found in the index
+        if pids is None:
+            rows = np.arange(len(row_name))
+        else:
+            position = np.minimum(np.searchsorted(index.pids, pids), max(index.n_projects-1, 0))
+            found = (index.pids[position]==pids) if index.n_projects else np.zeros(len(pids), dtype=bool)
+            selected = np.zeros(index.n_projects, dtype=bool)
+            selected[position[found]] = True
+            rows = np.flatnonzero(selected[index.row_pid])
+        if len(rows)==0:
+            continue
+
+        #keep one entry per project and name, at the row where the name first appears but with the percentage of its last row,
+        #as main_sector does
+        project, name = index.row_pid[rows], row_name[rows]
+        order = np.lexsort((rows, name, project))
+        project, name, rows = project[order], name[order], rows[order]
+        new_entry = np.ones(len(rows), dtype=bool)
+        new_entry[1:] = (project[1:]!=project[:-1]) | (name[1:]!=name[:-1])
+        first = np.flatnonzero(new_entry)
+        last = np.append(first[1:], len(rows))-1
+        project, name, first_row, pct = project[first], name[first], rows[first], index.row_pct[rows[last]]
+
+        #Order the entries of each project by first row; the main code at a threshold is the last entry at or above it,
+        #so each entry is the main code from just above the largest percentage of the entries after it, up to its own percentage
+        order = np.lexsort((first_row, project))
+        project, name, first_row, pct = project[order], name[order], first_row[order], np.nan_to_num(pct[order], nan=-np.inf)
+        later = pd.Series(pct[::-1]).groupby(project[::-1]).shift(1, fill_value=-np.inf)
+        later = later.groupby(project[::-1]).cummax().to_numpy()[::-1]
+        upper, lower = pct, later
+
+        #The name of a project mapped to a single name is its main code at every threshold
+        single = np.bincount(project)[project]==1
+        upper, lower = np.where(single, np.inf, upper), np.where(single, -np.inf, lower)
+
+        if assignments:
+            #Spread each entry over the thresholds it is the main code for
+            projects, local = np.unique(project, return_inverse=True)
+            start, stop = np.searchsorted(levels, lower, side="right"), np.searchsorted(levels, upper, side="right")
+            lengths = np.maximum(stop-start, 0)
+            offsets = np.cumsum(lengths)-lengths
+            main = np.full((len(projects), len(levels)), -2)
+            main[np.repeat(local, lengths), np.repeat(start-offsets, lengths)+np.arange(lengths.sum())] = np.repeat(name, lengths)
+
+            #Name numbers are -1 for a missing name and -2 for an ambiguous main code
+            labels = np.array(["AMBIGUOUS", np.nan] + list(names), dtype=object)
+            main = labels[main[:, np.searchsorted(levels, thresholds)]+2]
+            index_df = pd.DataFrame(main, columns=thresholds)
+            index_df.insert(0, "PID", index.pids[projects])
+            outputs.append(index_df.take(np.argsort(index.project_first_row[projects], kind="stable")))
+            continue
+
+        #Count, for each name, the entries reaching each threshold less those whose later entries also reach it
+        n_names = len(names)+1
+        counts = (_at_or_above(upper, thresholds, name+1, n_names) -
+                  _at_or_above(np.minimum(upper, lower), thresholds, name+1, n_names))
+        index_df = pd.DataFrame(counts.T, index=thresholds, columns=[np.nan] + list(names))
+        index_df = index_df.loc[:, counts.sum(axis=1)>0]
+        index_df["AMBIGUOUS"] = len(np.unique(project)) - counts.sum(axis=0)
+        outputs.append(index_df)
+
+    if not outputs:
+        print("No data found for specified PID(s).")
+        return None
+
+    #Put the projects in data order, one partition after another
+    if assignments:
+        return pd.concat(outputs, ignore_index=True)
+
+    output_df = outputs[0]
+    for index_df in outputs[1:]:
+        output_df = output_df.add(index_df, fill_value=0)
+    output_df = output_df.fillna(0).astype(int)
+    columns = sorted([col for col in output_df.columns if col!="AMBIGUOUS"], key=str) + ["AMBIGUOUS"]
+    output_df = output_df[columns]
+    output_df.index.name = "Threshold"
+    output_df.columns.name = "Main " + spec["kind"].title()
+    return output_df
+################################################
+
+def cross_tab(sectors, themes, weighted=False, sector_codes=None, theme_codes=None):
+    """
+    Description
+    ----------
+    Returns a sector codes x theme codes cross-tabulation of projects, computed as a sparse matrix product.
+    Requires scipy, and data loaded into both the Sectors and the Themes object.
+
+    Parameters
+    ----------
+    sectors : Sectors object
+    themes : Themes object
+    weighted : bool, default False
+        If False, each cell is the number of projects mapped to both the sector code and the theme code.
+        If True, each project contributes the product of its sector and theme percentages (as shares of 1) instead.
+    sector_codes : list or None, default None
+        If list, only the specified sector codes are tabulated.
+    theme_codes : list or None, default None
+        If list, only the specified theme codes are tabulated.
+
+    Returns
+    ----------
+    DataFrame object
+    """
+
+    import numpy as np
+    import pandas as pd
+
+    #If weighted is not of type 'bool', return error
+    if type(weighted)!=bool:
+        raise TypeError("'weighted' must be of type 'bool'.")
+    #If either object holds no data, alert user
+    if not (sectors and themes):
+        print("Data not yet loaded.")
+        return None
+
+    sector_matrix, sector_pids, sector_labels = sectors.code_matrix()
+    theme_matrix, theme_pids, theme_labels = themes.code_matrix()
+
+    #Restrict each matrix to the requested codes
+    sector_cols = np.arange(len(sector_labels)) if sector_codes==None else np.flatnonzero(np.isin(sector_labels, [c.upper() for c in sector_codes]))
+    theme_cols = np.arange(len(theme_labels)) if theme_codes==None else np.flatnonzero(np.isin(theme_labels, theme_codes))
+    sector_matrix = sector_matrix[:, sector_cols].tocsr()
+    theme_matrix = theme_matrix[:, theme_cols].tocsr()
+
+    #Line up the two matrices on the projects they have in common
+    common, sector_rows, theme_rows = np.intersect1d(sector_pids, theme_pids, return_indices=True)
+    sector_matrix = sector_matrix[sector_rows]
+    theme_matrix = theme_matrix[theme_rows]
+
+    if weighted:
+        sector_matrix = sector_matrix / 100
+        theme_matrix = theme_matrix / 100
+    else:
+        sector_matrix = sector_matrix.copy()
+        theme_matrix = theme_matrix.copy()
+        sector_matrix.data[:] = 1
+        theme_matrix.data[:] = 1
+
+    output = (sector_matrix.T @ theme_matrix).toarray()
+    if weighted==False:
+        output = output.astype(int)
+    return pd.DataFrame(output, index=sector_labels[sector_cols], columns=theme_labels[theme_cols])
+################################################
+################################################
+################################################
+
+class SimilarityIndex():
+    """
+    Description
+    ----------
+    Nearest-neighbour index over the sector and/or theme percentage profile of every project.
+    Built once from loaded Sectors and/or Themes objects, then queried with find_similar or find_similar_batch.
+    Requires scipy.
+
+    Parameters
+    ----------
+    sectors : Sectors object or None, default None
+        Sectors object with data loaded, used for by="sectors" and by="both".
+    themes : Themes object or None, default None
+        Themes object with data loaded, used for by="themes" and by="both".
+    metric : str, default "cosine"
+        Similarity measure between two profiles. Acceptable values are:
+            "cosine": cosine similarity of the percentage vectors,
+            "jaccard": weighted Jaccard similarity, the sum of the element-wise minimum over the sum of the element-wise maximum.
+    """
+
+    #Initialize the object
+    def __init__(self, sectors=None, themes=None, metric="cosine"):
+        import numpy as np
+        from scipy import sparse
+
+        #If metric is not one of the acceptable options, return error
+        if metric not in ("cosine", "jaccard"):
+            raise ValueError("Unrecognized metric input. Acceptable values are 'cosine' and 'jaccard'.")
+        #If no loaded object is provided, return error
+        sources = {"sectors":sectors, "themes":themes}
+        sources = {name:obj for name,obj in sources.items() if obj!=None}
+        if not sources:
+            raise ValueError("At least one of 'sectors' and 'themes' must be provided.")
+        if not all(sources.values()):
+            raise ValueError("Data must be loaded into every object provided.")
+
+        self.__metric = metric
+
+        #Line up the profiles of all sources on the union of their projects
+        matrices = {name:obj.code_matrix() for name,obj in sources.items()}
+        universe = np.unique(np.concatenate([pids for matrix,pids,codes in matrices.values()]))
+        self.__pids = universe
+        self.__profiles = {}
+        for name,(matrix,pids,codes) in matrices.items():
+            positions = np.searchsorted(universe, pids)
+            spread = sparse.csr_matrix((np.ones(len(pids)), (positions, np.arange(len(pids)))),
+                                       shape=(len(universe), len(pids)))
+            self.__profiles[name] = (spread @ matrix / 100).tocsr()
+        if len(self.__profiles)==2:
+            self.__profiles["both"] = sparse.hstack([self.__profiles["sectors"], self.__profiles["themes"]]).tocsr()
+
+        #Pre-normalize every profile so that cosine similarity is a single sparse product
+        self.__normalized = {}
+        self.__totals = {}
+        for name,profile in self.__profiles.items():
+            #Give the sector and theme parts of a "both" profile equal weight by stacking their normalized profiles, and normalize the stack
+            #again, so that a project mapped to only sectors or only themes is compared on that part alone rather than capped at half similarity
+            weighted = sparse.hstack([self.__normalized["sectors"], self.__normalized["themes"]]).tocsr() if name=="both" else profile
+            norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+            norms[norms==0] = 1
+            normalized = sparse.diags(1/norms) @ weighted
+            self.__normalized[name] = normalized.tocsr().astype(np.float32)
+            self.__totals[name] = np.asarray(profile.sum(axis=1)).ravel()
+
+        #Collect the project-level metadata used by the pre-filters
+        self.__meta = {}
+        for col in ['Project Approval FY', 'Project Status Name', 'Region Name']:
+            values = np.empty(len(universe), dtype=object)
+            for obj in sources.values():
+                obj_index = _index_of(obj)
+                if obj_index.has_column(col):
+                    values[np.searchsorted(universe, obj_index.pids)] = obj_index.project_column(col)
+            self.__meta[col] = values
+        self.__position = {pid:i for i,pid in enumerate(universe.tolist())}
+        print(f"Similarity index built over {len(universe)} projects.")
+    ################################################
+
+    def __validate(self, k, by):
+        #Return the profile to compare, defaulting to "both" if the index has it, or else to its only profile
+        #If k is not a positive int, return error
+        if type(k)!=int or k<1:
+            raise ValueError("'k' must be a positive 'int'.")
+        if by==None:
+            by = "both" if "both" in self.__profiles else list(self.__profiles)[0]
+        #If by is not an available profile, return error
+        if by not in self.__profiles:
+            raise ValueError(f"Unrecognized by input. Acceptable values for this index are: {list(self.__profiles)}.")
+        return by
+    ################################################
+
+    def __candidates(self, start_FY, stop_FY, project_status, region):
+        #Return a mask of the projects that satisfy the pre-filters
+        import numpy as np
+        import pandas as pd
+
+        mask = np.ones(len(self.__pids), dtype=bool)
+        if (start_FY!=None) or (stop_FY!=None):
+            fy = pd.to_numeric(pd.Series(self.__meta['Project Approval FY']), errors="coerce").to_numpy()
+            fy_mask = np.ones(len(fy), dtype=bool)
+            if start_FY!=None:
+                fy_mask &= (fy>=start_FY)
+            if stop_FY!=None:
+                fy_mask &= (fy<=stop_FY)
+            #Projects with missing approval FY data are retained, as in get_projects
+            mask &= fy_mask | np.isnan(fy)
+        if project_status!=None:
+            #If project_status is not a list, return error
+            if type(project_status)!=list:
+                raise TypeError("'project_status' must be of type 'list'.")
+            mask &= np.isin(self.__meta['Project Status Name'], [item.title() for item in project_status])
+        if region!=None:
+            #If region is not a list, return error
+            if type(region)!=list:
+                raise TypeError("'region' must be of type 'list'.")
+            mask &= np.isin(self.__meta['Region Name'], region)
+        return mask
+    ################################################
+
+    def __row(self, pid):
+        #Return the position of a project in the index
+        #If pid is not a str, return error
+        if type(pid)!=str:
+            raise TypeError("'pid' must be of type 'str'.")
+        position = self.__position.get(pid.upper())
+        #If pid is not in the index, return error
+        if position==None:
+            raise KeyError(f"Project {pid} not found in the index.")
+        return position
+    ################################################
+
+    def __scores(self, rows, by):
+        #Return an array of the similarity of every project (rows) to each queried project (columns)
+        import numpy as np
+
+        if self.__metric=="cosine":
+            normalized = self.__normalized[by]
+            return normalized @ normalized[rows].T.toarray()
+
+        #Weighted Jaccard: sum of minimums over the codes the query uses, divided by the sum of maximums
+        profile = self.__profiles[by]
+        totals = self.__totals[by]
+        scores = np.zeros((profile.shape[0], len(rows)), dtype=np.float32)
+        for j,row in enumerate(rows):
+            query = profile[row]
+            sub = profile[:, query.indices].tocsr()
+            sub.data = np.minimum(sub.data, query.data[sub.indices])
+            sum_min = np.asarray(sub.sum(axis=1)).ravel()
+            sum_max = totals + totals[row] - sum_min
+            sum_max[sum_max==0] = 1
+            scores[:, j] = sum_min / sum_max
+        return scores
+    ################################################
+
+    def __top_k(self, scores, rows, k, mask):
+        #Return the query number, position, score and rank of each of the k most similar candidates of the queried projects,
+        #as flat arrays; fewer than k are returned for a project with fewer candidates
+        import numpy as np
+
+        #Lay each queried project's scores out contiguously, and exclude non-candidates, projects sharing no code with the query, and the project itself
+        scores = np.ascontiguousarray(scores.T)
+        scores[scores<=0] = -np.inf
+        scores[:, ~mask] = -np.inf
+        scores[np.arange(len(rows)), rows] = -np.inf
+
+        #Select no more than the largest number of candidates of any query
+        k = min(k, int(np.isfinite(scores).sum(axis=1).max(initial=0)))
+        if k==0:
+            empty = np.zeros(0, dtype=int)
+            return empty, empty, np.zeros(0, dtype=scores.dtype), empty
+
+        #Partially select the k largest scores of each query, then order only those, and drop the excluded projects
+        n = scores.shape[1]
+        top = np.argpartition(scores, n-k, axis=1)[:, n-k:]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top, top_scores = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+        found = np.isfinite(top_scores)
+        return np.nonzero(found)[0], top[found], top_scores[found], np.broadcast_to(np.arange(1, k+1), top.shape)[found]
+    ################################################
+
+    def find_similar(self, pid, k=20, by=None,
+                     start_FY=None, stop_FY=None,
+                     project_status=None,
+                     region=None):
+        """
+        Description
+        ----------
+        Returns the k projects whose sector and/or theme profile is most similar to that of the specified project.
+        Projects with a similarity of 0 are not returned, so fewer than k projects are returned if fewer share a code with the specified project.
+        Supports variable assignment.
+
+        Parameters
+        ----------
+        pid : str
+            The ID number of the project to find similar projects for.
+        k : int, default 20
+            The number of similar projects to return.
+        by : str or None, default None
+            The profile to compare. Acceptable values are "sectors", "themes" and "both", subject to the objects the index was built from.
+            If None, "both" is used for an index built from Sectors and Themes objects, or else the profile of the one object it was built from.
+            With "both", the sector and theme profiles are given equal weight, and a project mapped to only one of them is compared on that one.
+        start_FY : int or None, default None
+            If int, only projects approved in or after start_FY, and projects with missing approval FY data, are returned.
+        stop_FY : int or None, default None
+            If int, only projects approved in or before stop_FY, and projects with missing approval FY data, are returned.
+        project_status : list or None, default None
+            If list, only projects whose completion status matches any of the specified values are returned.
+        region : list or None, default None
+            If list, only projects whose region name matches any of the specified values are returned.
+
+        Returns
+        ----------
+        DataFrame object
+        """
+
+        return self.find_similar_batch([pid], k=k, by=by, start_FY=start_FY, stop_FY=stop_FY,
+                                       project_status=project_status, region=region).drop(columns="Query Id")
+    ################################################
+
+    def find_similar_batch(self, pid_list, k=20, by=None,
+                           start_FY=None, stop_FY=None,
+                           project_status=None,
+                           region=None,
+                           workers=None, chunk_size=64):
+        """
+        Description
+        ----------
+        Returns the k most similar projects for every project in pid_list.
+        Projects are scored in chunks, and chunks are spread over a pool of threads.
+        Supports variable assignment.
+
+        Parameters
+        ----------
+        pid_list : list
+            The ID numbers of the projects to find similar projects for.
+        k, by, start_FY, stop_FY, project_status, region :
+            As in find_similar.
+        workers : int or None, default None
+            If int, the number of threads chunks are spread over. If None, chunks are scored one at a time.
+        chunk_size : int, default 64
+            The number of projects scored together in one sparse product.
+
+        Returns
+        ----------
+        DataFrame object
+        """
+
+        import numpy as np
+        import pandas as pd
+
+        by = self.__validate(k, by)
+        #If pid_list is not a list, return error
+        if type(pid_list)!=list:
+            raise TypeError("'pid_list' must be of type 'list'.")
+        #If workers is specified and it is not a positive int, return error
+        if (workers!=None) and (type(workers)!=int or workers<1):
+            raise ValueError("'workers' must be a positive 'int' or None.")
+
+        rows = np.array([self.__row(pid) for pid in pid_list], dtype=int)
+        mask = self.__candidates(start_FY, stop_FY, project_status, region)
+
+        def run_chunk(chunk):
+            query, top, top_scores, rank = self.__top_k(self.__scores(chunk, by), chunk, k, mask)
+            return pd.DataFrame({"Query Id":self.__pids[chunk][query],
+                                 "Project Id":self.__pids[top],
+                                 "Similarity":top_scores,
+                                 "Rank":rank})
+
+        chunks = [rows[i:i+chunk_size] for i in range(0, len(rows), chunk_size)]
+        if workers==None:
+            results = [run_chunk(chunk) for chunk in chunks]
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(run_chunk, chunks))
+
+        #Chunks are returned in the order of pid_list
+        if results:
+            return pd.concat(results, ignore_index=True)
+        return pd.DataFrame(columns=["Query Id", "Project Id", "Similarity", "Rank"])
+################################################
+################################################
+################################################
+
+def _download_date(file_name):
+    #Return the download date recorded in the name of a Project_data file, e.g. "Project_data.xlsx.April 14, 2022.xlsx", or None
+    import pandas as pd
+
+    try:
+        return pd.Timestamp(file_name.split('.')[2])
+    except (IndexError, ValueError):
+        return None
+################################################
+
+def _download_key(file_name):
+    #Return the sort key of a Project_data file: its download date, then the speed of reading its format
+    #Files whose download date cannot be read are only chosen if no other file is available
+    import os
+    import pandas as pd
+
+    formats = list(_DATA_FORMATS)
+    extension = os.path.splitext(file_name)[1].lower()
+    return (_download_date(file_name) or pd.Timestamp.min, formats.index(extension) if extension in formats else -1, file_name)
+################################################
+
+def _latest_data_file(data_dir=None):
+    #Return the path and download date of the most recent Project_data file in data_dir
+    import os
+
+    data_dir = DATA_DIR if data_dir==None else data_dir
+    data_files = [x for x in os.listdir(data_dir) if "Project_data" in x]
+    #If no Project_data file is found, return error
+    if not data_files:
+        raise FileNotFoundError(f"No Project_data file found in {data_dir}.")
+
+    data_file = max(data_files, key=_download_key)
+    return os.path.join(data_dir, data_file), data_file.split('.')[2]
+################################################
+
+def _data_format(data_file):
+    #Return the format of a Project_data file, detected from its extension
+    import os
+
+    extension = os.path.splitext(data_file)[1].lower()
+    #If the extension is not that of a supported format, return error
+    if extension not in _DATA_FORMATS:
+        raise ValueError(f"Unrecognized format of {os.path.basename(data_file)}. Acceptable extensions are {', '.join(_DATA_FORMATS)}.")
+    return _DATA_FORMATS[extension]
+################################################
+
+def _sheet_file(data_file, sheet):
+    #Return the path of the file holding a sheet of the download that data_file belongs to: data_file itself for a workbook,
+    #or the file whose name has the sheet in place of the sheet of data_file for a CSV or Parquet download
+    import os
+
+    if _data_format(data_file)=="excel":
+        return data_file
+    directory, name = os.path.split(data_file)
+    parts = name.split('.')
+    #If the file name does not hold a sheet, return error
+    if (len(parts)<5) or (parts[-2] not in SnapshotStore.sheets):
+        raise ValueError(f"Sheet could not be read from the name of {name}, e.g. 'Project_data.csv.April 14, 2022.sectors.csv'.")
+    parts[-2] = sheet
+    return os.path.join(directory, '.'.join(parts))
+################################################
+
+def _download_files(data_file):
+    #Return the paths of the files making up the download that data_file belongs to, that exist
+    import os
+
+    if _data_format(data_file)=="excel":
+        return [data_file]
+    return [x for x in (_sheet_file(data_file, sheet) for sheet in SnapshotStore.sheets) if os.path.exists(x)]
+################################################
+
+def _read_sheets(data_file, columns):
+    #Read the sheets of a download in its format, returning a dict of DataFrames; columns maps each sheet to its list of columns, or to None for all.
+    #CSV and Parquet sheets are read by multi-threaded pyarrow readers, each sheet in its own thread, and workbooks once for all sheets,
+    #by python-calamine if it is installed
+    import pandas as pd
+    from concurrent.futures import ThreadPoolExecutor
+
+    data_format = _data_format(data_file)
+    if data_format=="excel":
+        try:
+            import python_calamine
+            engine = "calamine"
+        except ImportError:
+            engine = None
+        with pd.ExcelFile(data_file, engine=engine) as workbook:
+            sheets = {sheet:workbook.parse(sheet, usecols=cols) for sheet,cols in columns.items()}
+    else:
+        def read(sheet):
+            sheet_file = _sheet_file(data_file, sheet)
+            if data_format=="csv":
+                return pd.read_csv(sheet_file, usecols=columns[sheet], engine="pyarrow")
+            return pd.read_parquet(sheet_file, columns=columns[sheet])
+        with ThreadPoolExecutor(max_workers=len(columns)) as executor:
+            sheets = dict(zip(columns, executor.map(read, columns)))
+
+    #Apply the same dtypes whatever the format
+    for sheet_df in sheets.values():
+        for col,dtype in _SHEET_DTYPES.items():
+            if col in sheet_df.columns:
+                sheet_df[col] = sheet_df[col].astype(dtype)
+    return sheets
+################################################
+
+def _sha256(path, copy_to=None):
+    #Return the SHA-256 checksum of the file at path, reading it in blocks; if copy_to is specified, also write the blocks there
+    import hashlib
+
+    checksum = hashlib.sha256()
+    with open(path, "rb") as source:
+        target = open(copy_to, "wb") if copy_to!=None else None
+        try:
+            for block in iter(lambda: source.read(1<<20), b""):
+                checksum.update(block)
+                if target!=None:
+                    target.write(block)
+        finally:
+            if target!=None:
+                target.close()
+    return checksum.hexdigest()
+################################################
+
+class DataSource():
+    """
+    Description
+    ----------
+    Local mirror of the most recent Project_data download in the network folder.
+    A download is copied only if it is new or has changed, and the copy replaces the mirrored file only once it matches the SHA-256 checksum of the source.
+    The checksum is kept next to the copy, in a .sha256 file in the format of sha256sum, and the size and modification time of the verified copy in a .stat file.
+    Sectors and Themes objects load data from the mirror, so loading reads from local disk. Before each load, the listing of the network folder is checked,
+    and a new or changed download is copied first; if the network folder cannot be reached, the last mirrored download is loaded with a warning.
+    start_sync copies new downloads in the background, so that they are already mirrored when they are loaded.
+    A download is an Excel workbook, or one CSV or Parquet file per sheet, named e.g. "Project_data.parquet.April 14, 2022.sectors.parquet".
+
+    Parameters
+    ----------
+    data_dir : str or None, default None
+        Folder holding the Project_data downloads. If None, the PROJ_CODES_DATA_DIR environment variable is used, or DATA_DIR if it is not set.
+    mirror_dir : str or None, default None
+        Local folder holding the mirror. If None, the PROJ_CODES_MIRROR_DIR environment variable is used, or MIRROR_DIR if it is not set.
+    retries : int, default 3
+        Number of attempts at copying a download before sync gives up.
+    """
+
+    #Initialize the object
+    def __init__(self, data_dir=None, mirror_dir=None, retries=3):
+        import os
+        import threading
+
+        #If data_dir or mirror_dir is specified and it is not a string, return error
+        if any((x!=None) and (type(x)!=str) for x in [data_dir, mirror_dir]):
+            raise TypeError("'data_dir' and 'mirror_dir' must be of type 'str' or None.")
+        #If retries is not a positive int, return error
+        if type(retries)!=int or retries<1:
+            raise ValueError("'retries' must be a positive 'int'.")
+
+        self.__data_dir = os.environ.get("PROJ_CODES_DATA_DIR", DATA_DIR) if data_dir==None else data_dir
+        self.__mirror_dir = os.path.expanduser(os.environ.get("PROJ_CODES_MIRROR_DIR", MIRROR_DIR) if mirror_dir==None else mirror_dir)
+        self.__retries = retries
+        self.__lock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__thread = None
+    ################################################
+
+    def __getstate__(self):
+        #Return the settings of the source for pickling; a background sync is not carried over
+        return {"data_dir":self.__data_dir, "mirror_dir":self.__mirror_dir, "retries":self.__retries}
+    ################################################
+
+    def __setstate__(self, state):
+        #Restore the settings of the source when unpickling, with no background sync running
+        import threading
+        self.__data_dir = state["data_dir"]
+        self.__mirror_dir = state["mirror_dir"]
+        self.__retries = state["retries"]
+        self.__lock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__thread = None
+    ################################################
+
+    def __str__(self):
+        """
+        Description
+        -------
+        String representation of a DataSource object.
+        """
+        return ("Object class: DataSource. " +
+                f"Source: {self.__data_dir}. " +
+                f"Mirror: {self.__mirror_dir}. " +
+                f"Background sync: {self.__thread!=None and self.__thread.is_alive()}.")
+    ################################################
+
+    def __mirrored(self):
+        #Return the names of the mirrored downloads that have a checksum file
+        import os
+
+        if not os.path.isdir(self.__mirror_dir):
+            return []
+        files = os.listdir(self.__mirror_dir)
+        return [x for x in files if "Project_data" in x and not x.endswith((".sha256", ".stat", ".part")) and x+".sha256" in files]
+    ################################################
+
+    def sync(self):
+        """
+        Description
+        ----------
+        Copies the most recent download in the network folder to the mirror, unless the mirror already holds it.
+        The copy is checked against the checksum of the source, and retried if it fails. Older mirrored downloads are then removed.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        str, the path of the mirrored download
+        """
+
+        import os
+
+        with self.__lock:
+            data_file, download_date = _latest_data_file(self.__data_dir)
+
+            #A download is a workbook, or one CSV or Parquet file per sheet, each mirrored on its own
+            sources = _download_files(data_file)
+            names = [os.path.basename(source) for source in sources]
+            for source in sources:
+                self.__mirror_file(source)
+
+            #Remove older mirrored downloads
+            for old in self.__mirrored():
+                if old not in names:
+                    os.remove(os.path.join(self.__mirror_dir, old+".sha256"))
+                    if os.path.exists(os.path.join(self.__mirror_dir, old+".stat")):
+                        os.remove(os.path.join(self.__mirror_dir, old+".stat"))
+                    os.remove(os.path.join(self.__mirror_dir, old))
+            return os.path.join(self.__mirror_dir, os.path.basename(data_file))
+    ################################################
+
+    def __mirror_file(self, source):
+        #Copy one file of a download to the mirror, unless the mirror already holds it
+        import os
+        import shutil
+        import time
+
+        name = os.path.basename(source)
+        target = os.path.join(self.__mirror_dir, name)
+
+        #Skip the copy if the mirror holds a verified copy of the same size and modification time
+        source_stat = os.stat(source)
+        if name in self.__mirrored():
+            target_stat = os.stat(target)
+            if (target_stat.st_size, target_stat.st_mtime)==(source_stat.st_size, source_stat.st_mtime):
+                return
+
+        #Copy the file next to its final location, hashing the source as it is read, then check the copy against it
+        os.makedirs(self.__mirror_dir, exist_ok=True)
+        for attempt in range(1, self.__retries+1):
+            try:
+                checksum = _sha256(source, copy_to=target+".part")
+                if _sha256(target+".part")!=checksum:
+                    raise OSError(f"copy of {name} does not match the checksum of the source")
+                break
+            except OSError as error:
+                if os.path.exists(target+".part"):
+                    os.remove(target+".part")
+                #If every attempt failed, return error
+                if attempt==self.__retries:
+                    raise
+                print(f"WARNING! Attempt {attempt} to mirror {name} failed: {error}. Retrying...")
+                time.sleep(attempt)
+
+        #Replace the mirrored file, dropping its old checksum first so that a partial update is never taken as verified
+        shutil.copystat(source, target+".part")
+        if os.path.exists(target+".sha256"):
+            os.remove(target+".sha256")
+        os.replace(target+".part", target)
+        self.__record_stat(target)
+        with open(target+".sha256.part", "w") as f:
+            f.write(f"{checksum}  {name}\n")
+        os.replace(target+".sha256.part", target+".sha256")
+
+        print(f"Mirrored {name} to {self.__mirror_dir}.")
+    ################################################
+
+    def __record_stat(self, target):
+        #Record the size and modification time of a verified mirrored file, so that loading can check it without hashing it again
+        import os
+
+        target_stat = os.stat(target)
+        with open(target+".stat.part", "w") as f:
+            f.write(f"{target_stat.st_size} {target_stat.st_mtime_ns}\n")
+        os.replace(target+".stat.part", target+".stat")
+    ################################################
+
+    def __unchanged(self, target):
+        #Return True if a mirrored file has the size and modification time recorded when it was verified
+        import os
+
+        try:
+            with open(target+".stat") as f:
+                size, mtime_ns = (int(x) for x in f.read().split())
+        except (OSError, ValueError):
+            return False
+        target_stat = os.stat(target)
+        return (target_stat.st_size, target_stat.st_mtime_ns)==(size, mtime_ns)
+    ################################################
+
+    def __newer_download(self):
+        #Return the name of the most recent download in the network folder if the mirror does not hold an unchanged copy of every file of it,
+        #or else None. Only the listing of the folder and the size and modification time of the files are read, as in __mirror_file
+        import os
+
+        data_file, download_date = _latest_data_file(self.__data_dir)
+        mirrored = self.__mirrored()
+        for source in _download_files(data_file):
+            name = os.path.basename(source)
+            if name not in mirrored:
+                return os.path.basename(data_file)
+            source_stat, target_stat = os.stat(source), os.stat(os.path.join(self.__mirror_dir, name))
+            if (target_stat.st_size, target_stat.st_mtime)!=(source_stat.st_size, source_stat.st_mtime):
+                return os.path.basename(data_file)
+        return None
+    ################################################
+
+    def latest_file(self, verify=True):
+        """
+        Description
+        ----------
+        Returns the most recent mirrored download.
+        The name, size and modification time of the most recent download in the network folder are compared with the mirror first,
+        and the mirror is synced if it does not hold an unchanged copy of it. Unchanged downloads are not read from the network folder.
+        If the network folder cannot be reached or the sync fails, the last mirrored download is returned, with a warning if it is older.
+
+        Parameters
+        ----------
+        verify : bool, default True
+            If True, checks that the mirrored download has the size and modification time it had when it was verified,
+            and checks it against its checksum if it does not.
+
+        Returns
+        ----------
+        tuple of the path of the download and its download date
+        """
+
+        import os
+
+        #If verify is not boolean, return error
+        if type(verify)!=bool:
+            raise TypeError("'verify' must be of type 'bool'.")
+
+        #Sync from the network folder only if it holds a download the mirror does not hold an unchanged copy of
+        try:
+            newer = self.__newer_download()
+        except OSError as error:
+            newer = None
+            print(f"WARNING! Could not reach {self.__data_dir}: {error}. Loading the last mirrored download.")
+        if newer!=None:
+            try:
+                self.sync()
+            except OSError as error:
+                print(f"WARNING! Could not sync {newer} from {self.__data_dir}: {error}. Loading the last mirrored download, which is older.")
+
+        with self.__lock:
+            mirrored = self.__mirrored()
+            #If the mirror holds no download, return error
+            if not mirrored:
+                raise FileNotFoundError(f"No Project_data file found in {self.__mirror_dir}.")
+            name = max(mirrored, key=_download_key)
+            path = os.path.join(self.__mirror_dir, name)
+
+            #Hash a mirrored file of the download only if it changed since it was verified
+            #If it does not match its checksum, remove it so that the next sync copies it again, and return error
+            if verify:
+                for file_path in _download_files(path):
+                    if self.__unchanged(file_path):
+                        continue
+                    with open(file_path+".sha256") as f:
+                        checksum = f.read().split()[0]
+                    if _sha256(file_path)!=checksum:
+                        os.remove(file_path+".sha256")
+                        if os.path.exists(file_path+".stat"):
+                            os.remove(file_path+".stat")
+                        os.remove(file_path)
+                        raise OSError(f"Mirrored file {os.path.basename(file_path)} does not match its checksum and was removed.")
+                    self.__record_stat(file_path)
+        return path, name.split('.')[2]
+    ################################################
+
+    def start_sync(self, interval=600):
+        """
+        Description
+        ----------
+        Starts a background thread that syncs the mirror every interval seconds, so that new downloads are copied before they are loaded.
+
+        Parameters
+        ----------
+        interval : int or float, default 600
+            Seconds between syncs.
+
+        Returns
+        ----------
+        None
+        """
+
+        import threading
+
+        #If interval is not a positive number, return error
+        if type(interval) not in [int, float] or interval<=0:
+            raise ValueError("'interval' must be a positive 'int' or 'float'.")
+        #If a background sync is already running, alert user
+        if self.__thread!=None and self.__thread.is_alive():
+            print("Background sync already running.")
+            return
+
+        def run():
+            while not self.__stop.is_set():
+                try:
+                    self.sync()
+                except OSError as error:
+                    print(f"WARNING! Background sync from {self.__data_dir} failed: {error}.")
+                self.__stop.wait(interval)
+
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=run, name="proj_codes-sync", daemon=True)
+        self.__thread.start()
+    ################################################
+
+    def stop_sync(self):
+        """
+        Description
+        ----------
+        Stops the background sync started by start_sync, waiting for a sync in progress to finish.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        None
+        """
+
+        if self.__thread!=None:
+            self.__stop.set()
+            self.__thread.join()
+            self.__thread = None
+    ################################################
+
+class SnapshotStore():
+    """
+    Description
+    ----------
+    Deduplicated columnar archive of past Project_data downloads.
+    Each sheet of a download is stored as parquet files of rows, and a snapshot records which rows made up the sheet on a given download date.
+    Rows that are unchanged between downloads are stored only once.
+    Sectors(as_of=...) and Themes(as_of=...) load the most recent snapshot on or before the as_of date. Requires pyarrow.
+
+    Parameters
+    ----------
+    root : str or None, default None
+        Folder holding the archive. If None, SNAPSHOT_DIR is used.
+    """
+
+    #Sheets of a Project_data download that are archived
+    sheets = ["metadata", "sectors", "themes"]
+
+    #Initialize the object
+    def __init__(self, root=None):
+        import os
+        self.__root = os.path.expanduser(SNAPSHOT_DIR if root==None else root)
+    ################################################
+
+    def __str__(self):
+        """
+        Description
+        -------
+        String representation of a SnapshotStore object.
+        """
+        return ("Object class: SnapshotStore. " +
+                f"Location: {self.__root}. " +
+                f"Snapshots: {self.snapshots()}.")
+    ################################################
+
+    def snapshots(self):
+        """
+        Description
+        ----------
+        Returns the download dates held in the archive, in chronological order.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        list of str, in YYYY-MM-DD format
+        """
+
+        import os
+
+        snapshot_dir = os.path.join(self.__root, "metadata")
+        if not os.path.isdir(snapshot_dir):
+            return []
+        return sorted(x[len("snapshot-"):-len(".npy")] for x in os.listdir(snapshot_dir) if x.startswith("snapshot-"))
+    ################################################
+
+    def ingest(self, data_file=None):
+        """
+        Description
+        ----------
+        Adds a Project_data download to the archive. Downloads already in the archive are skipped.
+        Only rows not already held in the archive are written.
+
+        Parameters
+        ----------
+        data_file : str or None, default None
+            Path of the Project_data file to add. If None, the most recent download in DATA_DIR is mirrored by DataSource and added.
+
+        Returns
+        ----------
+        str, the download date of the snapshot in YYYY-MM-DD format
+        """
+
+        import os
+        import numpy as np
+        import pandas as pd
+
+        #Identify the file and its download date
+        if data_file==None:
+            data_file, download_date = DataSource().latest_file()
+        snapshot_date = _download_date(os.path.basename(data_file))
+        #If the download date cannot be read from the file name, return error
+        if snapshot_date==None:
+            raise ValueError(f"Download date could not be read from the name of {data_file}.")
+        snapshot_date = snapshot_date.strftime("%Y-%m-%d")
+
+        if snapshot_date in self.snapshots():
+            print(f"Snapshot {snapshot_date} already in the archive.")
+            return snapshot_date
+
+        #Write the themes and sectors sheets first, so that a snapshot only shows up once its metadata is written
+        sheets = _read_sheets(data_file, {sheet:None for sheet in self.sheets})
+        for sheet in reversed(self.sheets):
+            sheet_dir = os.path.join(self.__root, sheet)
+            os.makedirs(sheet_dir, exist_ok=True)
+            sheet_df = _parquet_safe(sheets.pop(sheet))
+
+            #Hash the content of every row, and write only the rows not held in the archive
+            row_hashes = pd.util.hash_pandas_object(sheet_df, index=False).to_numpy()
+            new_rows = ~np.isin(row_hashes, self.__stored_hashes(sheet)) & ~pd.Series(row_hashes).duplicated().to_numpy()
+            if new_rows.any():
+                new_df = sheet_df.loc[new_rows].copy()
+                new_df["_row_hash"] = row_hashes[new_rows]
+                new_df.to_parquet(os.path.join(sheet_dir, f"rows-{snapshot_date}.parquet"), index=False)
+            np.save(os.path.join(sheet_dir, f"snapshot-{snapshot_date}.npy"), row_hashes)
+            print(f"Sheet {sheet}: {len(row_hashes)} rows, {int(new_rows.sum())} new.")
+
+        print(f"Snapshot {snapshot_date} added to the archive.")
+        return snapshot_date
+    ################################################
+
+    def __stored_hashes(self, sheet):
+        #Return the hashes of every row of a sheet held in the archive
+        import os
+        import numpy as np
+        import pandas as pd
+
+        sheet_dir = os.path.join(self.__root, sheet)
+        row_files = [x for x in os.listdir(sheet_dir) if x.startswith("rows-")]
+        if not row_files:
+            return np.array([], dtype=np.uint64)
+        return np.concatenate([pd.read_parquet(os.path.join(sheet_dir, x), columns=["_row_hash"])["_row_hash"].to_numpy()
+                               for x in row_files])
+    ################################################
+
+    def __row_files(self, sheet, row_hashes):
+        #Return the names of the row files of a sheet that hold any of the specified row hashes, in date order.
+        #A row is stored in the file of the first download ingested that holds it, which is dated after other downloads holding it
+        #if downloads were not ingested in date order, so files are selected by content rather than by date
+        import os
+        import numpy as np
+        import pandas as pd
+
+        sheet_dir = os.path.join(self.__root, sheet)
+        row_files = sorted(x for x in os.listdir(sheet_dir) if x.startswith("rows-"))
+        return [x for x in row_files
+                if np.isin(pd.read_parquet(os.path.join(sheet_dir, x), columns=["_row_hash"])["_row_hash"].to_numpy(), row_hashes).any()]
+    ################################################
+
+    def resolve(self, as_of):
+        """
+        Description
+        ----------
+        Returns the date of the most recent snapshot on or before as_of.
+
+        Parameters
+        ----------
+        as_of : str
+            Any date format understood by pandas, e.g. "2022-03-01".
+
+        Returns
+        ----------
+        str, in YYYY-MM-DD format
+        """
+
+        import pandas as pd
+
+        as_of = pd.Timestamp(as_of).strftime("%Y-%m-%d")
+        eligible = [x for x in self.snapshots() if x<=as_of]
+        #If no snapshot precedes as_of, return error
+        if not eligible:
+            raise ValueError(f"No snapshot on or before {as_of}. Available snapshots: {self.snapshots()}.")
+        return eligible[-1]
+    ################################################
+
+    def load(self, sheet, as_of, columns=None):
+        """
+        Description
+        ----------
+        Returns a sheet as it was in the most recent snapshot on or before as_of.
+
+        Parameters
+        ----------
+        sheet : str
+            Acceptable values are "metadata", "sectors" and "themes".
+        as_of : str
+            Any date format understood by pandas, e.g. "2022-03-01".
+        columns : list or None, default None
+            If list, only the specified columns are read.
+
+        Returns
+        ----------
+        tuple of (DataFrame object, snapshot date as str)
+        """
+
+        import os
+        import numpy as np
+        import pandas as pd
+
+        #If sheet is not one of the archived sheets, return error
+        if sheet not in self.sheets:
+            raise ValueError("Unrecognized sheet input. Acceptable values are 'metadata', 'sectors' and 'themes'.")
+
+        snapshot_date = self.resolve(as_of)
+        sheet_dir = os.path.join(self.__root, sheet)
+        row_hashes = np.load(os.path.join(sheet_dir, f"snapshot-{snapshot_date}.npy"))
+
+        #Read the archived rows of the snapshot, from every row file holding any of them
+        read_cols = None if columns==None else list(columns)+["_row_hash"]
+        parts = []
+        for x in self.__row_files(sheet, row_hashes):
+            part = pd.read_parquet(os.path.join(sheet_dir, x), columns=read_cols)
+            parts.append(part.loc[np.isin(part["_row_hash"].to_numpy(), row_hashes)])
+        rows_df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=read_cols or ["_row_hash"])
+
+        #Put the rows back in their order in the download
+        positions = pd.Index(rows_df["_row_hash"]).get_indexer(row_hashes)
+        #If any row of the snapshot is not held in the archive, return error
+        if (positions<0).any():
+            raise ValueError(f"{int((positions<0).sum())} rows of snapshot {snapshot_date} of sheet {sheet} are missing from the archive.")
+        output_df = rows_df.take(positions).drop(columns="_row_hash").reset_index(drop=True)
+        return output_df, snapshot_date
+    ################################################
+
+    def count(self, sheet, as_of):
+        """
+        Description
+        ----------
+        Returns the number of rows of a sheet in the most recent snapshot on or before as_of, without reading it.
+
+        Parameters
+        ----------
+        sheet : str
+            Acceptable values are "metadata", "sectors" and "themes".
+        as_of : str
+            Any date format understood by pandas, e.g. "2022-03-01".
+
+        Returns
+        ----------
+        int
+        """
+
+        import os
+        import numpy as np
+
+        #If sheet is not one of the archived sheets, return error
+        if sheet not in self.sheets:
+            raise ValueError("Unrecognized sheet input. Acceptable values are 'metadata', 'sectors' and 'themes'.")
+
+        snapshot_date = self.resolve(as_of)
+        return len(np.load(os.path.join(self.__root, sheet, f"snapshot-{snapshot_date}.npy"), mmap_mode="r"))
+    ################################################
+
+    def batches(self, sheet, as_of, columns=None, batch_rows=100000):
+        """
+        Description
+        ----------
+        Yields a sheet as it was in the most recent snapshot on or before as_of, in batches of at most batch_rows archived rows,
+        so that the sheet is never read whole. Batches are not in the order of the download; each has a '_row' column
+        holding the position of its rows in the download. Rows repeated in the download are repeated in the batches.
+
+        Parameters
+        ----------
+        sheet : str
+            Acceptable values are "metadata", "sectors" and "themes".
+        as_of : str
+            Any date format understood by pandas, e.g. "2022-03-01".
+        columns : list or None, default None
+            If list, only the specified columns are read.
+        batch_rows : int, default 100000
+            Number of archived rows read at a time.
+
+        Returns
+        ----------
+        generator of DataFrame objects
+        """
+
+        import os
+        import numpy as np
+        import pyarrow.parquet as pq
+
+        #If sheet is not one of the archived sheets, return error
+        if sheet not in self.sheets:
+            raise ValueError("Unrecognized sheet input. Acceptable values are 'metadata', 'sectors' and 'themes'.")
+        #If batch_rows is not a positive int, return error
+        if type(batch_rows)!=int or batch_rows<1:
+            raise ValueError("'batch_rows' must be a positive 'int'.")
+
+        snapshot_date = self.resolve(as_of)
+        sheet_dir = os.path.join(self.__root, sheet)
+
+        #Sort the row hashes of the snapshot, so the download positions of the rows of each batch are found by binary search
+        row_hashes = np.load(os.path.join(sheet_dir, f"snapshot-{snapshot_date}.npy"))
+        order = np.argsort(row_hashes, kind="stable")
+        sorted_hashes = row_hashes[order]
+        del(row_hashes)
+
+        read_cols = None if columns==None else list(columns)+["_row_hash"]
+        for x in self.__row_files(sheet, sorted_hashes):
+            for batch in pq.ParquetFile(os.path.join(sheet_dir, x)).iter_batches(batch_size=batch_rows, columns=read_cols):
+                batch_df = batch.to_pandas()
+                hashes = batch_df["_row_hash"].to_numpy()
+                first = np.searchsorted(sorted_hashes, hashes, side="left")
+                repeats = np.searchsorted(sorted_hashes, hashes, side="right") - first
+                if not repeats.any():
+                    continue
+                #Take each row of the snapshot as many times as it appears in the download
+                within = np.arange(repeats.sum()) - np.repeat(np.cumsum(repeats)-repeats, repeats)
+                batch_df = batch_df.take(np.repeat(np.arange(len(batch_df)), repeats)).drop(columns="_row_hash").reset_index(drop=True)
+                batch_df["_row"] = order[np.repeat(first, repeats) + within]
+                yield batch_df
+    ################################################
+
+    def columns(self, sheet, as_of):
+        """
+        Description
+        ----------
+        Returns the columns of a sheet in the most recent snapshot on or before as_of, without reading its rows.
+
+        Parameters
+        ----------
+        sheet : str
+            Acceptable values are "metadata", "sectors" and "themes".
+        as_of : str
+            Any date format understood by pandas, e.g. "2022-03-01".
+
         Returns
         ----------
-        DataFrame object
+        list of str
         """
-        #Record function call in the last_command attribute
-        self.__last_command = "get_themes"
-        
-        #if data is not loaded to the object, alert user
-        if self.__dataloaded==False:
-            self.__last_output = None
-            self.__last_output_exist = False
-            print ("Data not yet loaded.")
 
-        #Otherwise, begin data extraction sequence
+        import os
+        import numpy as np
+        import pyarrow.parquet as pq
+
+        #If sheet is not one of the archived sheets, return error
+        if sheet not in self.sheets:
+            raise ValueError("Unrecognized sheet input. Acceptable values are 'metadata', 'sectors' and 'themes'.")
+
+        snapshot_date = self.resolve(as_of)
+        sheet_dir = os.path.join(self.__root, sheet)
+        row_hashes = np.load(os.path.join(sheet_dir, f"snapshot-{snapshot_date}.npy"))
+
+        #Read the columns from the row file of the snapshot's own download if it wrote one, or else from the last row file holding its rows
+        row_files = self.__row_files(sheet, row_hashes)
+        if not row_files:
+            return []
+        own_file = f"rows-{snapshot_date}.parquet"
+        return [x for x in pq.read_schema(os.path.join(sheet_dir, own_file if own_file in row_files else row_files[-1])).names if x!="_row_hash"]
+################################################
+
+class _ColumnCache():
+    """
+    Description
+    ----------
+    Metadata columns of a Sectors or Themes object loaded with load_data(lazy=True).
+    Each column is read from the snapshot store on first access, and kept until the columns read take up more than budget bytes,
+    at which point the least recently used are dropped.
+    """
+
+    #Initialize the object
+    def __init__(self, store, snapshot_date, index, columns, budget=None):
+        import threading
+        from collections import OrderedDict
+
+        self.store = store
+        self.snapshot_date = snapshot_date
+        self.index = index
+        #every column of the data, in the order of an eager load, and those that were not loaded
+        self.all_columns = list(dict.fromkeys(x for x in columns if x not in ['Project Status Code','Lending Instrument Code']))
+        self.lazy_columns = [x for x in self.all_columns if x not in index.data.columns]
+        self.budget = budget
+        self.loaded = OrderedDict()
+        self.nbytes = 0
+        self.lock = threading.Lock()
+    ################################################
+
+    def __getstate__(self):
+        #Return the state of the cache for pickling, without the columns read so far, which are read again on first access
+        state = self.__dict__.copy()
+        for key in ["loaded", "nbytes", "lock"]:
+            del state[key]
+        return state
+    ################################################
+
+    def __setstate__(self, state):
+        #Restore the state of the cache when unpickling, with no columns read yet
+        import threading
+        from collections import OrderedDict
+        self.__dict__.update(state)
+        self.loaded = OrderedDict()
+        self.nbytes = 0
+        self.lock = threading.Lock()
+    ################################################
+
+    def column(self, col):
+        #Return the values of a metadata column, one per row of the loaded data
+        import pandas as pd
+
+        #If col is not a metadata column, return error
+        if col not in self.lazy_columns:
+            raise KeyError(f"'{col}' is not a metadata column of the loaded data.")
+
+        with self.lock:
+            if col in self.loaded:
+                self.loaded.move_to_end(col)
+                return self.loaded[col][self.index.row_pid]
+
+        #Keep one value per project, in the PID order of the index, rather than one per row
+        meta_df, _ = self.store.load("metadata", self.snapshot_date, columns=['Project Id', col])
+        values = meta_df.set_index('Project Id')[col].reindex(self.index.pids)
+        nbytes = int(values.memory_usage(index=False, deep=True))
+        values = values.to_numpy()
+
+        with self.lock:
+            if col not in self.loaded:
+                self.loaded[col] = values
+                self.nbytes += nbytes
+                self.loaded.move_to_end(col)
+                #Drop the least recently used columns beyond the budget, keeping the column just read
+                while (self.budget!=None) and (self.nbytes>self.budget) and (len(self.loaded)>1):
+                    old_col, old_values = self.loaded.popitem(last=False)
+                    self.nbytes -= int(pd.Series(old_values).memory_usage(index=False, deep=True))
+        return values[self.index.row_pid]
+    ################################################
+
+    def attach(self, data):
+        #Return data with every metadata column, in the column order of an eager load
+        full_data = data.copy(deep=False)
+        for col in self.lazy_columns:
+            full_data[col] = self.column(col)
+        return full_data[self.all_columns]
+################################################
+
+class _Partitions():
+    """
+    Description
+    ----------
+    Data of a Sectors or Themes object loaded with load_data(out_of_core=True), split by project into parquet files of merged rows on disk.
+    Projects are grouped by approval FY, consecutive FYs sharing a group and projects with missing approval FY having a group of their own,
+    and the projects of a group are assigned to one of its buckets by a hash of their PID. The rows of each bucket are written to one or
+    more partitions, each sized to take up at most a quarter of memory_limit once read.
+    """
+
+    #Initialize the object from the manifest written by _build_partitions
+    def __init__(self, directory, memory_limit):
+        import json
+        import os
+        import numpy as np
+
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        self.directory = directory
+        self.memory_limit = memory_limit
+        self.snapshot_date = manifest["snapshot_date"]
+        self.n_buckets = manifest["n_buckets"]
+        self.fy_groups = manifest["fy_groups"]
+        self.partitions = manifest["partitions"]
+        self.values = manifest["values"]
+        self.n_rows = sum(x["rows"] for x in self.partitions)
+        self.n_projects = sum(x["projects"] for x in self.partitions)
+
+        #the bucket of every project, by PID hash in sorted order
+        with np.load(os.path.join(directory, "projects.npz")) as projects:
+            self.project_hashes = projects["hashes"]
+            self.project_buckets = projects["buckets"]
+    ################################################
+
+    def buckets_of(self, pids):
+        #Return the bucket of each PID, or -1 for PIDs not in the data
+        import numpy as np
+
+        hashes = _pid_hashes(pids)
+        found = np.minimum(np.searchsorted(self.project_hashes, hashes), max(len(self.project_hashes)-1, 0))
+        if len(self.project_hashes)==0:
+            return np.full(len(hashes), -1, dtype=np.int64)
+        return np.where(self.project_hashes[found]==hashes, self.project_buckets[found], -1)
+    ################################################
+
+    def fy_bounds(self):
+        #Return the first and last approval FY in the data, or 0 for both if no project has an approval FY
+        if not self.fy_groups:
+            return 0, 0
+        return self.fy_groups[0][0], self.fy_groups[-1][1]
+    ################################################
+
+    def column_values(self):
+        #Return the unique values of the columns used by query filters in the whole data, with missing values as np.nan
+        import numpy as np
+        return {col:x["values"]+([np.nan] if x["missing"] else []) for col,x in self.values.items()}
+    ################################################
+
+    def select(self, pids=None, start_FY=None, stop_FY=None):
+        #Return the partitions holding the specified PIDs, or every partition if pids is None.
+        #If start_FY or stop_FY is specified, only the partitions of approval FYs in that range, or of missing approval FY, are returned
+        import numpy as np
+
+        partitions = list(self.partitions)
+        if pids is not None:
+            buckets = set(np.unique(self.buckets_of(pids)).tolist())
+            partitions = [x for x in partitions if x["bucket"] in buckets]
+        if start_FY is not None:
+            partitions = [x for x in partitions if (x["fy"] is None) or (x["fy"][1]>=start_FY)]
+        if stop_FY is not None:
+            partitions = [x for x in partitions if (x["fy"] is None) or (x["fy"][0]<=stop_FY)]
+        return partitions
+    ################################################
+
+    def read(self, partition):
+        #Return the rows of a partition, once checked to fit in the memory limit
+        import os
+        import pandas as pd
+
+        #If the partition takes up more than half of memory_limit, leaving too little room for the query, return error
+        if partition["nbytes"]>self.memory_limit//2:
+            raise MemoryError(f"Partition {partition['file']} takes up {partition['nbytes']} bytes, " +
+                              f"more than half of the memory limit of {self.memory_limit} bytes.")
+        return pd.read_parquet(os.path.join(self.directory, partition["file"]))
+    ################################################
+
+    def indexes(self, spec):
+        #Yield the code index of each partition in turn, reading one partition at a time
+        for partition in self.partitions:
+            yield _CodeIndex(self.read(partition), spec)
+    ################################################
+
+    def quality_report(self):
+        #Return the data quality report of every partition
+        import os
+        import pandas as pd
+        return pd.read_parquet(os.path.join(self.directory, "quality.parquet"))
+################################################
+
+def _pid_hashes(pids):
+    #Return a hash of each PID that is the same in every process
+    import numpy as np
+    import pandas as pd
+    return pd.util.hash_array(np.asarray(pids, dtype=object))
+################################################
+
+def _build_partitions(store, as_of, spec, memory_limit, quality=None):
+    #Split the snapshot of the store on or before as_of into partitions on disk for load_data(out_of_core=True), and return them.
+    #A snapshot already split with the same memory_limit and quality settings is not split again
+    import json
+    import math
+    import os
+    import shutil
+    import numpy as np
+    import pandas as pd
+
+    snapshot_date = store.resolve(as_of)
+    directory = os.path.join(os.path.expanduser(PARTITION_DIR), f"{spec['sheet']}-{snapshot_date}-{quality}-{memory_limit}")
+    if os.path.isfile(os.path.join(directory, "manifest.json")):
+        print(f"Partitions of snapshot {snapshot_date} found on disk.")
+        return _Partitions(directory, memory_limit)
+    #Remove the files of an interrupted split, if any
+    shutil.rmtree(directory, ignore_errors=True)
+    staging = os.path.join(directory, "staging")
+    os.makedirs(staging)
+
+    #Estimate the in-memory size of the merged data from the first rows of each sheet, to size buckets to a quarter of memory_limit
+    #and batches to an eighth of it
+    sheets = {"metadata":None, spec["sheet"]:spec["sheet_cols"]}
+    samples = {sheet:next(store.batches(sheet, snapshot_date, columns=columns, batch_rows=1000)) for sheet,columns in sheets.items()}
+    row_bytes = {sheet:sample.memory_usage(deep=True).sum()/max(len(sample),1) for sheet,sample in samples.items()}
+    merged_bytes = (store.count(spec["sheet"], snapshot_date)*(row_bytes[spec["sheet"]]+row_bytes["metadata"]) +
+                    store.count("metadata", snapshot_date)*row_bytes["metadata"])
+    target = memory_limit//4
+
+    #Read the approval FY of every project, by PID hash in sorted order
+    meta_hashes, meta_FY = [], []
+    batch_rows = max(1000, int(memory_limit//8//max(row_bytes["metadata"],1)))
+    for batch_df in store.batches("metadata", snapshot_date, columns=['Project Id', 'Project Approval FY'], batch_rows=batch_rows):
+        meta_hashes.append(_pid_hashes(batch_df['Project Id']))
+        meta_FY.append(pd.to_numeric(batch_df['Project Approval FY'], errors="coerce").to_numpy(dtype=float))
+    meta_hashes, meta_FY = np.concatenate(meta_hashes), np.concatenate(meta_FY)
+    order = np.argsort(meta_hashes, kind="stable")
+    meta_hashes, meta_FY = meta_hashes[order], meta_FY[order]
+
+    #Group consecutive approval FYs into groups of at most target bytes, with missing approval FY in a group of its own,
+    #and split each group into enough buckets of at most target bytes
+    project_bytes = merged_bytes/max(len(meta_hashes),1)
+    fy_values, fy_counts = np.unique(meta_FY[~np.isnan(meta_FY)], return_counts=True)
+    fy_groups, group_bytes = [], []
+    for fy, count in zip(fy_values.tolist(), fy_counts.tolist()):
+        if fy_groups and group_bytes[-1]+count*project_bytes<=target:
+            fy_groups[-1][1] = int(fy)
+            group_bytes[-1] += count*project_bytes
         else:
-            
-            #create copy of internal data
-            temp_data = self.__data  
+            fy_groups.append([int(fy), int(fy)])
+            group_bytes.append(count*project_bytes)
+    group_bytes.append(np.count_nonzero(np.isnan(meta_FY))*project_bytes)
+    group_buckets = np.array([max(1, math.ceil(x/target)) for x in group_bytes], dtype=np.uint64)
+    first_bucket = np.concatenate([[0], np.cumsum(group_buckets)]).astype(np.int64)
+    n_buckets = int(first_bucket[-1])
+    group_last_FY = np.array([x[1] for x in fy_groups], dtype=float)
 
-            #USER INPUT VALIDATION
-            #If pid_list is not a list, return error
-            if type(pid_list)!=list:
-                raise TypeError("'pid_list' must be of type 'list'.")
-                
-            #--------------------------------------------#
-            #Create a list of all available values for Product Line Type
-            theme_level_options = [1,2,3]
-             
-            #If theme_level is specified by user and it is not of type 'list', return error
-            if (theme_level!=None) and (type(theme_level)!=list):
-                 raise TypeError("'theme_level' must be of type list'.")
-            #If theme_level is specified by user and it is not among acceptable options, return error
-            elif (theme_level!=None) and set(theme_level).isdisjoint(set(theme_level_options)):
-                 raise ValueError("Unrecognized theme_level input. Acceptable values are: 1, 2, and 3.")  
-            #If theme_level is not specified by user, set product_type to all acceptable options
-            elif theme_level==None:
-                 level = theme_level_options 
-            #Finally, if theme_level is specified correctly by user, set product_type to the corresponding value in prod_type_options
-            else:
-                 level = theme_level
-                    
-            #--------------------------------------------#
-            #Identify the rows in temp_data that matches the PIDs
-            output_rows = ((temp_data['Project Id'].isin(pid_list)) & 
-                           temp_data['Theme Level'].isin(level))
-            
-            #--------------------------------------------#
-            #Specify the output columns depending on the value of show_meta
-            all_cols = list(temp_data.columns)
-            sel_cols = ['Project Id', 'Theme Code', 'Theme Name', 'Theme Percentage']
-            
-            #Show all columns if show_meta is true, else show sel_cols
-            output_cols = all_cols if show_meta else sel_cols
-        
-            #--------------------------------------------#
-            #Filter the data based on output_rows and output_cols
-            output_df = temp_data.loc[output_rows,output_cols].copy()
-            output_df.reset_index(drop=True,inplace=True)
-            
-            #--------------------------------------------#
-            #Check if output df is empty and alert user accordingly
-            if output_df.empty:
-                print("No theme codes found.")
-            else:
-                no_of_unique = output_df['Project Id'].nunique()
-                print(f"Data found for {no_of_unique} out of {len(pid_list)} requested projects.")
-                self.__last_output = output_df
-                self.__last_output_exist = True
-                return output_df 
+    def buckets_of(hashes):
+        #Return the bucket of each PID hash: the group of the approval FY of the project, or of missing approval FY for projects
+        #without metadata, and a bucket of that group from the hash
+        found = np.minimum(np.searchsorted(meta_hashes, hashes), max(len(meta_hashes)-1, 0))
+        fy = np.where(meta_hashes[found]==hashes, meta_FY[found], np.nan) if len(meta_hashes) else np.full(len(hashes), np.nan)
+        group = np.where(np.isnan(fy), len(fy_groups), np.searchsorted(group_last_FY, fy))
+        return first_bucket[group] + (hashes % group_buckets[group]).astype(np.int64)
+
+    #Split the rows of each sheet by bucket, one file per batch and bucket
+    staged = {sheet:[[] for bucket in range(n_buckets)] for sheet in sheets}
+    project_hashes = []
+    for sheet, columns in sheets.items():
+        batch_rows = max(1000, int(memory_limit//8//max(row_bytes[sheet],1)))
+        for batch_no, batch_df in enumerate(store.batches(sheet, snapshot_date, columns=columns, batch_rows=batch_rows)):
+            hashes = _pid_hashes(batch_df['Project Id'])
+            project_hashes.append(np.unique(hashes))
+            buckets = buckets_of(hashes)
+            order = np.argsort(buckets, kind="stable")
+            bounds = np.searchsorted(buckets[order], np.arange(n_buckets+1))
+            for bucket in np.flatnonzero(np.diff(bounds)):
+                file_name = f"{sheet}-{bucket}-{batch_no}.parquet"
+                batch_df.take(order[bounds[bucket]:bounds[bucket+1]]).to_parquet(os.path.join(staging, file_name), index=False)
+                staged[sheet][bucket].append(file_name)
+            del(batch_df)
+
+    #Record the bucket of every project, so that queries on some projects read only their partitions
+    project_hashes = np.unique(np.concatenate(project_hashes))
+    np.savez(os.path.join(directory, "projects.npz"), hashes=project_hashes, buckets=buckets_of(project_hashes))
+
+    #Merge the sheets one bucket at a time, as load_data does, and write the merged rows in partitions of at most target bytes
+    partitions, reports = [], []
+    values = {col:{"values":[], "missing":False} for col in ['Product Line Type', 'Project Status Name', 'Additional Financing Flag']}
+    for bucket in range(n_buckets):
+        group = int(np.searchsorted(first_bucket, bucket, side="right"))-1
+        fy_group = fy_groups[group] if group<len(fy_groups) else None
+        frames = {}
+        for sheet in sheets:
+            parts = [pd.read_parquet(os.path.join(staging, x)) for x in staged[sheet][bucket]]
+            sheet_df = pd.concat(parts, ignore_index=True) if parts else samples[sheet].iloc[:0]
+            frames[sheet] = sheet_df.sort_values("_row", kind="stable").drop(columns="_row")
+            del(parts)
+        meta_data = frames["metadata"].drop(['Project Status Code','Lending Instrument Code'], axis=1, errors="ignore")
+        merged = frames[spec["sheet"]].merge(meta_data, on="Project Id", how="outer", validate="m:1")
+        merged[spec["pct"]] = merged[spec["pct"]] * 100
+        del(frames, meta_data)
+
+        #the data quality checks are per project, so checking each bucket checks the data
+        report = _quality_report(merged, spec)
+        merged = _apply_quality(merged, report, spec, quality)
+        reports.append(report)
+
+        #Record the values of the columns used by query filters, so that each partition is queried with the options of the whole data
+        for col, x in values.items():
+            for value in merged[col].unique().tolist():
+                if pd.isna(value):
+                    x["missing"] = True
+                elif value not in x["values"]:
+                    x["values"].append(value)
+
+        #Split a bucket larger than target by project
+        pids = merged['Project Id'].unique()
+        n_parts = min(max(1, math.ceil(merged.memory_usage(deep=True).sum()/target)), max(len(pids),1))
+        for part_no, part_pids in enumerate(np.array_split(pids, n_parts)):
+            part_df = _parquet_safe(merged.loc[merged['Project Id'].isin(part_pids)].reset_index(drop=True))
+            if part_df.empty:
+                continue
+            file_name = f"part-{bucket}-{part_no}.parquet"
+            part_df.to_parquet(os.path.join(directory, file_name), index=False)
+            partitions.append({"bucket":int(bucket), "fy":fy_group, "file":file_name, "rows":len(part_df),
+                               "projects":int(part_df['Project Id'].nunique()), "nbytes":int(part_df.memory_usage(deep=True).sum())})
+        for sheet in sheets:
+            for x in staged[sheet][bucket]:
+                os.remove(os.path.join(staging, x))
+        del(merged)
+
+    #Write the quality report, then the manifest, which marks the split as complete
+    report = pd.concat(reports, ignore_index=True)
+    report.sort_values(['Project Id', 'Check'], kind="stable").reset_index(drop=True).to_parquet(os.path.join(directory, "quality.parquet"), index=False)
+    shutil.rmtree(staging)
+    with open(os.path.join(directory, "manifest.json.part"), "w") as f:
+        json.dump({"snapshot_date":snapshot_date, "n_buckets":n_buckets, "fy_groups":fy_groups, "partitions":partitions, "values":values}, f)
+    os.replace(os.path.join(directory, "manifest.json.part"), os.path.join(directory, "manifest.json"))
+    print(f"Snapshot {snapshot_date} split into {len(partitions)} partitions.")
+    return _Partitions(directory, memory_limit)
+################################################
+
+def _parquet_safe(df):
+    #Convert object columns holding a mix of types, e.g. numbers and strings, to strings so they can be written to parquet
+    import pandas as pd
+
+    for col in df.columns:
+        if df[col].dtype==object and pd.api.types.infer_dtype(df[col], skipna=True).startswith("mixed"):
+            df[col] = df[col].astype(str).where(df[col].notna())
+    return df
+################################################
+
+def _pack_frames(state):
+    #Return a copy of an object's state with each DataFrame converted to an Arrow table, which pickles column by column as raw buffers.
+    #DataFrames with non-string column labels, or object columns holding other values than strings, would not convert back unchanged and are left as they are
+    import pandas as pd
+    import pyarrow as pa
+
+    packed = dict(state)
+    for key,value in state.items():
+        if isinstance(value, pd.DataFrame) and all(type(x)==str for x in value.columns) and \
+           all(pd.api.types.infer_dtype(value[x], skipna=True) in ["string", "empty"] for x in value.columns if value[x].dtype==object):
+            packed[key] = pa.Table.from_pandas(value)
+    return packed
+################################################
+
+def _unpack_frames(state):
+    #Return a copy of an object's state with the Arrow tables made by _pack_frames converted back to DataFrames
+    import pyarrow as pa
+
+    return {key:(value.to_pandas() if isinstance(value, pa.Table) else value) for key,value in state.items()}
+################################################
+
+#First bytes of the files written by save_state
+_STATE_MAGIC = b"proj_codes-state"
+
+def _save_state(obj, path):
+    #Pickle obj to path, with its Arrow tables and arrays written out of band after the pickle, each at an offset that is a multiple of 64 bytes,
+    #so that _load_state can memory-map them instead of reading and copying them.
+    #The file is written to a temporary file first, so an existing file is only replaced by a complete one
+    import os
+    import pickle
+
+    buffers = []
+    payload = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    views = [x.raw() for x in buffers]
+    offsets = []
+    end = 0
+    for view in views:
+        start = -(-end//64)*64
+        offsets.append((start, view.nbytes))
+        end = start + view.nbytes
+    header = pickle.dumps((len(payload), offsets))
+    buffer_start = -(-(len(_STATE_MAGIC)+8+len(header)+len(payload))//64)*64
+
+    temp_path = path + ".part"
+    with open(temp_path, "wb") as f:
+        f.write(_STATE_MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        f.write(payload)
+        for view, (start, size) in zip(views, offsets):
+            f.seek(buffer_start+start)
+            f.write(view)
+        f.truncate(buffer_start+end)
+    os.replace(temp_path, path)
+################################################
+
+def _load_state(path):
+    #Return the object pickled to path by _save_state, with its arrays and Arrow tables memory-mapped from the file
+    import mmap
+    import pickle
+
+    with open(path, "rb") as f:
+        #If the file was not written by save_state, return error
+        if f.read(len(_STATE_MAGIC))!=_STATE_MAGIC:
+            raise ValueError(f"'{path}' is not a file saved by save_state.")
+        header_size = int.from_bytes(f.read(8), "little")
+        payload_size, offsets = pickle.loads(f.read(header_size))
+        payload = f.read(payload_size)
+        buffer_start = -(-f.tell()//64)*64
+        mapped = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)) if offsets else None
+    return pickle.loads(payload, buffers=[mapped[buffer_start+start:buffer_start+start+size] for start, size in offsets])
+################################################
+
+def _snapshot_mappings(as_of, spec):
+    #Return the code mappings of a snapshot, with percentages on the same 0-100 scale as loaded data
+    columns = ['Project Id', spec["code"], spec["name"], spec["pct"]]
+    mappings, snapshot_date = SnapshotStore().load(spec["sheet"], as_of, columns=columns)
+    mappings[spec["pct"]] = mappings[spec["pct"]] * 100
+    return mappings
+################################################
+
+def _diff_mappings(old_df, new_df, spec):
+    #Compare the code mappings of two downloads project by project, returning added, removed and changed mappings
+    import numpy as np
+    import pandas as pd
+
+    code_col, name_col, pct_col = spec["code"], spec["name"], spec["pct"]
+    cols = ['Project Id', code_col, pct_col]
+
+    def project_hashes(df):
+        #Sort the mappings by project and code, and combine the row hashes of each project into one content hash
+        df = df.loc[df[code_col].notna(), cols+[name_col]].copy()
+        df[code_col] = df[code_col].astype(spec["code_type"])
+        df[pct_col] = df[pct_col].round(6)
+        df.sort_values(['Project Id', code_col], inplace=True, kind="stable")
+        df.reset_index(drop=True, inplace=True)
+        row_hashes = pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+        pids = df['Project Id'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, pids[1:]!=pids[:-1]]) if len(df) else np.array([], dtype=int)
+        hashes = np.add.reduceat(row_hashes, starts) if len(df) else np.array([], dtype=np.uint64)
+        return df, pd.DataFrame({'Project Id':pids[starts], 'hash':hashes})
+
+    old_df, old_hashes = project_hashes(old_df)
+    new_df, new_hashes = project_hashes(new_df)
+
+    #Only projects whose content hash differs, or that appear in one download only, need a row-level comparison
+    unchanged_pids = old_hashes.merge(new_hashes, on=['Project Id', 'hash'], how='inner')['Project Id']
+    old_df = old_df.loc[~old_df['Project Id'].isin(unchanged_pids)]
+    new_df = new_df.loc[~new_df['Project Id'].isin(unchanged_pids)]
+
+    output_df = old_df.merge(new_df, on=['Project Id', code_col], how='outer', suffixes=(' (old)', ' (new)'), indicator=True)
+    output_df[name_col] = output_df[name_col+' (new)'].fillna(output_df[name_col+' (old)'])
+    output_df['Change'] = np.select([output_df['_merge']=='left_only', output_df['_merge']=='right_only'],
+                                    ['removed', 'added'], default='changed')
+    output_df = output_df.loc[(output_df['Change']!='changed') |
+                              (output_df[pct_col+' (old)']!=output_df[pct_col+' (new)'])]
+    output_df = output_df[['Project Id', code_col, name_col, pct_col+' (old)', pct_col+' (new)', 'Change']]
+    output_df = output_df.sort_values(['Project Id', code_col]).reset_index(drop=True)
+    return output_df
+################################################
+################################################
+################################################
+
+class Session():
+    """
+    Description
+    ----------
+    Per-caller view of a loaded Sectors or Themes object, created by its session method rather than directly.
+    Query methods (get_projects, get_sectors/get_themes, and for sectors count_sectors and main_sector) run against the shared read-only data,
+    and the session alone records their output for save_last and plot_last.
+    """
+
+    #Initialize the object
+    def __init__(self, queries, save, plot, plot_commands):
+        self.__queries = queries
+        self.__save = save
+        self.__plot = plot
+        self.__plot_commands = plot_commands
+        self.__last_command = None
+        self.__last_output = None
     ################################################
-        
+
+    def __str__(self):
+        """
+        Description
+        -------
+        String representation of a Session object.
+        """
+        return ("Object class: Session. " +
+                f"Most recent call: {self.__last_command}.")
+    ################################################
+
+    def __getattr__(self, name):
+        #Expose the query methods of the underlying object, recording their output in the session
+        queries = self.__dict__.get("_Session__queries", {})
+        if name not in queries:
+            raise AttributeError(f"'Session' object has no attribute '{name}'.")
+
+        def run_query(*args, **kwargs):
+            output_df = queries[name](*args, **kwargs)
+            self.__last_command = name
+            self.__last_output = output_df
+            return output_df
+        return run_query
+    ################################################
+
     def save_last(self, save_name=None):
-        
         """
         Description
         ----------
-        Exports the output from the most recent call of a get_projects or get_themes command.
-        Output is saved in .xlsx format.
-        
+        Exports the output from the most recent query of this session, as save_last on a Sectors or Themes object.
+
         Parameters
         ----------
         save_name : str or None, default None
-            Name exported data should be saved with.
-            If None, exported data is saved with name "Themes_extract".  
-            Overwrites any pre-existing file of the same name in the save folder
-        
+
         Returns
         ----------
         None
         """
-        try:
-            #Record function call in the last_command attribute
-            self.__last_command = "save_last"
-            
-            #If there is no last output, alert user
-            if self.__last_output_exist == False:
-                print ("No output to save.")
-            #If there is last output
-            else:
-                #Check if save_name is specified
-                if save_name==None:
-                    save_name = "Themes_extract.xlsx"
-                else:
-                    #If specified save_name is not a str, return error
-                    if type(save_name)!=str:
-                        raise TypeError("'save_name' must be of type 'str'.")
-                    #Add fill extension to the save_name
-                    save_name = save_name + ".xlsx"
-                #Extract the output df
-                output_df = self.__last_output 
-                #Save it to save_name
-                output_df.to_excel(save_name,index=False)
-                print("Output saved.")
-        except PermissionError:
-            print("ERROR! Save was unsuccessful. A file with the same name is currently open.")
-    ################################################           
-            
-    def plot_last(self, plot_by="themes", save_name=None):
-        
+
+        #If there is no last output, alert user
+        if self.__last_output is None:
+            print("No output to save.")
+        else:
+            self.__save(self.__last_output, save_name)
+        self.__last_command = "save_last"
+    ################################################
+
+    def plot_last(self, plot_by, save_name=None):
         """
         Description
         ----------
-        Plots the output from the most recent call of a get_projects or get_sectors command.
-        Output can be saved in .png format.
-        
+        Plots the output from the most recent query of this session, as plot_last on a Sectors or Themes object.
+
         Parameters
         ----------
-        plot_by : str, default "themes"
-            The grouping variable over which project counts will be plotted. 
-            Default value is "sectors", but other acceptable values are "GP", "FY", "Status", "region" and "Instrument".
+        plot_by : str
         save_name : str or None, default None
-            If str, plot created will be saved as a .png file with the string value as the file name.
-            Plot will be saved in the current working directory, and will overwrite any pre-existing file of the same name in the save folder.
-            If None, plot created will not be saved locally.
-        
+
         Returns
         ----------
         None
         """
-        
-        #If command not preceeded by get_projects or get_sectors, alert user
-        if ((self.__last_command!= "get_projects") and 
-              (self.__last_command!= "get_themes") and
-              (self.__last_command!="plot_last")):
-            print("Command must be preceded by 'get_projects' or 'get_sectors'.")
-            
+
+        #If command not preceeded by get_projects or get_sectors/get_themes, alert user
+        if self.__last_command not in self.__plot_commands+["plot_last"]:
+            print(f"Command must be preceded by {' or '.join(repr(x) for x in self.__plot_commands)}.")
         #If the previous command did not return a valid output, alert user
-        elif self.__last_output_exist == False:
+        elif self.__last_output is None:
             print("No output to plot.")
-        
-        #Else, begin data plotting sequence
         else:
-            
-            #If save_name is specified and it's not a string, return error
-            if save_name!=None and type(save_name)!=str:
-                raise TypeError("'save_name' must be of type 'str' or None.")
-            
-            #Extract the output_df from the last command
-            output_df = self.__last_output 
-            
-            #import required libraries
-            from matplotlib import pyplot as plt
-            
-            #Convert the plot_by input to variable in the output_df data
-            plot_by_dict = {"themes":"Theme Name",
-                           "gp":"Lead GP/Global Themes",
-                           "fy":"Project Approval FY",
-                           "region":"Region Name",
-                           "instrument":"Lending Instrument Long Name",
-                           "status":"Project Status Name"}
-            
-            #Convert plot_by input to lower. If operation fails, report that it is not one of the acceptable options.  
-            try:
-                plot_by_var = plot_by_dict[plot_by.lower()]
-            except:
-                raise ValueError("'plot_by' value is unrecognized. Acceptable values are 'themes', 'GP', 'FY', STatus', 'Region', and 'Instrument'.")
-            
-            if plot_by_var not in (output_df.columns):
-                raise KeyError("'plot_by' value is missing in output from previous command. Consider setting the 'show_meta' argument in previous command to True.")
-            
-            #Count the number of projects missing data for the plot_by_input
-            missing_df = output_df[output_df[plot_by_var].isna()].copy()
-            missing_count = missing_df["Project Id"].nunique()
-            
-            #If missing_FY_count > 0, notify user of of the impending exclusion
-            if missing_count>0:
-                print(f"WARNING! {missing_count} project(s) with missing values for {plot_by_var} got excluded from the plot.")
-                
-            #Create pivot table of project count by plot_by_var
-            output_df=output_df.loc[output_df['Theme Level']==3].copy()
-            plot_series = output_df.groupby(plot_by_var)["Project Id"].nunique()
-            
-            #Reset the index to transform plot series to dataframe
-            plot_df = plot_series.reset_index()
-            
-            #Sort data accordingly
-            if plot_by_var == "Project Approval FY":
-                plot_df.sort_values(plot_by_var, ascending=False, inplace=True)
-            else:
-                plot_df.sort_values("Project Id", ascending=True, inplace=True)
-                
-            #Create plot canvass
-            if plot_df[plot_by_var].nunique() in range(20,41):
-                fig, ax = plt.subplots(figsize=(7,7))
-            elif plot_df[plot_by_var].nunique() in range(40,61):
-                fig, ax = plt.subplots(figsize=(10,10))
-            elif plot_df[plot_by_var].nunique()>60:
-                fig, ax = plt.subplots(figsize=(15,15))
+            self.__plot(self.__last_output, plot_by, save_name)
+            self.__last_command = "plot_last"
+
+################################################
+################################################
+################################################
+
+#Arrays read by the per-project computations of a process pool, memory-mapped once in each worker process by _pool_init
+_POOL_ARRAYS = {}
+
+def _pool_dir(index):
+    #Write the arrays read by pool workers to .npy files, once per index, and return their directory
+    import os
+    import shutil
+    import tempfile
+    import weakref
+    import numpy as np
+
+    with index.lock:
+        if index.pool_dir==None:
+            spec = index.spec
+
+            #group row positions by project, so the rows of project i are pid_rows[pid_offsets[i]:pid_offsets[i+1]], in data order
+            pid_rows = np.argsort(index.row_pid, kind="stable")
+            pid_offsets = np.searchsorted(index.row_pid[pid_rows], np.arange(index.n_projects+1))
+
+            #number the code names, falling back on the code where the name is missing; rows with neither are numbered -1
+            row_name, pool_names = index.name_codes()
+
+            pool_dir = tempfile.mkdtemp(prefix="proj_codes_")
+            arrays = {"pids":index.pids, "pid_rows":pid_rows, "pid_offsets":pid_offsets,
+                      "row_name":row_name, "row_pct":index.row_pct}
+            for name,array in arrays.items():
+                np.save(os.path.join(pool_dir, name+".npy"), array)
+
+            #remove the files once the index is discarded, e.g. by unload_data
+            weakref.finalize(index, shutil.rmtree, pool_dir, True)
+            index.pool_dir = pool_dir
+    return index.pool_dir
+################################################
+
+def _pool_init(pool_dir):
+    #Memory-map the arrays written by _pool_dir, in a pool worker process
+    import os
+    import numpy as np
+
+    _POOL_ARRAYS.clear()
+    for name in ["pids", "pid_rows", "pid_offsets", "row_name", "row_pct"]:
+        _POOL_ARRAYS[name] = np.load(os.path.join(pool_dir, name+".npy"), mmap_mode="r")
+################################################
+
+def _pool_task(task, pids, threshold=None):
+    #Run the per-project computation of get_sectors/get_themes ("rows"), count_sectors ("count") or main_sector ("main")
+    #on one chunk of PIDs, in a pool worker process
+    import numpy as np
+
+    arrays = _POOL_ARRAYS
+    all_pids = arrays["pids"]
+
+    #locate the PIDs among the loaded projects, dropping those not in the data
+    position = np.minimum(np.searchsorted(all_pids, pids), max(len(all_pids)-1, 0))
+    found = all_pids[position]==pids if len(all_pids) else np.zeros(len(pids), dtype=bool)
+    projects = np.unique(position[found])
+
+    #gather the rows of those projects, each project's rows in data order
+    starts = arrays["pid_offsets"][projects]
+    lengths = arrays["pid_offsets"][projects+1]-starts
+    ends = np.cumsum(lengths)
+    rows = arrays["pid_rows"][np.repeat(starts-ends+lengths, lengths)+np.arange(lengths.sum())]
+    if task=="rows":
+        return rows
+    if len(projects)==0:
+        empty = np.zeros(0, dtype=int)
+        return (all_pids[empty], empty, empty, np.zeros(0))
+
+    #keep one entry per project and name, at the row where the name first appears but with the percentage of its last row,
+    #as the dict update of the computation in the calling process does
+    project = np.repeat(np.arange(len(projects)), lengths)
+    name = arrays["row_name"][rows]
+    order = np.lexsort((rows, name, project))
+    project, name, rows = project[order], name[order], rows[order]
+    new_entry = np.ones(len(rows), dtype=bool)
+    new_entry[1:] = (project[1:]!=project[:-1]) | (name[1:]!=name[:-1])
+    first = np.flatnonzero(new_entry)
+    last = np.append(first[1:], len(rows))-1
+    project, name, first_row, pct = project[first], name[first], rows[first], arrays["row_pct"][rows[last]]
+
+    #the entries of each project are contiguous
+    project_starts = np.searchsorted(project, np.arange(len(projects)))
+    project_first_row = np.minimum.reduceat(first_row, project_starts)
+    n_names = np.bincount(project, minlength=len(projects))
+
+    if task=="count":
+        counts = np.bincount(project[name>=0], minlength=len(projects))
+        return (all_pids[projects], project_first_row, counts)
+
+    #main sector: name with the largest percentage, ambiguous if several names share it
+    if threshold==None:
+        max_pct = np.fmax.reduceat(pct, project_starts)
+        at_max = pct==max_pct[project]
+        ambiguous = np.bincount(project[at_max], minlength=len(projects))>1
+        candidate = at_max | (n_names[project]==1)
+    #or the name at or above the threshold whose first row comes last, ambiguous if there is none
+    else:
+        ambiguous = np.zeros(len(projects), dtype=bool)
+        candidate = (pct>=threshold) | (n_names[project]==1)
+
+    candidate = np.flatnonzero(candidate)
+    candidate = candidate[np.lexsort((first_row[candidate], project[candidate]))]
+    is_last = np.ones(len(candidate), dtype=bool)
+    is_last[:-1] = project[candidate][1:]!=project[candidate][:-1]
+    chosen = np.full(len(projects), -1)
+    chosen[project[candidate[is_last]]] = candidate[is_last]
+
+    ambiguous = ambiguous | (chosen<0)
+    main_name = np.where(ambiguous, -2, name[np.maximum(chosen,0)])
+    main_pct = np.where(ambiguous, np.nan, pct[np.maximum(chosen,0)])
+    return (all_pids[projects], project_first_row, main_name, main_pct)
+################################################
+
+def _fan_out(index, task, pids, workers, threshold=None):
+    #Partition pids into chunks, run _pool_task on them in a pool of workers processes, and merge the results in data order
+    import numpy as np
+    from concurrent.futures import ProcessPoolExecutor
+
+    #the workers memory-map the index's arrays rather than receiving the data with each task
+    pool_dir = _pool_dir(index)
+    pids = np.asarray(pids, dtype=str)
+    chunks = np.array_split(pids, max(min(len(pids), workers*4), 1))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_pool_init, initargs=(pool_dir,)) as executor:
+        results = list(executor.map(_pool_task, [task]*len(chunks), chunks, [threshold]*len(chunks)))
+
+    if task=="rows":
+        return np.unique(np.concatenate(results))
+
+    #a PID repeated across chunks is computed more than once; keep one result per project, ordered by its first row
+    merged = [np.concatenate(x) for x in zip(*results)]
+    _, keep = np.unique(merged[1], return_index=True)
+    return [x[keep] for x in merged]
+################################################
+################################################
+################################################
+
+def _cli_object(kind, refresh=False):
+    #Return a Sectors or Themes object holding the data for the command line, restored from the state saved in CLI_DIR,
+    #or loaded with load_data and saved there if there is no saved state, it cannot be read, or refresh is True
+    import os
+
+    obj = Sectors() if kind=="sectors" else Themes()
+    path = os.path.join(os.path.expanduser(CLI_DIR), kind+".state")
+    if os.path.isfile(path) and not refresh:
+        try:
+            obj.load_state(path)
+            return obj
+        except (ValueError, TypeError, OSError) as error:
+            print(f"WARNING! Could not read the saved state {path}: {error}. Loading the data again.")
+    obj.load_data()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    obj.save_state(path)
+    return obj
+################################################
+
+def main(argv=None):
+    """
+    Description
+    ----------
+    Runs the command line of the module: python -m proj_codes <command> [arguments].
+    Commands mirror the get_projects, get_sectors, get_themes, count_sectors, main_sector and save_last methods.
+    Data is restored from a state saved by save_state in CLI_DIR, which is written by the first command run, so that later commands
+    do not read the download again; use --refresh after a new download. Only the libraries a command needs are imported.
+    Query outputs are written to stdout in CSV format, and kept in CLI_DIR for save_last; --save also exports them to .xlsx.
+    Messages about data loading and queries are printed to stderr, so that stdout only holds the output.
+    Run python -m proj_codes --help, or python -m proj_codes <command> --help, for the arguments of each command.
+    
+    Parameters
+    ----------
+    argv : list or None, default None
+        Arguments of the command line. If None, sys.argv[1:] is used.
+    
+    Returns
+    ----------
+    int, the exit status of the command
+    """
+    
+    import argparse
+    import contextlib
+    import os
+    import sys
+    import time
+    
+    start_time = time.perf_counter()
+    
+    parser = argparse.ArgumentParser(prog="python -m proj_codes",
+                                     description="Query WB project sectors and themes data from the local cache.")
+    parser.add_argument("--refresh", action="store_true", help="load the most recent download again rather than the saved state")
+    parser.add_argument("--time", action="store_true", help="print the time taken to load data and run the command to stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    command = commands.add_parser("get_projects", help="projects mapped to sector or theme codes")
+    command.add_argument("codes", nargs="+", help="sector codes, or theme codes with --themes")
+    command.add_argument("--themes", action="store_true", help="query theme codes rather than sector codes")
+    command.add_argument("--min-pct", type=int, default=1)
+    command.add_argument("--start-fy", type=int)
+    command.add_argument("--stop-fy", type=int)
+    command.add_argument("--product-type", nargs="+")
+    command.add_argument("--project-status", nargs="+")
+    command.add_argument("--exclude-af", action="store_true", help="exclude additional financing projects")
+    command.add_argument("--show-all", action="store_true")
+    command.add_argument("--show-meta", action="store_true")
+    
+    for name, help_text in [("get_sectors", "sector codes of projects"), ("get_themes", "theme codes of projects")]:
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("pids", nargs="+")
+        command.add_argument("--show-meta", action="store_true")
+        if name=="get_themes":
+            command.add_argument("--theme-level", type=int, nargs="+")
+    
+    command = commands.add_parser("count_sectors", help="number of sector codes of projects")
+    command.add_argument("pids", nargs="+")
+    command.add_argument("--summarize", action="store_true")
+    
+    command = commands.add_parser("main_sector", help="main sector of projects")
+    command.add_argument("pids", nargs="+")
+    command.add_argument("--threshold", type=int)
+    command.add_argument("--summarize", action="store_true")
+    
+    #Query commands can also export their output to .xlsx, as save_last does
+    for command in commands.choices.values():
+        command.add_argument("--save", metavar="SAVE_NAME", help="also export the output to SAVE_NAME.xlsx")
+    
+    command = commands.add_parser("save_last", help="export the output of the most recent command to .xlsx")
+    command.add_argument("save_name", nargs="?")
+    
+    args = parser.parse_args(argv)
+    last_path = os.path.join(os.path.expanduser(CLI_DIR), "last.state")
+    
+    #Export the output kept by the most recent query command
+    if args.command=="save_last":
+        if not os.path.isfile(last_path):
+            print("No output to save.")
+            return 1
+        last = _load_state(last_path)
+        with contextlib.redirect_stdout(sys.stderr):
+            obj = Sectors() if last["kind"]=="sectors" else Themes()
+        obj._save_output(last["output"], args.save_name)
+        return 0
+    
+    #Theme codes are integers
+    kind = "themes" if (args.command=="get_themes") or (args.command=="get_projects" and args.themes) else "sectors"
+    if (args.command=="get_projects") and (kind=="themes"):
+        try:
+            args.codes = [int(code) for code in args.codes]
+        except ValueError:
+            parser.error("theme codes must be integers.")
+    
+    #Restore the data the command queries, printing loading messages to stderr so that stdout only holds the output
+    with contextlib.redirect_stdout(sys.stderr):
+        obj = _cli_object(kind, args.refresh)
+    load_time = time.perf_counter()
+    
+    #Messages of the query are printed to stderr as well
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            if args.command=="get_projects":
+                output = obj.get_projects(args.codes, min_pct=args.min_pct, start_FY=args.start_fy, stop_FY=args.stop_fy,
+                                          product_type=args.product_type, project_status=args.project_status,
+                                          include_AF=not args.exclude_af, show_all=args.show_all, show_meta=args.show_meta)
+            elif args.command=="get_sectors":
+                output = obj.get_sectors(args.pids, show_meta=args.show_meta)
+            elif args.command=="get_themes":
+                output = obj.get_themes(args.pids, theme_level=args.theme_level, show_meta=args.show_meta)
+            elif args.command=="count_sectors":
+                output = obj.count_sectors(args.pids, summarize=args.summarize)
             else:
-                fig, ax = plt.subplots()
-            
-            #Create horizontal bar chart, using a container to save the chart
-            fig_con = ax.barh(plot_df[plot_by_var],plot_df["Project Id"])
-            
-            #Add data label
-            ax.bar_label(fig_con)
-            
-            # make the x ticks integers, not floats
-            x_label_int = []
-            locs, labels = plt.xticks()
-            for each in locs:
-                x_label_int.append(int(each))
-            plt.xticks(x_label_int)
-            
-            if plot_by_var == "Project Approval FY":
-                ax.invert_yaxis()
-                
-            #Add title to X-Axis
-            ax.set_xlabel("Project count")
-            
-            #Add chart title
-            ax.set_title(f"Project count, by {plot_by_var}")
-            
-            fig.savefig(save_name, bbox_inches='tight') if save_name!=None else plt.show()
-            
-            if save_name!=None:
-                print("Plot saved.")
-            
-            #Record command in the last_command attribute
-            self.__last_command = "plot_last"
\ No newline at end of file
+                output = obj.main_sector(args.pids, threshold=args.threshold, summarize=args.summarize)
+    #If the arguments are rejected, report the error as argparse does
+    except (TypeError, ValueError) as error:
+        parser.exit(2, f"{parser.prog} {args.command}: error: {error}\n")
+    
+    #Write the output to stdout in CSV format and keep it for save_last
+    if output is not None:
+        if hasattr(output, "to_csv"):
+            output.to_csv(sys.stdout, index=False)
+        else:
+            print(output)
+        if hasattr(output, "to_excel"):
+            _save_state({"kind":kind, "output":output}, last_path)
+            #Export the output to .xlsx if requested, printing the message to stderr
+            if args.save!=None:
+                with contextlib.redirect_stdout(sys.stderr):
+                    obj._save_output(output, args.save)
+    
+    if args.time:
+        end_time = time.perf_counter()
+        print(f"Data loaded in {load_time-start_time:.3f} seconds, command run in {end_time-load_time:.3f} seconds.", file=sys.stderr)
+    return 0
+################################################
+
+if __name__=="__main__":
+    #Run the command line from the module imported under its own name rather than as __main__, so that saved states
+    #refer to its classes and can be read by any program that imports it
+    import importlib
+    import sys
+    sys.exit(importlib.import_module(__spec__.name if __spec__!=None else "proj_codes").main())
\ No newline at end of file
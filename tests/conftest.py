@@ -0,0 +1,109 @@
+#Shared fixtures of the tests: synthetic Project_data downloads written to temporary folders,
+#with every folder of the module pointed there, so that no test reads the N:\ drive or the user's home folder
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import proj_codes
+
+
+#Sector codes by major sector, and splits of a project's sector or theme percentages, as shares of 1
+SECTOR_CODES = {"TX":["TI", "TW", "TV"], "WX":["WA", "WB"], "LX":["LR", "LS"], "HX":["HH"]}
+SPLITS = [[1.0], [0.6, 0.4], [0.5, 0.5], [0.5, 0.3, 0.2]]
+
+
+def make_download(n_projects=400, seed=0):
+    #Return the sheets of a synthetic download: metadata, sectors and themes, with percentages as shares of 1.
+    #Some projects have no code rows, and theme percentages follow the taxonomy: each theme's percentage is split among the themes under it
+    rng = np.random.default_rng(seed)
+    pids = [f"P{100000+i}" for i in range(n_projects)]
+
+    metadata = pd.DataFrame({'Project Id':pids,
+                             'Project Name':[f"Project {i}" for i in range(n_projects)],
+                             'Project Status Name':rng.choice(["Active", "Closed", "Dropped", "Pipeline"], n_projects),
+                             'Project Status Code':"X",
+                             'Product Line Type':rng.choice(["L", "A", "S"], n_projects),
+                             'Additional Financing Flag':rng.choice(["Y", "N"], n_projects, p=[0.2, 0.8]),
+                             'Project Approval FY':np.where(rng.random(n_projects)<0.05, np.nan, rng.integers(2005, 2023, n_projects)),
+                             'Lead GP/Global Themes':rng.choice(["Energy", "Transport", "Water", "Health"], n_projects),
+                             'Region Name':rng.choice(["AFR", "EAP", "LCR", "SAR"], n_projects),
+                             'Lending Instrument Long Name':rng.choice(["Investment Project Financing", "Development Policy Lending"], n_projects),
+                             'Lending Instrument Code':"Y",
+                             'Lending Project Cost':rng.integers(1, 100, n_projects)*1e6})
+
+    all_sectors = [(major, code) for major, codes in SECTOR_CODES.items() for code in codes]
+    sector_rows, theme_rows = [], []
+    for i, pid in enumerate(pids):
+        #One project in twenty has no sector rows, and one in ten no theme rows
+        if i%20!=19:
+            split = SPLITS[rng.integers(len(SPLITS))]
+            for k, pct in zip(rng.choice(len(all_sectors), len(split), replace=False), split):
+                major, code = all_sectors[k]
+                sector_rows.append((pid, major, f"Major {major}", code, f"Sector {code}", pct))
+        if i%10!=9:
+            split = SPLITS[rng.integers(len(SPLITS))]
+            level3 = rng.choice([811, 812, 821, 822, 911, 921], len(split), replace=False)
+            pcts = {}
+            for code, pct in zip(level3, split):
+                for level, theme in [(1, code//100), (2, code//10), (3, code)]:
+                    pcts[(level, int(theme))] = pcts.get((level, int(theme)), 0)+pct
+            for (level, theme), pct in sorted(pcts.items()):
+                commitment = pct*metadata.at[i, 'Lending Project Cost']
+                theme_rows.append((pid, theme, level, f"Theme {theme}", pct, commitment, commitment))
+
+    sectors = pd.DataFrame(sector_rows, columns=proj_codes._SECTOR_SPEC["sheet_cols"])
+    themes = pd.DataFrame(theme_rows, columns=proj_codes._THEME_SPEC["sheet_cols"])
+    return {"metadata":metadata, "sectors":sectors, "themes":themes}
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    #Point the download, mirror, snapshot, partition and command line folders at tmp_path, and return the download folder
+    data_dir = tmp_path/"downloads"
+    data_dir.mkdir()
+    monkeypatch.setenv("PROJ_CODES_DATA_DIR", str(data_dir))
+    monkeypatch.setenv("PROJ_CODES_MIRROR_DIR", str(tmp_path/"mirror"))
+    monkeypatch.setattr(proj_codes, "SNAPSHOT_DIR", str(tmp_path/"snapshots"))
+    monkeypatch.setattr(proj_codes, "PARTITION_DIR", str(tmp_path/"partitions"))
+    monkeypatch.setattr(proj_codes, "CLI_DIR", str(tmp_path/"cli"))
+    monkeypatch.chdir(tmp_path)
+    return data_dir
+
+
+@pytest.fixture
+def write_download(data_dir):
+    #Return a function writing the sheets of a download to the download folder as Parquet files, one per sheet,
+    #named as Project_data downloads are, e.g. write_download("April 14, 2022", sheets)
+    def write(download_date, sheets):
+        for sheet, sheet_df in sheets.items():
+            sheet_df.to_parquet(os.path.join(data_dir, f"Project_data.parquet.{download_date}.{sheet}.parquet"), index=False)
+    return write
+
+
+@pytest.fixture
+def download(write_download):
+    #A synthetic download dated April 14, 2022, returned as its sheets
+    sheets = make_download()
+    write_download("April 14, 2022", sheets)
+    return sheets
+
+
+@pytest.fixture
+def sectors(download):
+    #A Sectors object with the synthetic download loaded
+    obj = proj_codes.Sectors()
+    obj.load_data()
+    return obj
+
+
+@pytest.fixture
+def themes(download):
+    #A Themes object with the synthetic download loaded
+    obj = proj_codes.Themes()
+    obj.load_data()
+    return obj
+
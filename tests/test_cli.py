@@ -0,0 +1,62 @@
+#Tests of the command line, python -m proj_codes, run through main
+import io
+import os
+
+import pandas as pd
+import pytest
+
+import proj_codes
+
+
+def run(capsys, *argv):
+    #Run a command, returning its exit status, its output read back from the CSV written to stdout, and its messages
+    capsys.readouterr()
+    status = proj_codes.main(list(argv))
+    out, err = capsys.readouterr()
+    return status, (pd.read_csv(io.StringIO(out)) if out else None), err
+
+
+def test_get_projects_writes_csv_to_stdout(sectors, capsys):
+    status, output_df, messages = run(capsys, "get_projects", "ti", "wa", "--min-pct", "30", "--start-fy", "2010")
+    assert status==0
+    expected = sectors.get_projects(["TI", "WA"], min_pct=30, start_FY=2010)
+    pd.testing.assert_frame_equal(output_df, expected.reset_index(drop=True), check_dtype=False)
+    #messages about loading and the query go to stderr
+    assert "unique projects meet the specified criteria." in messages
+    assert os.path.isfile(os.path.join(proj_codes.CLI_DIR, "sectors.state"))
+
+
+def test_later_commands_restore_the_saved_state(sectors, capsys):
+    run(capsys, "count_sectors", "P100001")
+    status, output_df, messages = run(capsys, "count_sectors", "P100001", "P100002", "P100003", "--summarize")
+    assert status==0
+    assert "Data loading successful!" not in messages
+    assert "State loading successful!" in messages
+    expected = sectors.count_sectors(["P100001", "P100002", "P100003"], summarize=True)
+    pd.testing.assert_frame_equal(output_df, expected.reset_index(drop=True), check_dtype=False)
+
+
+def test_themes_commands(themes, capsys):
+    status, output_df, _ = run(capsys, "get_projects", "811", "--themes")
+    assert status==0
+    pd.testing.assert_frame_equal(output_df, themes.get_projects([811]).reset_index(drop=True), check_dtype=False)
+    status, output_df, _ = run(capsys, "get_themes", "P100001", "P100002", "--theme-level", "3")
+    pd.testing.assert_frame_equal(output_df, themes.get_themes(["P100001", "P100002"], theme_level=[3]).reset_index(drop=True),
+                                  check_dtype=False)
+
+
+def test_save_options_export_to_xlsx(download, tmp_path, capsys):
+    status, output_df, messages = run(capsys, "main_sector", "P100001", "P100002", "--save", "main")
+    assert status==0
+    pd.testing.assert_frame_equal(pd.read_excel(tmp_path/"main.xlsx"), output_df)
+    assert run(capsys, "save_last", "last")[0]==0
+    pd.testing.assert_frame_equal(pd.read_excel(tmp_path/"last.xlsx"), output_df)
+
+
+def test_rejected_arguments_exit_with_status_2(download, capsys):
+    with pytest.raises(SystemExit) as error:
+        proj_codes.main(["get_projects", "eight", "--themes"])
+    assert error.value.code==2
+    with pytest.raises(SystemExit) as error:
+        proj_codes.main(["get_themes", "P100001", "--theme-level", "7"])
+    assert error.value.code==2
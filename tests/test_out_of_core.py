@@ -0,0 +1,97 @@
+#Tests that data loaded with out_of_core=True, held on disk in partitions, gives the same results as data loaded in memory
+import pandas as pd
+import pytest
+
+import proj_codes
+
+
+#Small enough to split the synthetic download into several partitions
+MEMORY_LIMIT = 100000
+
+
+def collect(outputs):
+    #Concatenate the DataFrames of the iterator returned by a query of partitioned data, or return None if there are none
+    outputs = list(outputs)
+    return pd.concat(outputs, ignore_index=True) if outputs else None
+
+
+def assert_same_rows(in_memory, out_of_core, keys):
+    #Partitions are queried in turn, so rows are compared regardless of order
+    pd.testing.assert_frame_equal(out_of_core.sort_values(keys).reset_index(drop=True)[in_memory.columns],
+                                  in_memory.sort_values(keys).reset_index(drop=True), check_dtype=False)
+
+
+@pytest.fixture
+def sectors_on_disk(download):
+    obj = proj_codes.Sectors()
+    obj.load_data(out_of_core=True, memory_limit=MEMORY_LIMIT)
+    return obj
+
+
+@pytest.fixture
+def themes_on_disk(download):
+    obj = proj_codes.Themes()
+    obj.load_data(out_of_core=True, memory_limit=MEMORY_LIMIT)
+    return obj
+
+
+def test_data_is_split_into_partitions(sectors_on_disk, themes_on_disk):
+    assert len(sectors_on_disk._partitions.partitions)>1
+    assert len(themes_on_disk._partitions.partitions)>1
+
+
+@pytest.mark.parametrize("kwargs", [dict(sector_codes=["TI", "WA"], min_pct=20),
+                                    dict(sector_codes=["TI"], start_FY=2010, stop_FY=2015, project_status=["Active", "Closed"], show_meta=True),
+                                    dict(sector_codes=["LR"], show_all=True),
+                                    dict(sector_codes=["HH"], include_AF=False, product_type=["L"])])
+def test_get_projects(sectors, sectors_on_disk, kwargs):
+    assert_same_rows(sectors.get_projects(**kwargs), collect(sectors_on_disk.get_projects(**kwargs)), ['Project Id', 'Sector Code'])
+
+
+def test_pid_queries(sectors, sectors_on_disk, download):
+    pids = download["metadata"]['Project Id'].tolist()[::3] + ["P999999"]
+    assert_same_rows(sectors.get_sectors(pids, show_meta=True), collect(sectors_on_disk.get_sectors(pids, show_meta=True)),
+                     ['Project Id', 'Sector Code'])
+    assert_same_rows(sectors.count_sectors(pids), collect(sectors_on_disk.count_sectors(pids)), ['PID'])
+    assert_same_rows(sectors.main_sector(pids, threshold=40), collect(sectors_on_disk.main_sector(pids, threshold=40)), ['PID'])
+
+
+@pytest.mark.parametrize("kwargs", [dict(), dict(share=True), dict(measure="pct_weighted", window=3), dict(by="Region", codes=["TI", "WA"])])
+def test_trend(sectors, sectors_on_disk, kwargs):
+    pd.testing.assert_frame_equal(sectors_on_disk.trend(**kwargs), sectors.trend(**kwargs), check_exact=False)
+
+
+@pytest.mark.parametrize("kwargs", [dict(), dict(codes=["TI", "WA", "LR"]), dict(by_FY=True)])
+def test_cooccurrence(sectors, sectors_on_disk, kwargs):
+    pd.testing.assert_frame_equal(sectors_on_disk.cooccurrence(**kwargs), sectors.cooccurrence(**kwargs))
+
+
+@pytest.mark.parametrize("kwargs", [dict(k=3), dict(k=2, within=["FY"]), dict(k=2, by="Region", within=["code"], measure="pct_weighted")])
+def test_top_k(sectors, sectors_on_disk, kwargs):
+    pd.testing.assert_frame_equal(sectors_on_disk.top_k(**kwargs), sectors.top_k(**kwargs), check_exact=False)
+
+
+def test_sweeps_and_quality_report(sectors, sectors_on_disk):
+    pd.testing.assert_frame_equal(sectors_on_disk.sweep_min_pct(["TI", "WA"]), sectors.sweep_min_pct(["TI", "WA"]))
+    pd.testing.assert_frame_equal(sectors_on_disk.sweep_main_sector(), sectors.sweep_main_sector())
+    pd.testing.assert_frame_equal(sectors_on_disk.quality_report(), sectors.quality_report())
+
+
+def test_themes(themes, themes_on_disk, download):
+    assert_same_rows(themes.get_projects([811, 92], min_pct=10), collect(themes_on_disk.get_projects([811, 92], min_pct=10)),
+                     ['Project Id', 'Theme Code'])
+    pids = download["metadata"]['Project Id'].tolist()[::4]
+    assert_same_rows(themes.get_themes(pids, theme_level=[2, 3]), collect(themes_on_disk.get_themes(pids, theme_level=[2, 3])),
+                     ['Project Id', 'Theme Code'])
+    pd.testing.assert_frame_equal(themes_on_disk.trend(measure="commitment", share=True), themes.trend(measure="commitment", share=True),
+                                  check_exact=False)
+    pd.testing.assert_frame_equal(themes_on_disk.top_k(k=2, within=["Region"]), themes.top_k(k=2, within=["Region"]), check_exact=False)
+
+
+def test_queries_of_data_in_memory_only(sectors_on_disk, capsys):
+    capsys.readouterr()
+    assert sectors_on_disk.query() is None
+    assert sectors_on_disk.session() is None
+    assert "Not available for data loaded with out_of_core=True." in capsys.readouterr().out
+    with pytest.raises(ValueError):
+        sectors_on_disk.trend(portfolio="closed")
@@ -0,0 +1,132 @@
+#Tests of the snapshot store and of loading past downloads with as_of
+import os
+
+import pandas as pd
+
+import proj_codes
+from conftest import make_download
+
+
+def newer_download(sheets):
+    #Return a copy of the sheets of a download with some sector mappings and metadata changed
+    sheets = {sheet:sheet_df.copy() for sheet, sheet_df in sheets.items()}
+    sheets["metadata"].loc[:9, 'Project Status Name'] = "Closed"
+    sheets["sectors"].loc[:5, 'Sector Percentage'] = 0.25
+    return sheets
+
+
+def test_ingest_skips_downloads_already_archived(download):
+    store = proj_codes.SnapshotStore()
+    assert store.ingest()=="2022-04-14"
+    assert store.ingest()=="2022-04-14"
+    assert store.snapshots()==["2022-04-14"]
+
+
+def test_load_returns_the_sheet_as_downloaded(download):
+    store = proj_codes.SnapshotStore()
+    store.ingest()
+    sectors_df, snapshot_date = store.load("sectors", "2022-04-14")
+    assert snapshot_date=="2022-04-14"
+    pd.testing.assert_frame_equal(sectors_df, download["sectors"], check_dtype=False)
+
+
+def test_as_of_loads_the_most_recent_snapshot_on_or_before_the_date(download, write_download):
+    store = proj_codes.SnapshotStore()
+    store.ingest()
+    old = proj_codes.Sectors()
+    old.load_data()
+
+    write_download("May 2, 2022", newer_download(download))
+    assert store.ingest()=="2022-05-02"
+    assert store.snapshots()==["2022-04-14", "2022-05-02"]
+    new = proj_codes.Sectors()
+    new.load_data()
+
+    past = proj_codes.Sectors(as_of="2022-04-30")
+    past.load_data()
+    pd.testing.assert_frame_equal(past.copy_data(), old.copy_data())
+    latest = proj_codes.Sectors(as_of="2022-06-01")
+    latest.load_data()
+    pd.testing.assert_frame_equal(latest.copy_data(), new.copy_data())
+    assert not new.copy_data().equals(old.copy_data())
+
+
+def test_as_of_themes_and_lazy_loading_match_eager_loading(download):
+    proj_codes.SnapshotStore().ingest()
+    eager = proj_codes.Themes()
+    eager.load_data()
+    past = proj_codes.Themes(as_of="2022-04-14")
+    past.load_data()
+    lazy = proj_codes.Themes()
+    lazy.load_data(lazy=True)
+    pd.testing.assert_frame_equal(past.copy_data(), eager.copy_data())
+    pd.testing.assert_frame_equal(lazy.copy_data(), eager.copy_data())
+
+
+def test_unchanged_rows_are_stored_once(download, write_download):
+    store = proj_codes.SnapshotStore()
+    store.ingest()
+    write_download("May 2, 2022", make_download())
+    store.ingest()
+    #the second download is identical, so no rows are written for it and both snapshots read the same rows
+    for sheet in store.sheets:
+        assert not os.path.exists(os.path.join(proj_codes.SNAPSHOT_DIR, sheet, "rows-2022-05-02.parquet"))
+        assert store.count(sheet, "2022-05-02")==len(download[sheet])
+    first, _ = store.load("themes", "2022-04-14")
+    second, _ = store.load("themes", "2022-05-02")
+    pd.testing.assert_frame_equal(first, second)
+
+
+def apply_diff(mappings, diff_df, spec):
+    #Return the code mappings of a download with the changes of diff_df applied, as Project Id, code and percentage columns
+    code_col, pct_col = spec["code"], spec["pct"]
+    keys = ['Project Id', code_col]
+    mappings = mappings.loc[mappings[code_col].notna(), keys+[pct_col]].set_index(keys)
+    for change in diff_df.to_dict("records"):
+        key = (change['Project Id'], change[code_col])
+        if change['Change']=="removed":
+            mappings = mappings.drop(key)
+        else:
+            mappings.loc[key, pct_col] = change[pct_col+" (new)"]
+    return mappings.reset_index().sort_values(keys).reset_index(drop=True)
+
+
+def test_diff_round_trips_between_downloads(download, write_download):
+    store = proj_codes.SnapshotStore()
+    store.ingest()
+    new_sheets = newer_download(download)
+    #remove one mapping and add another
+    new_sheets["sectors"] = new_sheets["sectors"].drop(index=10)
+    new_sheets["sectors"].loc[len(download["sectors"])] = ['P100000', "HX", "Major HX", "HH", "Sector HH", 0.1]
+    write_download("May 2, 2022", new_sheets)
+    store.ingest()
+    obj = proj_codes.Sectors()
+    obj.load_data()
+
+    diff_df = obj.diff("2022-04-14")
+    assert set(diff_df['Change'])=={"added", "removed", "changed"}
+    pd.testing.assert_frame_equal(obj.diff("2022-04-14", "2022-05-02"), diff_df)
+    assert obj.diff("2022-05-02").empty
+
+    #applying the changes to the earlier mappings gives the later ones
+    spec = proj_codes._SECTOR_SPEC
+    old_df = proj_codes._snapshot_mappings("2022-04-14", spec)
+    new_df = proj_codes._snapshot_mappings("2022-05-02", spec)
+    expected = new_df.loc[new_df[spec["code"]].notna(), ['Project Id', spec["code"], spec["pct"]]]
+    expected = expected.sort_values(['Project Id', spec["code"]]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(apply_diff(old_df, diff_df, spec), expected)
+
+
+def test_diff_of_themes_reports_changed_percentages(download, write_download):
+    store = proj_codes.SnapshotStore()
+    store.ingest()
+    new_sheets = {sheet:sheet_df.copy() for sheet, sheet_df in download.items()}
+    changed = new_sheets["themes"].index[:3]
+    new_sheets["themes"].loc[changed, 'Theme Percentage'] += 0.1
+    write_download("May 2, 2022", new_sheets)
+    store.ingest()
+
+    diff_df = proj_codes.Themes().diff("2022-04-14", "2022-05-02")
+    assert (diff_df['Change']=="changed").all()
+    assert len(diff_df)==3
+    assert diff_df['Theme Code'].tolist()==download["themes"].loc[changed, 'Theme Code'].tolist()
@@ -0,0 +1,56 @@
+#Tests of save_state, load_state and pickling of loaded Sectors and Themes objects
+import pickle
+
+import pandas as pd
+import pytest
+
+import proj_codes
+
+
+def test_sectors_state_round_trip(sectors, tmp_path):
+    sectors.define_portfolio("closed", project_status=["Closed"])
+    last = sectors.get_projects(["TI", "WA"], min_pct=30, show_meta=True)
+    sectors.save_state(str(tmp_path/"sectors.state"))
+
+    restored = proj_codes.Sectors()
+    restored.load_state(str(tmp_path/"sectors.state"))
+    assert restored
+    pd.testing.assert_frame_equal(restored.copy_data(), sectors.copy_data())
+    pd.testing.assert_frame_equal(restored.project_summary(), sectors.project_summary())
+    pd.testing.assert_frame_equal(restored.quality_report(), sectors.quality_report())
+    #the output of the most recent query and the portfolios are restored with the data
+    pd.testing.assert_frame_equal(restored._last_output, last)
+    pd.testing.assert_frame_equal(restored.get_projects(["TI"], portfolio="closed"), sectors.get_projects(["TI"], portfolio="closed"))
+    pd.testing.assert_frame_equal(restored.main_sector(["P100001", "P100002"]), sectors.main_sector(["P100001", "P100002"]))
+
+
+def test_themes_state_round_trip_of_lazy_data(download, tmp_path):
+    themes = proj_codes.Themes()
+    themes.load_data(lazy=True)
+    themes.save_state(str(tmp_path/"themes.state"))
+
+    restored = proj_codes.Themes()
+    restored.load_state(str(tmp_path/"themes.state"))
+    pd.testing.assert_frame_equal(restored.copy_data(), themes.copy_data())
+    pd.testing.assert_frame_equal(restored.get_themes(["P100001"], show_meta=True), themes.get_themes(["P100001"], show_meta=True))
+    pd.testing.assert_frame_equal(restored.trend(measure="commitment"), themes.trend(measure="commitment"))
+
+
+def test_pickle_round_trip(sectors, themes):
+    for obj in (sectors, themes):
+        restored = pickle.loads(pickle.dumps(obj))
+        assert type(restored)==type(obj)
+        pd.testing.assert_frame_equal(restored.copy_data(), obj.copy_data())
+        pd.testing.assert_frame_equal(restored.cooccurrence(), obj.cooccurrence())
+
+
+def test_load_state_rejects_another_class(sectors, tmp_path):
+    sectors.save_state(str(tmp_path/"sectors.state"))
+    with pytest.raises(TypeError):
+        proj_codes.Themes().load_state(str(tmp_path/"sectors.state"))
+
+
+def test_save_state_needs_loaded_data(data_dir, tmp_path, capsys):
+    proj_codes.Sectors().save_state(str(tmp_path/"empty.state"))
+    assert "Data not yet loaded." in capsys.readouterr().out
+    assert not (tmp_path/"empty.state").exists()
@@ -0,0 +1,47 @@
+#Tests that threshold sweeps match repeated get_projects and main_sector calls
+import pytest
+
+THRESHOLDS = list(range(0, 101, 5)) + [33, 1]
+
+
+def count_projects(output_df):
+    #Return the number of unique projects in the output of get_projects, which is None if no project matches
+    return 0 if output_df is None else output_df['Project Id'].nunique()
+
+
+@pytest.mark.parametrize("codes", [["TI", "wa"], ["LR"], ["TI", "TW", "TV", "WA", "WB", "LR", "LS", "HH"], ["ZZ"]])
+def test_sweep_min_pct_matches_get_projects(sectors, codes):
+    sweep_df = sectors.sweep_min_pct(codes, THRESHOLDS)
+    assert sweep_df['Projects'].tolist()==[count_projects(sectors.get_projects(codes, min_pct=t)) for t in THRESHOLDS]
+
+
+def test_sweep_min_pct_of_themes_matches_get_projects(themes):
+    sweep_df = themes.sweep_min_pct([811, 92], THRESHOLDS)
+    assert sweep_df['Projects'].tolist()==[count_projects(themes.get_projects([811, 92], min_pct=t)) for t in THRESHOLDS]
+
+
+def test_sweep_main_sector_matches_main_sector(sectors, download):
+    pids = download["metadata"]['Project Id'].tolist()
+    thresholds = list(range(0, 101, 10))
+    counts = sectors.sweep_main_sector(thresholds)
+    assignments = sectors.sweep_main_sector(thresholds, assignments=True)
+    for t in thresholds:
+        main_df = sectors.main_sector(pids, threshold=t)
+        assert assignments['PID'].tolist()==main_df['PID'].tolist()
+        assert assignments[t].fillna("").tolist()==main_df['Main Sector'].fillna("").tolist()
+        row = counts.loc[t]
+        assert row[row>0].to_dict()==main_df['Main Sector'].value_counts(dropna=False).to_dict()
+
+
+def test_sweep_main_sector_of_some_projects(sectors):
+    pids = ["P100001", "P100005", "P100019", "P999999"]
+    assignments = sectors.sweep_main_sector([60, 40], pid_list=pids, assignments=True)
+    for t in [60, 40]:
+        assert assignments[t].fillna("").tolist()==sectors.main_sector(pids, threshold=t)['Main Sector'].fillna("").tolist()
+
+
+def test_sweep_input_errors(sectors):
+    with pytest.raises(TypeError):
+        sectors.sweep_min_pct("TI")
+    with pytest.raises((TypeError, ValueError)):
+        sectors.sweep_main_sector(thresholds=[])
@@ -0,0 +1,51 @@
+#Tests that queries fanned out to a pool of processes with workers return the same output, and print the same messages, as serial queries
+import pandas as pd
+import pytest
+
+
+def run(capsys, query, *args, **kwargs):
+    #Return the output of a query and the messages it printed
+    capsys.readouterr()
+    output_df = query(*args, **kwargs)
+    return output_df, capsys.readouterr().out
+
+
+@pytest.fixture
+def pids(download):
+    #Requested PIDs: most loaded projects, in shuffled order, with repeats, lower-case PIDs and PIDs not in the data
+    pids = download["metadata"]['Project Id'].sample(frac=0.8, random_state=0).tolist()
+    return pids + pids[:20] + ["p100003", "P999999"]
+
+
+@pytest.mark.parametrize("method, kwargs", [("get_sectors", {}),
+                                            ("get_sectors", {"show_meta":True}),
+                                            ("count_sectors", {}),
+                                            ("count_sectors", {"summarize":True}),
+                                            ("main_sector", {}),
+                                            ("main_sector", {"threshold":60}),
+                                            ("main_sector", {"threshold":40, "summarize":True})])
+def test_sector_queries_match_serial(sectors, pids, capsys, method, kwargs):
+    serial, serial_messages = run(capsys, getattr(sectors, method), pids, **kwargs)
+    pooled, pooled_messages = run(capsys, getattr(sectors, method), pids, workers=2, **kwargs)
+    pd.testing.assert_frame_equal(pooled, serial)
+    assert pooled_messages==serial_messages
+
+
+@pytest.mark.parametrize("theme_level", [None, [3], [1, 2]])
+def test_get_themes_matches_serial(themes, pids, capsys, theme_level):
+    serial, serial_messages = run(capsys, themes.get_themes, pids, theme_level=theme_level)
+    pooled, pooled_messages = run(capsys, themes.get_themes, pids, theme_level=theme_level, workers=2)
+    pd.testing.assert_frame_equal(pooled, serial)
+    assert pooled_messages==serial_messages
+
+
+def test_pool_handles_no_data_found(sectors, capsys):
+    serial, serial_messages = run(capsys, sectors.count_sectors, ["P999999"])
+    pooled, pooled_messages = run(capsys, sectors.count_sectors, ["P999999"], workers=2)
+    assert (serial is None) and (pooled is None)
+    assert pooled_messages==serial_messages
+
+
+def test_workers_must_be_positive(sectors, pids):
+    with pytest.raises(ValueError):
+        sectors.main_sector(pids, workers=0)